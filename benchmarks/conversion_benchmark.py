@@ -0,0 +1,265 @@
+"""Conversion throughput benchmark.
+
+Converts synthetic images (flat, gradient, photographic noise and RGBA) at
+several resolutions to several palettes, with the conversion options of the
+client, and reports the megapixels converted per second and the peak
+resident memory of every case. Every case runs in a new interpreter, so its
+peak memory is its own; the time is the best of some runs of the whole
+pipeline (decode, convert, encode) without the interpreter startup.
+
+    python benchmarks/conversion_benchmark.py [--sizes 256 1024]
+        [--palettes nord dracula | all] [--engines numpy gonord]
+        [--repeat 3] [--save results.json]
+        [--baseline benchmarks/baseline.json] [--tolerance 0.25] [--json]
+
+Every run also measures a reference case, and the speed of every case is
+compared relative to it, so that the results of a faster or slower machine
+can be compared with a baseline saved on another one. With --baseline the
+exit code is 1 when the relative speed of a case is lower than the one of the
+baseline by more than the tolerance. The committed benchmarks/baseline.json
+holds the default cases. The relative speeds still depend somewhat on the
+processor, save a baseline on the machine running the comparisons to catch
+the smaller regressions.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).parents[1]
+SOURCE_PATH = ROOT_PATH / "src"
+DEFAULT_SIZES = [256, 1024]
+DEFAULT_PALETTES = ["nord", "dracula", "gruvbox"]
+DEFAULT_ENGINES = ["numpy"]
+DEFAULT_REPEAT = 3
+DEFAULT_TOLERANCE = 0.25
+SEED = 42
+# The case every run measures to compare the speeds relative to it.
+REFERENCE_NAME = "reference"
+REFERENCE_CASE = {
+    "engine": "numpy",
+    "kind": "gradient",
+    "size": 256,
+    "palette": "nord",
+    "variant": "default",
+}
+
+INPUTS = ["flat", "gradient", "noise", "rgba"]
+# The conversion options of the client, as Converter options.
+VARIANTS = {
+    "default": {},
+    "blur": {"enable_blur": True},
+    "avg": {"enable_avg_pixels": True},
+    "avg,pixels-area=3": {"enable_avg_pixels": True, "pixels_area": [3]},
+    "avg,pixels-area=5,3": {"enable_avg_pixels": True, "pixels_area": [5, 3]},
+}
+
+
+def create_input(kind: str, size: int, path: Path) -> None:
+    """Save a synthetic square image, the same for the same kind and size."""
+    import numpy as np
+    from PIL import Image
+
+    rng = np.random.default_rng(SEED)
+    ramp = np.linspace(0, 255, size)
+    gradient = np.stack(
+        [
+            np.broadcast_to(ramp[None, :], (size, size)),
+            np.broadcast_to(ramp[:, None], (size, size)),
+            np.broadcast_to(ramp[::-1][None, :], (size, size)),
+        ],
+        axis=2,
+    )
+
+    if kind == "flat":
+        pixels = np.full((size, size, 3), (94, 129, 172), dtype=np.uint8)
+    elif kind == "gradient":
+        pixels = gradient.astype(np.uint8)
+    elif kind == "noise":
+        # A smooth image with sensor like noise, as in photographs.
+        noisy = gradient + rng.normal(0, 12, (size, size, 3))
+        pixels = np.clip(noisy, 0, 255).astype(np.uint8)
+    else:
+        alpha = rng.integers(0, 256, (size, size, 1))
+        pixels = np.concatenate([gradient, alpha], axis=2).astype(np.uint8)
+
+    Image.fromarray(pixels).save(path)
+
+
+def run_case(case: dict) -> dict:
+    """Convert an image as described by a case, in this interpreter."""
+    import resource
+
+    from image_go_nord_client.converter import Converter
+
+    converter = Converter(
+        case["palette"], engine=case["engine"], **VARIANTS[case["variant"]]
+    )
+    timings = []
+    for _ in range(case["repeat"]):
+        start = time.perf_counter()
+        converter.convert_file(case["input_path"], case["output_path"])
+        timings.append(time.perf_counter() - start)
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak *= 1 if sys.platform == "darwin" else 1024
+    megapixels = case["size"] ** 2 / 1e6
+    return {
+        "seconds": round(min(timings), 6),
+        "megapixels_per_second": round(megapixels / min(timings), 3),
+        "peak_rss_mb": round(peak / (1024 * 1024), 1),
+    }
+
+
+def measure(case: dict) -> dict:
+    """Run a case in a new interpreter.
+
+    :return: The measures, or the error of a case that fails.
+    """
+    environment = os.environ.copy()
+    python_path = [str(SOURCE_PATH), environment.get("PYTHONPATH", "")]
+    environment["PYTHONPATH"] = os.pathsep.join(filter(None, python_path))
+    process = subprocess.run(
+        [sys.executable, __file__, "--run-case", json.dumps(case)],
+        env=environment,
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode:
+        return {"error": (process.stderr.strip().splitlines() or ["failed"])[-1]}
+
+    return json.loads(process.stdout.splitlines()[-1])
+
+
+def add_relative_speeds(results: dict) -> None:
+    """Add to every result its speed relative to the reference case."""
+    reference_speed = results[REFERENCE_NAME]["megapixels_per_second"]
+    for result in results.values():
+        if "error" not in result:
+            result["relative_speed"] = round(
+                result["megapixels_per_second"] / reference_speed, 4
+            )
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """The cases slower than the baseline by more than the tolerance, relative
+    to the reference case of their run, or failing but not in the baseline."""
+    regressions = []
+    for name, result in results.items():
+        if name == REFERENCE_NAME or "relative_speed" not in baseline.get(name, {}):
+            continue
+
+        speed = result.get("relative_speed", 0)
+        if speed < baseline[name]["relative_speed"] * (1 - tolerance):
+            regressions.append(name)
+
+    return regressions
+
+
+def get_palettes(names: list[str]) -> list[str]:
+    if names != ["all"]:
+        return names
+
+    sys.path.insert(0, str(SOURCE_PATH))
+    from image_go_nord_client import get_palette_dict
+
+    return sorted(get_palette_dict())
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES)
+    parser.add_argument("--palettes", nargs="+", default=DEFAULT_PALETTES)
+    parser.add_argument("--engines", nargs="+", default=DEFAULT_ENGINES)
+    parser.add_argument("--inputs", nargs="+", choices=INPUTS, default=INPUTS)
+    parser.add_argument("--variants", nargs="+", choices=VARIANTS, default=VARIANTS)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--save", type=Path, default=None)
+    parser.add_argument("--baseline", type=Path, default=None)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--json", action="store_true", dest="as_json")
+    parser.add_argument("--run-case", type=json.loads, default=None)
+    options = parser.parse_args()
+
+    if options.run_case:
+        print(json.dumps(run_case(options.run_case)))
+        return 0
+
+    results = {}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        temp_path = Path(temp_dir)
+
+        def run(name: str, kind: str, size: int, **case) -> None:
+            input_path = temp_path / f"{kind}-{size}.png"
+            if not input_path.exists():
+                create_input(kind, size, input_path)
+            results[name] = measure(
+                {
+                    **case,
+                    "size": size,
+                    "repeat": options.repeat,
+                    "input_path": str(input_path),
+                    "output_path": str(temp_path / "output.png"),
+                }
+            )
+            if options.as_json:
+                return
+
+            if "error" in results[name]:
+                print(f"{name:<48} FAILED {results[name]['error']}")
+            else:
+                print(
+                    f"{name:<48} "
+                    f"{results[name]['megapixels_per_second']:>9.3f} MP/s "
+                    f"{results[name]['peak_rss_mb']:>8.1f} MB"
+                )
+
+        run(REFERENCE_NAME, **REFERENCE_CASE)
+        if "error" in results[REFERENCE_NAME]:
+            print("The reference case failed, nothing to compare", file=sys.stderr)
+            return 1
+
+        for kind in options.inputs:
+            for size in options.sizes:
+                for engine in options.engines:
+                    for palette in get_palettes(options.palettes):
+                        for variant in options.variants:
+                            name = f"{engine}/{kind}/{size}/{palette}/{variant}"
+                            run(
+                                name,
+                                kind,
+                                size,
+                                engine=engine,
+                                palette=palette,
+                                variant=variant,
+                            )
+
+    add_relative_speeds(results)
+    if options.save:
+        options.save.write_text(json.dumps(results, indent=2, sort_keys=True))
+
+    regressions = []
+    if options.baseline:
+        baseline = json.loads(options.baseline.read_text())
+        regressions = compare(results, baseline, options.tolerance)
+
+    if options.as_json:
+        print(json.dumps({"cases": results, "regressions": regressions}, indent=2))
+
+    for name in regressions:
+        print(
+            f"REGRESSION {name}: {results[name].get('relative_speed', 0):.3f} times "
+            f"the reference, baseline {baseline[name]['relative_speed']:.3f} times",
+            file=sys.stderr,
+        )
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
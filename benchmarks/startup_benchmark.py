@@ -0,0 +1,130 @@
+"""Cold start benchmark of the command line client.
+
+Runs the commands that should not load the imaging stack (version, help,
+palette listing, argument errors) in new interpreters and compares the
+median wall time with a budget, relative to the startup of a bare
+interpreter so that the result does not depend on the machine speed.
+
+    python benchmarks/startup_benchmark.py [--runs 20] [--budget-ms 150] [--json]
+
+The exit code is 1 when a command goes over the budget.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT_PATH = Path(__file__).parents[1]
+CLIENT_PATH = ROOT_PATH / "src" / "image_go_nord_client"
+DEFAULT_RUNS = 20
+DEFAULT_BUDGET_MS = 150.0
+HEAVY_MODULES = ("PIL", "numpy", "ImageGoNord")
+
+COMMANDS = {
+    "version": ["--version"],
+    "help": ["--help"],
+    "list-palettes": ["--list-palettes"],
+    "missing-image": [],
+    "invalid-option": ["-i=image.png", "--pixels-area=x"],
+}
+
+
+def get_environment() -> dict[str, str]:
+    environment = os.environ.copy()
+    python_path = [str(ROOT_PATH / "src"), environment.get("PYTHONPATH", "")]
+    environment["PYTHONPATH"] = os.pathsep.join(filter(None, python_path))
+    return environment
+
+
+def measure(command: list[str], runs: int) -> float:
+    """Median wall time in milliseconds of a command run in new processes."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            command,
+            env=get_environment(),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        timings.append((time.perf_counter() - start) * 1000)
+
+    return statistics.median(timings)
+
+
+def get_loaded_heavy_modules(arguments: list[str]) -> list[str]:
+    """The heavy modules imported by the client when run with the arguments."""
+    script = (
+        "import sys\n"
+        "from image_go_nord_client.main import main\n"
+        "try:\n"
+        "    main(sys.argv)\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))\n"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script, *arguments],
+        env=get_environment(),
+        capture_output=True,
+        text=True,
+    ).stdout
+    last_line = output.splitlines()[-1] if output.strip() else ""
+    return [module for module in last_line.split(",") if module]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--json", action="store_true", dest="as_json")
+    options = parser.parse_args()
+
+    baseline = measure([sys.executable, "-c", "pass"], options.runs)
+    results = {}
+    for name, arguments in COMMANDS.items():
+        median = measure([sys.executable, str(CLIENT_PATH), *arguments], options.runs)
+        results[name] = {
+            "median_ms": round(median, 2),
+            "overhead_ms": round(median - baseline, 2),
+            "heavy_modules": get_loaded_heavy_modules(arguments),
+        }
+
+    failed = [
+        name
+        for name, result in results.items()
+        if result["overhead_ms"] > options.budget_ms or result["heavy_modules"]
+    ]
+
+    if options.as_json:
+        print(
+            json.dumps(
+                {
+                    "interpreter_ms": round(baseline, 2),
+                    "budget_ms": options.budget_ms,
+                    "commands": results,
+                    "failed": failed,
+                },
+                indent=2,
+            )
+        )
+    else:
+        print(f"interpreter startup: {baseline:.1f} ms")
+        for name, result in results.items():
+            status = "FAIL" if name in failed else "ok"
+            print(
+                f"{name:<16} {result['median_ms']:>8.1f} ms "
+                f"(+{result['overhead_ms']:.1f} ms, budget {options.budget_ms:.0f} ms)"
+                f" {status} {' '.join(result['heavy_modules'])}"
+            )
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,11 +2,21 @@ import argparse
 from argparse import RawDescriptionHelpFormatter
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import Optional, Sequence, Union
 
-VERSION = (Path(__file__).parent / "VERSION").read_text().strip()
+VERSION_PATH = Path(__file__).parent / "VERSION"
 DEFAULT_EXTENSION = ".png"
 OUTPUT_IMAGE_NAME = "nord" + DEFAULT_EXTENSION
+# Path of the input or of the output image meaning stdin or stdout.
+STREAM_PATH = "-"
+# First argument running the conversion daemon instead of a conversion.
+SERVE_COMMAND = "serve"
+# First argument mirroring a tree of images, see sync.py.
+SYNC_COMMAND = "sync"
+# First argument converting the items of a job manifest, see work_queue.py.
+WORKER_COMMAND = "worker"
+ENGINES = ["gonord", "numpy"]
+PROFILE_FORMATS = ["table", "json"]
 
 __doc__ = """ImageGoNord, a converter for a rgb images to norththeme palette.
 Usage: gonord [OPTION]...
@@ -31,6 +41,90 @@ and/or open issues at https://github.com/Schrodinger-Hat/ImageGoNord/issues/new
 """
 
 
+def get_version() -> str:
+    return VERSION_PATH.read_text().strip()
+
+
+def __getattr__(name: str):
+    # VERSION is read from disk only when needed, to keep the import fast.
+    if name == "VERSION":
+        return get_version()
+
+    # The converters are the public API, imported only by the embedding code.
+    if name == "Converter":
+        from image_go_nord_client.converter import Converter
+
+        return Converter
+
+    if name == "AsyncConverter":
+        from image_go_nord_client.async_converter import AsyncConverter
+
+        return AsyncConverter
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+class VersionAction(argparse.Action):
+    """Print the version read from the VERSION file and exit."""
+
+    def __init__(self, option_strings, dest=argparse.SUPPRESS, help=None):
+        super().__init__(
+            option_strings=option_strings,
+            dest=dest,
+            default=argparse.SUPPRESS,
+            nargs=0,
+            help=help,
+        )
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        print(get_version())
+        parser.exit()
+
+
+class ListPalettesAction(argparse.Action):
+    """Print the available palettes with their color sets and exit."""
+
+    def __init__(self, option_strings, dest=argparse.SUPPRESS, help=None):
+        super().__init__(
+            option_strings=option_strings,
+            dest=dest,
+            default=argparse.SUPPRESS,
+            nargs=0,
+            help=help,
+        )
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        palette_dirs = getattr(namespace, "palette_dirs", None) or ()
+        for palette in sorted(
+            get_palette_list(palette_dirs), key=lambda palette: palette.name
+        ):
+            colors = ", ".join(color.name for color in palette.colors)
+            print(f"{palette.name}: {colors}")
+
+        parser.exit()
+
+
+def parse_positive_int(value: str) -> int:
+    if not value.isdigit() or int(value) < 1:
+        raise ValueError(
+            "Invalid value, should be a positive integer: {}".format(value)
+        )
+
+    return int(value)
+
+
+def parse_positive_float(value: str) -> float:
+    try:
+        number = float(value)
+    except ValueError:
+        number = 0.0
+
+    if not number > 0 or number == float("inf"):
+        raise ValueError("Invalid value, should be a positive number: {}".format(value))
+
+    return number
+
+
 def parse_pixels_area(value: str):
     if not value:
         raise TypeError("Invalid value for pixels area: {}".format(value))
@@ -49,10 +143,34 @@ def parse_pixels_area(value: str):
     return values
 
 
+@dataclass
+class Target:
+    palette: str
+    colors: list[str]
+    output_path: str
+
+
+def parse_target(value: str) -> Target:
+    """Parse a conversion target given as PALETTE[:COLORS]=PATH."""
+    selection, separator, output_path = value.partition("=")
+    palette, _, colors = selection.partition(":")
+    if not separator or not palette or not output_path:
+        raise ValueError(
+            "Invalid target, should be PALETTE[:COLORS]=PATH: {}".format(value)
+        )
+
+    return Target(
+        palette=palette,
+        colors=colors.split(",") if colors else [],
+        output_path=output_path,
+    )
+
+
 @dataclass
 class Color:
     name: str
     path: Path
+    hex_colors: tuple[str, ...] = ()
 
 
 @dataclass
@@ -62,52 +180,35 @@ class Palette:
     colors: list[Color]
 
 
-def get_palette_dict() -> dict[str, Palette]:
-    return {
-        folder.name.lower(): Palette(
-            name=folder.name.lower(),
-            path=folder,
-            colors=[
-                Color(name=file.name.replace(".txt", ""), path=file)
-                for file in folder.iterdir()
-            ],
-        )
-        for folder in (Path(__file__).parent / "palettes").iterdir()
-    }
-
-
-def get_palette_list() -> list[Palette]:
-    return [
-        Palette(
-            name=folder.name.lower(),
-            path=folder,
-            colors=[
-                Color(name=file.name.replace(".txt", ""), path=file)
-                for file in folder.iterdir()
-            ],
-        )
-        for folder in (Path(__file__).parent / "palettes").iterdir()
-    ]
+def get_palette_dict(
+    palette_dirs: Sequence[Union[str, Path]] = (),
+) -> dict[str, Palette]:
+    """The palettes by lowercase name.
+
+    :param palette_dirs: Directories of user palettes to add to the known
+        ones for this lookup, with a folder of color set files per palette.
+    """
+    from image_go_nord_client.palette_registry import get_palette_registry
+
+    return dict(get_palette_registry(palette_dirs).get_palettes())
+
 
+def get_palette_list(palette_dirs: Sequence[Union[str, Path]] = ()) -> list[Palette]:
+    from image_go_nord_client.palette_registry import get_palette_registry
 
-def search_palette_by_name(name: str) -> Optional[Palette]:
-    for palette in get_palette_list():
-        if name.lower() == palette.name.lower():
-            return palette
+    return list(get_palette_registry(palette_dirs).get_palettes().values())
 
-    return None
+
+def search_palette_by_name(
+    name: str, palette_dirs: Sequence[Union[str, Path]] = ()
+) -> Optional[Palette]:
+    from image_go_nord_client.palette_registry import get_palette_registry
+
+    return get_palette_registry(palette_dirs).get_palettes().get(name.lower())
 
 
 def get_default_palette() -> Palette:
-    default_path = Path(__file__).parent / "palettes" / "nord"
-    return Palette(
-        name="nord",
-        path=default_path,
-        colors=[
-            Color(name=file.name.replace(".txt", ""), path=file)
-            for file in default_path.iterdir()
-        ],
-    )
+    return search_palette_by_name("nord")
 
 
 def get_argument_parser() -> argparse.ArgumentParser:
@@ -121,11 +222,16 @@ def get_argument_parser() -> argparse.ArgumentParser:
     parser.add_argument(
         "-v",
         "--version",
-        action="version",
-        version=VERSION,
+        action=VersionAction,
         help="show version number and exit",
     )
 
+    parser.add_argument(
+        "--list-palettes",
+        action=ListPalettesAction,
+        help="show the available palettes with their colors and exit",
+    )
+
     parser.add_argument(
         "-i",
         "--img",
@@ -133,7 +239,8 @@ def get_argument_parser() -> argparse.ArgumentParser:
         dest="input_path",
         metavar="PATH",
         required=True,
-        help="specify input image path",
+        help="specify input image path, a directory or a glob pattern converts "
+        "all the matching images (batch mode), - reads the image from stdin",
     )
 
     parser.add_argument(
@@ -145,6 +252,15 @@ def get_argument_parser() -> argparse.ArgumentParser:
         help="use blur on the final result",
     )
 
+    parser.add_argument(
+        "--blur-radius",
+        type=parse_positive_float,
+        dest="blur_radius",
+        metavar="RADIUS",
+        default=None,
+        help="radius of the blur (default: 1, numpy engine only)",
+    )
+
     parser.add_argument(
         "-q",
         "--quiet",
@@ -161,7 +277,79 @@ def get_argument_parser() -> argparse.ArgumentParser:
         dest="output_path",
         metavar="PATH",
         default=OUTPUT_IMAGE_NAME,
-        help="specify output image path",
+        help="specify output image path (output directory in batch mode), "
+        "- writes the image to stdout",
+    )
+
+    parser.add_argument(
+        "-f",
+        "--format",
+        type=str.upper,
+        dest="output_format",
+        metavar="FORMAT",
+        default=None,
+        help="format of the output image, like PNG or JPEG, required when "
+        "writing to stdout (default: from the output extension)",
+    )
+
+    parser.add_argument(
+        "-j",
+        "--jobs",
+        type=parse_positive_int,
+        dest="jobs",
+        metavar="N",
+        default=None,
+        help="number of worker processes in batch mode (default: cpu count)",
+    )
+
+    parser.add_argument(
+        "--max-memory",
+        type=parse_positive_int,
+        dest="max_memory",
+        metavar="MB",
+        default=None,
+        help="in batch mode, run only the conversions fitting in about MB "
+        "megabytes of memory, estimated from the image sizes, the largest "
+        "images first",
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        dest="resume",
+        default=False,
+        help="in batch mode, convert only the images not converted by the "
+        "previous run with the same options, read from its journal",
+    )
+
+    parser.add_argument(
+        "--journal",
+        type=str,
+        dest="journal_path",
+        metavar="PATH",
+        default=None,
+        help="journal of the conversions of a batch run (default: in the user "
+        "cache directory, by output directory)",
+    )
+
+    parser.add_argument(
+        "-t",
+        "--threads",
+        type=parse_positive_int,
+        dest="threads",
+        metavar="N",
+        default=None,
+        help="number of threads converting the bands of rows of an image, "
+        "the result does not change (numpy engine only)",
+    )
+
+    parser.add_argument(
+        "--avg",
+        action="store_true",
+        dest="enable_avg_pixels",
+        default=False,
+        help="replace every pixel by the average color of the box around it, "
+        "set with --pixels-area, before mapping it to the palette",
     )
 
     parser.add_argument(
@@ -193,6 +381,17 @@ def get_argument_parser() -> argparse.ArgumentParser:
         help="specify the palette to use",
     )
 
+    parser.add_argument(
+        "--palettes-dir",
+        type=str,
+        dest="palette_dirs",
+        metavar="PATH",
+        action="append",
+        default=[],
+        help="add a directory of user palettes, one folder of .txt color "
+        "files for each palette (can be repeated)",
+    )
+
     parser.add_argument(
         "-c",
         "--colors",
@@ -203,4 +402,112 @@ def get_argument_parser() -> argparse.ArgumentParser:
         help="specify the colors to use",
     )
 
+    parser.add_argument(
+        "--target",
+        type=parse_target,
+        dest="targets",
+        metavar="PALETTE[:COLORS]=PATH",
+        action="append",
+        default=[],
+        help="convert the image to a palette and save it to PATH, can be "
+        "repeated to convert a single decoded image to many palettes, in place "
+        "of --palette, --colors and --out",
+    )
+
+    parser.add_argument(
+        "-e",
+        "--engine",
+        type=str,
+        dest="engine",
+        choices=ENGINES,
+        default="gonord",
+        help="specify the conversion engine, gonord is the reference one",
+    )
+
+    parser.add_argument(
+        "--lut",
+        action="store_true",
+        dest="use_lookup_table",
+        default=False,
+        help="map the colors with a lookup table cached in the user cache "
+        "directory, faster for big images (numpy engine only)",
+    )
+
+    parser.add_argument(
+        "--indexed",
+        action="store_true",
+        dest="indexed_output",
+        default=False,
+        help="write palette images (PNG, GIF, BMP or TIFF) whose color table "
+        "is the selected palette, much smaller, when the converted image is "
+        "opaque (numpy engine only)",
+    )
+
+    parser.add_argument(
+        "--tile-memory",
+        type=parse_positive_int,
+        dest="tile_memory",
+        metavar="MB",
+        default=None,
+        help="convert the image by strips using about MB megabytes of memory, "
+        "for images bigger than the memory (numpy engine only)",
+    )
+
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        dest="cache_dir",
+        metavar="PATH",
+        default=None,
+        help="keep the converted images in a cache directory, an image already "
+        "converted with the same options is copied from it",
+    )
+
+    parser.add_argument(
+        "--cache-size",
+        type=parse_positive_int,
+        dest="cache_size",
+        metavar="MB",
+        default=None,
+        help="maximum size of the cache directory, the least recently used "
+        "images are removed (default: 1024)",
+    )
+
+    parser.add_argument(
+        "--verify",
+        action="store_true",
+        dest="verify_engine",
+        default=False,
+        help="convert the input with the selected engine and with gonord and "
+        "check that the results are identical, no image is written",
+    )
+
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        dest="profile",
+        default=False,
+        help="print the wall time, the cpu time and the peak memory of every "
+        "stage of the conversion to stderr",
+    )
+
+    parser.add_argument(
+        "--profile-format",
+        type=str,
+        dest="profile_format",
+        choices=PROFILE_FORMATS,
+        default=PROFILE_FORMATS[0],
+        help="format of the profile printed by --profile (default: table)",
+    )
+
+    parser.add_argument(
+        "--profile-stats",
+        type=str,
+        dest="profile_stats",
+        metavar="PATH",
+        default=None,
+        help="with --profile, also save the cProfile statistics of the "
+        "conversion to PATH, to read with pstats",
+    )
+
     return parser
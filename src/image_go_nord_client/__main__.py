@@ -2,4 +2,4 @@ from main import main
 import sys
 
 if __name__ == "__main__":
-    sys.exit(main())
+    sys.exit(main(use_daemon=True))
@@ -0,0 +1,409 @@
+"""Conversion of animated images (GIF, APNG, WebP) frame by frame.
+
+Pillow decodes the frames of an animation one at a time, each one composed
+over the previous ones, so a frame is converted as a whole image. The frames
+are read, converted and written one after the other, neither the decoded nor
+the converted frames are ever all in memory: the GIF and WebP encoders of
+Pillow read the converted frames one at a time from a ConvertedAnimation, and
+APNG files are written by ApngWriter because the APNG encoder of Pillow keeps
+all the frames. The GIF encoder still keeps a palette copy of the changed box
+of every frame.
+
+Animations are mostly static, so every frame is compared with the previous
+one: an unchanged frame reuses the previous converted frame and, when the
+engine converts every pixel alone (no blur, no average box, no alpha), only
+the box around the changed pixels is converted. With the NumPy engine, which
+converts without holding the GIL, the frames are converted by a pool of
+threads sized from the CPU count.
+"""
+
+import logging
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from fractions import Fraction
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
+
+import numpy as np
+from PIL import Image, ImageSequence, UnidentifiedImageError
+
+from image_go_nord_client.tiled import PNG_SIGNATURE, get_png_chunk
+
+__ALL__ = ["convert_animation", "is_animation", "open_animation"]
+
+# Formats Pillow can save with several frames.
+ANIMATION_FORMATS = ("GIF", "PNG", "WEBP")
+# Frames converted at once, every one holds a decoded and a converted frame.
+MAX_FRAME_WORKERS = 8
+
+
+@dataclass
+class FrameTask:
+    """A frame to convert, as the pixels of its box changed since the
+    previous frame (the whole frame when box is None), or no pixels when the
+    frame is the same as the previous one."""
+
+    pixels: Optional[np.ndarray]
+    box: Optional[tuple[slice, slice]]
+    duration: int
+    disposal: Optional[int]
+
+
+def is_animation(image) -> bool:
+    """Tell if an opened image has more than one frame."""
+    return getattr(image, "is_animated", False) is True
+
+
+def open_animation(source) -> Optional[Image.Image]:
+    """Open an image if it is an animation.
+
+    :param source: The path or the file object of the image.
+    :return: The animation, or None if it is not an animation or it can not
+        be opened, to leave the error to the engine opening the image.
+    """
+    try:
+        image = Image.open(source)
+    except (OSError, UnidentifiedImageError):
+        return None
+
+    if is_animation(image):
+        return image
+
+    # A file object is closed by its owner, which can read it again.
+    if not hasattr(source, "read"):
+        image.close()
+    return None
+
+
+def is_pixel_by_pixel(go_nord) -> bool:
+    """Tell if an engine converts every pixel alone, without blur or average
+    box, so a part of an image converts as in the whole image."""
+    if hasattr(go_nord, "use_gaussian_blur"):
+        return not (go_nord.use_gaussian_blur or go_nord.use_avg_color)
+
+    return not (go_nord.USE_GAUSSIAN_BLUR or go_nord.USE_AVG_COLOR)
+
+
+def get_frame_mode(image: Image.Image) -> str:
+    """The mode of the converted frames, RGBA if the animation has alpha."""
+    has_alpha = "A" in image.getbands() or "transparency" in image.info
+    return "RGBA" if has_alpha else "RGB"
+
+
+def get_frame_disposal(frame: Image.Image) -> Optional[int]:
+    # GIF keeps the disposal of the current frame in an attribute.
+    disposal = getattr(frame, "disposal_method", None)
+    return frame.info.get("disposal", disposal)
+
+
+def read_frame_tasks(
+    frames: Iterable[Image.Image], mode: str, crop_changes: bool
+) -> Iterator[FrameTask]:
+    """Read the frames of an animation and find what changed in each one.
+
+    :param frames: The frames of the animation.
+    :param mode: The mode the frames are converted in.
+    :param crop_changes: Convert only the box of the changed pixels.
+    """
+    previous = None
+    for frame in frames:
+        pixels = np.asarray(frame.convert(mode))
+        task = FrameTask(
+            pixels, None, frame.info.get("duration", 0), get_frame_disposal(frame)
+        )
+        if previous is not None:
+            changed = (pixels != previous).any(axis=2)
+            rows = np.flatnonzero(changed.any(axis=1))
+            columns = np.flatnonzero(changed.any(axis=0))
+            if not len(rows):
+                task.pixels = None
+            elif crop_changes:
+                task.box = (
+                    slice(rows[0], rows[-1] + 1),
+                    slice(columns[0], columns[-1] + 1),
+                )
+                task.pixels = pixels[task.box]
+
+        previous = pixels
+        yield task
+
+
+def map_in_order(function: Callable, items: Iterable, workers: int) -> Iterator:
+    """Map a function on items by a pool of threads, yielding the results in
+    order and reading the items only a few ahead of the results."""
+    if workers <= 1:
+        yield from map(function, items)
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for item in items:
+            pending.append(executor.submit(function, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+
+def get_frame_workers(go_nord) -> int:
+    """The number of frames converted at once by an engine.
+
+    GoNord converts in Python holding the GIL, a frame at a time. The NumPy
+    engine shares the CPUs between the frames and the threads of every
+    conversion.
+    """
+    if not hasattr(go_nord, "threads"):
+        return 1
+
+    workers = (os.cpu_count() or 1) // max(1, go_nord.threads)
+    return min(MAX_FRAME_WORKERS, max(1, workers))
+
+
+def convert_frames(
+    go_nord, image: Image.Image, mode: str
+) -> Iterator[tuple[Image.Image, FrameTask]]:
+    """Convert the frames of an animation.
+
+    :param go_nord: The configured GoNord or NumpyGoNord instance.
+    :param image: The animation.
+    :param mode: The mode of the converted frames.
+    :return: The converted frames, with the tasks of their source frames.
+    """
+    workers = get_frame_workers(go_nord)
+
+    def convert_task(task: FrameTask) -> tuple[FrameTask, Optional[np.ndarray]]:
+        if task.pixels is None:
+            return task, None
+
+        converted = go_nord.convert_image(Image.fromarray(task.pixels))
+        return task, np.asarray(converted.convert(mode))
+
+    tasks = read_frame_tasks(
+        ImageSequence.Iterator(image),
+        mode,
+        mode == "RGB" and is_pixel_by_pixel(go_nord),
+    )
+    previous = None
+    for task, converted in map_in_order(convert_task, tasks, workers):
+        if task.box is not None:
+            converted, box_pixels = previous.copy(), converted
+            converted[task.box] = box_pixels
+        elif converted is None:
+            converted = previous
+
+        previous = converted
+        yield Image.fromarray(converted), task
+
+
+class ConvertedAnimation(Image.Image):
+    """The converted frames of an animation as a multi frame image, for the
+    encoders of Pillow reading the frames one at a time.
+
+    A frame is converted when the encoder seeks to it, so the frames must be
+    read in order. Only the first frame, where the encoders seek back when
+    they are done, is kept.
+    """
+
+    def __init__(self, frames: Iterator[tuple[Image.Image, FrameTask]], n_frames: int):
+        """
+        :param frames: The converted frames, see convert_frames.
+        :param n_frames: The number of frames of the animation.
+        """
+        super().__init__()
+        self.frames = frames
+        self.n_frames = n_frames
+        self.is_animated = n_frames > 1
+        self.first_frame, first_task = next(frames)
+        # Filled as the frames are converted, read by the encoders after
+        # seeking to every frame.
+        self.durations = [first_task.duration]
+        self.disposals = [first_task.disposal]
+        self.position = 0
+        self._show_frame(self.first_frame)
+
+    def _show_frame(self, frame: Image.Image) -> None:
+        self.im = frame.im
+        self._mode = frame.mode
+        self._size = frame.size
+
+    def tell(self) -> int:
+        return self.position
+
+    def seek(self, frame: int) -> None:
+        if frame == 0:
+            self._show_frame(self.first_frame)
+        elif frame == self.position + 1:
+            try:
+                converted, task = next(self.frames)
+            except StopIteration:
+                raise EOFError("No more frames") from None
+
+            self.durations.append(task.duration)
+            self.disposals.append(task.disposal)
+            self._show_frame(converted)
+        elif frame != self.position:
+            raise ValueError("The converted frames can be read only in order")
+
+        self.position = frame
+
+
+class ApngWriter:
+    """Write an APNG file a frame at a time.
+
+    The frames after the first one are written as the box of the pixels that
+    changed since the previous frame, replacing them, so the disposal of the
+    source frames is not needed.
+    """
+
+    def __init__(self, file, size: tuple[int, int], mode: str, n_frames: int, loop):
+        """
+        :param file: The file object of the APNG.
+        :param size: The width and the height of the frames.
+        :param mode: The mode of the frames, RGB or RGBA.
+        :param n_frames: The number of frames that will be written.
+        :param loop: The number of times the animation is played, 0 forever.
+        """
+        self.file = file
+        self.size = size
+        self.sequence = 0
+        self.previous = None
+
+        color_type = 6 if mode == "RGBA" else 2
+        self.file.write(PNG_SIGNATURE)
+        self.write_chunk(
+            b"IHDR", struct.pack(">IIBBBBB", *size, 8, color_type, 0, 0, 0)
+        )
+        self.write_chunk(b"acTL", struct.pack(">II", n_frames, loop))
+
+    def write_chunk(self, chunk_type: bytes, data: bytes) -> None:
+        self.file.write(get_png_chunk(chunk_type, data))
+
+    def write_frame(self, pixels: np.ndarray, duration) -> None:
+        """Append a frame (H, W, C) of uint8 pixels, shown for duration ms."""
+        top, left = 0, 0
+        box = pixels
+        if self.previous is not None:
+            changed = (pixels != self.previous).any(axis=2)
+            rows = np.flatnonzero(changed.any(axis=1))
+            columns = np.flatnonzero(changed.any(axis=0))
+            # An unchanged frame still needs a box, its first pixel.
+            top, left = (rows[0], columns[0]) if len(rows) else (0, 0)
+            bottom, right = (rows[-1], columns[-1]) if len(rows) else (0, 0)
+            box = pixels[top : bottom + 1, left : right + 1]
+        self.previous = pixels
+
+        delay = Fraction(duration / 1000).limit_denominator(65535)
+        if delay.numerator > 65535:
+            raise ValueError(f"Can not write the duration {duration} in APNG")
+
+        height, width = box.shape[:2]
+        # The frame replaces the pixels of its box, it is not disposed.
+        self.write_chunk(
+            b"fcTL",
+            struct.pack(
+                ">IIIIIHHBB",
+                self.sequence,
+                width,
+                height,
+                left,
+                top,
+                delay.numerator,
+                delay.denominator,
+                0,
+                0,
+            ),
+        )
+        self.sequence += 1
+
+        rows = box.reshape(height, -1)
+        filtered = np.zeros((height, rows.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 2
+        filtered[0, 1:] = rows[0]
+        filtered[1:, 1:] = rows[1:] - rows[:-1]
+        data = zlib.compress(filtered.tobytes(), 6)
+        if self.sequence == 1:
+            self.write_chunk(b"IDAT", data)
+        else:
+            self.write_chunk(b"fdAT", struct.pack(">I", self.sequence) + data)
+            self.sequence += 1
+
+    def close(self) -> None:
+        self.write_chunk(b"IEND", b"")
+
+
+def write_apng(
+    frames: Iterator[tuple[Image.Image, FrameTask]], output, n_frames: int, loop
+) -> None:
+    """Write converted frames to an APNG as they are converted.
+
+    :param frames: The converted frames, see convert_frames.
+    :param output: The path or the file object of the APNG.
+    :param n_frames: The number of frames.
+    :param loop: The number of times the animation is played, 0 forever.
+    """
+    if hasattr(output, "write"):
+        file, path = output, None
+    else:
+        file, path = open(output, "wb"), Path(output)
+
+    try:
+        frame, task = next(frames)
+        writer = ApngWriter(file, frame.size, frame.mode, n_frames, loop)
+        writer.write_frame(np.asarray(frame), task.duration)
+        for frame, task in frames:
+            writer.write_frame(np.asarray(frame), task.duration)
+        writer.close()
+    except BaseException:
+        if path is not None:
+            file.close()
+            path.unlink(missing_ok=True)
+        raise
+
+    if path is not None:
+        file.close()
+
+
+def convert_animation(
+    go_nord, image: Image.Image, output, output_format: Optional[str] = None
+) -> None:
+    """Convert an animation and save it, keeping the duration of the frames,
+    the loop count and, when the format does not change, their disposal.
+
+    Formats that can not store animations get only the first frame.
+
+    :param go_nord: The configured GoNord or NumpyGoNord instance.
+    :param image: The animation, see open_animation.
+    :param output: The path or the file object of the converted animation.
+    :param output_format: The Pillow format of the converted animation, from
+        the extension of the path by default.
+    """
+    if output_format is None:
+        extension = Path(output).suffix.lower()
+        output_format = Image.registered_extensions().get(extension)
+
+    frames = convert_frames(go_nord, image, get_frame_mode(image))
+    if output_format not in ANIMATION_FORMATS:
+        logging.warning("%s can not store animations, saving the first frame", output)
+        first_frame, _ = next(frames)
+        frames.close()
+        first_frame.save(output, format=output_format)
+        return
+
+    if output_format == "PNG":
+        write_apng(frames, output, image.n_frames, image.info.get("loop", 0))
+        return
+
+    animation = ConvertedAnimation(frames, image.n_frames)
+    options = {"duration": animation.durations}
+    if image.info.get("loop") is not None:
+        options["loop"] = image.info["loop"]
+    # The disposal codes of GIF and APNG have different meanings.
+    if output_format == image.format and animation.disposals[0] is not None:
+        options["disposal"] = animation.disposals
+
+    animation.save(output, format=output_format, save_all=True, **options)
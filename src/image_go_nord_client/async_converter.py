@@ -0,0 +1,173 @@
+"""asyncio API converting images without blocking the event loop.
+
+An AsyncConverter runs the conversions of a Converter on an executor, a pool
+of threads by default or a ProcessPoolExecutor given by the caller, and
+limits the number of conversions in flight with a semaphore. A conversion
+holds its slot until the executor is done with it, also when it is cancelled
+or times out while running, so the limit is the real load of the executor.
+
+The numpy engine converts with NumPy and Pillow, which release the GIL, so
+threads are enough. GoNord converts in Python and its conversions run one at
+a time in a process, use a ProcessPoolExecutor to convert in parallel.
+"""
+
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from io import BytesIO
+from typing import AsyncIterator, Optional
+
+from image_go_nord_client.converter import DEFAULT_OUTPUT_FORMAT, Converter
+
+__ALL__ = ["AsyncConverter"]
+
+DEFAULT_MAX_CONCURRENCY = 4
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+def _freeze_options(options: dict) -> tuple:
+    return tuple(
+        sorted(
+            (name, tuple(value) if isinstance(value, list) else value)
+            for name, value in options.items()
+        )
+    )
+
+
+@lru_cache(maxsize=None)
+def _get_worker_converter(options: tuple) -> Converter:
+    # Every worker process keeps a Converter per configuration.
+    return Converter(**dict(options))
+
+
+def _run_conversion(converter: Converter, image, output_format, encode: bool):
+    if not encode:
+        return converter.convert(image, output_format)
+
+    if isinstance(image, (bytes, bytearray, memoryview)):
+        return converter.convert_bytes(bytes(image), output_format)
+
+    converted = converter.convert(image)
+    if not hasattr(converted, "save"):
+        from PIL import Image
+
+        converted = Image.fromarray(converted)
+
+    buffer = BytesIO()
+    converted.save(buffer, format=output_format or DEFAULT_OUTPUT_FORMAT)
+    return buffer.getvalue()
+
+
+def _convert_in_worker(options: tuple, image, output_format, encode: bool):
+    return _run_conversion(_get_worker_converter(options), image, output_format, encode)
+
+
+class AsyncConverter:
+    """Convert images from coroutines, on an executor."""
+
+    def __init__(
+        self,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        executor: Optional[Executor] = None,
+        timeout: Optional[float] = None,
+        **options,
+    ):
+        """
+        :param max_concurrency: The maximum number of conversions in flight,
+            the next ones wait for a free slot.
+        :param executor: The executor running the conversions, a pool of
+            max_concurrency threads by default. It is not shut down by close.
+        :param timeout: The default timeout in seconds of a conversion,
+            waiting for a slot included.
+        :param options: The options of the Converter, see Converter.
+        :raises ValueError: If the options can not be used, see Converter.
+        """
+        # Validates the options also when the conversions run in processes.
+        self.converter = Converter(**options)
+        self.options = _freeze_options(options)
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.owns_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=max_concurrency, thread_name_prefix="image-go-nord"
+        )
+        self.use_processes = isinstance(self.executor, ProcessPoolExecutor)
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def _run(self, image, output_format, encode: bool, timeout):
+        if timeout is None:
+            timeout = self.timeout
+
+        return await asyncio.wait_for(
+            self._submit(image, output_format, encode), timeout
+        )
+
+    async def _submit(self, image, output_format, encode: bool):
+        await self.semaphore.acquire()
+        if self.use_processes:
+            future = self.executor.submit(
+                _convert_in_worker, self.options, image, output_format, encode
+            )
+        else:
+            future = self.executor.submit(
+                _run_conversion, self.converter, image, output_format, encode
+            )
+
+        loop = asyncio.get_running_loop()
+
+        def release(_) -> None:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self.semaphore.release)
+
+        future.add_done_callback(release)
+        # Cancelling the wrapper cancels the conversion if it has not started
+        # yet, a running conversion keeps its slot until it is done.
+        return await asyncio.wrap_future(future)
+
+    async def convert(self, image, output_format: Optional[str] = None, timeout=None):
+        """Convert a Pillow image, a NumPy array or an encoded image.
+
+        :param image: The image to convert.
+        :param output_format: The Pillow format of the converted image, for
+            encoded images only.
+        :param timeout: The timeout in seconds, the default one if None.
+        :return: The converted image, of the same type as the image.
+        :raises asyncio.TimeoutError: If the conversion did not end in time.
+        """
+        return await self._run(image, output_format, False, timeout)
+
+    async def convert_to_bytes(
+        self, image, output_format: Optional[str] = None, timeout=None
+    ) -> bytes:
+        """Convert an image and encode it.
+
+        :param output_format: The Pillow format of the converted image, the
+            format of encoded input images or PNG by default.
+        """
+        return await self._run(image, output_format, True, timeout)
+
+    async def stream(
+        self,
+        image,
+        output_format: Optional[str] = None,
+        timeout=None,
+        chunk_size: int = STREAM_CHUNK_SIZE,
+    ) -> AsyncIterator[bytes]:
+        """Convert an image and yield the encoded image by chunks, to write
+        it to a response as soon as it is converted.
+        """
+        data = await self.convert_to_bytes(image, output_format, timeout)
+        view = memoryview(data)
+        for start in range(0, len(view), chunk_size):
+            yield bytes(view[start : start + chunk_size])
+
+    def close(self) -> None:
+        """Shut down the executor created by this converter."""
+        if self.owns_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def __aenter__(self) -> "AsyncConverter":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,43 @@
+"""Split the work on an image into bands of rows run by a pool of threads.
+
+NumPy and Pillow release the GIL on the operations done on big arrays, so the
+bands of a single image are converted in parallel by threads.
+"""
+
+import math
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+
+__ALL__ = ["get_bands", "run_bands"]
+
+
+def get_bands(height: int, threads: int, min_rows: int = 1) -> list[slice]:
+    """Split the rows of an image into one band for every thread.
+
+    :param height: The number of rows to split.
+    :param threads: The number of threads.
+    :param min_rows: The minimum number of rows of a band.
+    :return: The bands, as slices of rows.
+    """
+    band_rows = max(min_rows, math.ceil(height / max(threads, 1)), 1)
+    return [
+        slice(start, min(start + band_rows, height))
+        for start in range(0, height, band_rows)
+    ]
+
+
+def run_bands(function: Callable[[slice], None], bands: list[slice], threads: int):
+    """Call a function on every band, in parallel when there are more threads.
+
+    :param function: The function processing a band of rows.
+    :param bands: The bands, as slices of rows.
+    :param threads: The number of threads.
+    """
+    if threads <= 1 or len(bands) <= 1:
+        for band in bands:
+            function(band)
+        return
+
+    with ThreadPoolExecutor(max_workers=min(threads, len(bands))) as executor:
+        # Consume the results to raise the errors of the bands.
+        list(executor.map(function, bands))
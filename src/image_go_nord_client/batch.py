@@ -0,0 +1,304 @@
+import glob
+import hashlib
+import json
+import logging
+import os
+import secrets
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Union
+
+from image_go_nord_client import OUTPUT_IMAGE_NAME
+from image_go_nord_client.journal import (
+    DONE,
+    FAILED,
+    RUN,
+    STARTED,
+    BatchJournal,
+    get_journal_path,
+)
+
+__ALL__ = ["is_batch_input", "collect_batch_items", "run_batch"]
+
+IMAGE_EXTENSIONS = {".bmp", ".gif", ".jpeg", ".jpg", ".png", ".tif", ".tiff", ".webp"}
+GLOB_CHARACTERS = ("*", "?", "[")
+
+# Converter of the current worker process, created once by _setup_converter
+# and reused for every image the worker converts.
+_worker_converter = None
+_worker_output_format = None
+_worker_journal = None
+
+
+@dataclass
+class BatchItem:
+    input_path: Path
+    output_path: Path
+
+
+@dataclass
+class BatchResult:
+    item: BatchItem
+    error: Optional[str] = None
+
+
+def is_glob_pattern(value: str) -> bool:
+    return any(character in value for character in GLOB_CHARACTERS)
+
+
+def is_batch_input(input_path: str) -> bool:
+    """Tell if the input path selects more than one image.
+
+    :param input_path: The value given to --img.
+    """
+    return is_glob_pattern(input_path) or Path(input_path).is_dir()
+
+
+def get_batch_output_dir(output_path: str) -> Path:
+    """The output directory of a batch, the default output image name without
+    extension is used when no output path is given.
+
+    :param output_path: The value given to --out.
+    """
+    if output_path == OUTPUT_IMAGE_NAME:
+        return Path(Path(OUTPUT_IMAGE_NAME).stem)
+
+    return Path(output_path)
+
+
+def collect_batch_items(input_path: str, output_dir: Path) -> list[BatchItem]:
+    """Expand a directory or a glob pattern into the list of images to convert.
+
+    A directory selects the images directly inside it, a glob pattern selects
+    every matching file (``**`` is recursive). The outputs keep the path of
+    the inputs relative to the directory or to the non-pattern part of the
+    glob.
+
+    :param input_path: The directory or glob pattern given to --img.
+    :param output_dir: The directory where the converted images are written.
+    """
+    if is_glob_pattern(input_path):
+        base_parts = []
+        for part in Path(input_path).parts:
+            if is_glob_pattern(part):
+                break
+            base_parts.append(part)
+        base_dir = Path(*base_parts) if base_parts else Path(".")
+        paths = [Path(path) for path in glob.glob(input_path, recursive=True)]
+        paths = [path for path in paths if path.is_file()]
+    else:
+        base_dir = Path(input_path)
+        paths = [
+            path
+            for path in base_dir.iterdir()
+            if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS
+        ]
+
+    return [
+        BatchItem(input_path=path, output_path=output_dir / path.relative_to(base_dir))
+        for path in sorted(paths)
+    ]
+
+
+def _setup_converter(arguments, journal: Optional[BatchJournal] = None) -> None:
+    global _worker_converter, _worker_output_format, _worker_journal
+
+    from image_go_nord_client.main import create_converter
+
+    _worker_converter = create_converter(arguments)
+    _worker_output_format = arguments.output_format
+    _worker_journal = journal
+
+
+def _init_worker(arguments, journal: Optional[BatchJournal] = None) -> None:
+    logging.getLogger().setLevel(logging.WARNING)
+    _setup_converter(arguments, journal)
+
+
+@contextmanager
+def atomic_output(output_path: Union[str, Path]):
+    """Give a temporary path to write an output to, renamed to the output
+    path once written, so the output path never holds a partial image.
+
+    The temporary file has the extension of the output, which can give the
+    format of the image.
+    """
+    output_path = Path(output_path)
+    temp_path = output_path.with_name(
+        f".{output_path.name}.{secrets.token_hex(4)}{output_path.suffix}"
+    )
+    try:
+        yield temp_path
+        with open(temp_path, "rb") as file:
+            os.fsync(file.fileno())
+        os.replace(temp_path, output_path)
+    finally:
+        temp_path.unlink(missing_ok=True)
+
+
+def _convert_item(item: BatchItem) -> BatchResult:
+    paths = {"input": str(item.input_path), "output": str(item.output_path)}
+    try:
+        item.output_path.parent.mkdir(parents=True, exist_ok=True)
+        if _worker_journal:
+            _worker_journal.record(STARTED, **paths)
+
+        with atomic_output(item.output_path) as temp_path:
+            _worker_converter.convert_file(
+                item.input_path, temp_path, _worker_output_format
+            )
+    except Exception as error:
+        result = BatchResult(item=item, error=f"{type(error).__name__}: {error}")
+    else:
+        result = BatchResult(item=item)
+
+    if _worker_journal:
+        if result.error:
+            _worker_journal.record(FAILED, **paths, error=result.error)
+        else:
+            _worker_journal.record(DONE, **paths)
+
+    return result
+
+
+def _report_results(results: Iterable[BatchResult]) -> int:
+    failures = 0
+    for result in results:
+        if result.error:
+            failures += 1
+            logging.error(
+                "Failed to convert %s: %s", result.item.input_path, result.error
+            )
+
+    return failures
+
+
+def convert_batch_items(
+    arguments,
+    items: list[BatchItem],
+    jobs: int,
+    journal: Optional[BatchJournal] = None,
+) -> Iterator[BatchResult]:
+    """Convert images by a pool of jobs worker processes, every worker creates
+    its Converter once. The outputs are written to a
+    temporary file first, see atomic_output.
+
+    :param arguments: The parsed command line arguments.
+    :param items: The images to convert.
+    :param jobs: The number of worker processes.
+    :param journal: The journal where the workers record the conversions.
+    :return: The result of every item, in order.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if jobs == 1:
+        _setup_converter(arguments, journal)
+        yield from map(_convert_item, items)
+        return
+
+    if arguments.max_memory:
+        from image_go_nord_client.scheduler import convert_by_memory
+
+        yield from convert_by_memory(arguments, items, jobs, journal)
+        return
+
+    chunksize = max(1, len(items) // (jobs * 8))
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=_init_worker, initargs=(arguments, journal)
+    ) as executor:
+        yield from executor.map(_convert_item, items, chunksize=chunksize)
+
+
+def get_batch_jobs(arguments, items: list[BatchItem]) -> int:
+    """The number of worker processes converting some items."""
+    return max(1, min(arguments.jobs or os.cpu_count() or 1, len(items)))
+
+
+def run_batch(arguments) -> int:
+    """Convert every image selected by --img using a pool of worker processes.
+
+    Every worker creates its Converter once, a failure on one image is
+    reported and does not stop the others.
+
+    :param arguments: The parsed command line arguments.
+    :return: 0 if all the images were converted, 1 otherwise.
+    """
+    from image_go_nord_client.main import resolve_palette
+
+    if not resolve_palette(arguments):
+        return 1
+
+    output_dir = get_batch_output_dir(arguments.output_path)
+    items = collect_batch_items(arguments.input_path, output_dir)
+    if not items:
+        logging.warning("No images found in %s", arguments.input_path)
+        return 1
+
+    journal = BatchJournal(arguments.journal_path or get_journal_path(output_dir))
+    options = get_run_options(arguments)
+    journal.path.parent.mkdir(parents=True, exist_ok=True)
+    if arguments.resume:
+        if (items := get_remaining_items(journal, options, items)) is None:
+            return 1
+
+        if not items:
+            logging.info("Every image is already converted")
+            return 0
+    else:
+        journal.reset()
+
+    journal.record(RUN, options=options)
+    jobs = get_batch_jobs(arguments, items)
+    logging.info(
+        "Converting %s images with %s jobs into %s", len(items), jobs, output_dir
+    )
+    failures = _report_results(convert_batch_items(arguments, items, jobs, journal))
+
+    logging.info("Converted %s of %s images", len(items) - failures, len(items))
+    return 1 if failures else 0
+
+
+def get_run_options(arguments) -> str:
+    """The fingerprint of the images and of the options of a batch run."""
+    from image_go_nord_client.result_cache import get_arguments_conversion_options
+
+    options = {
+        "input": arguments.input_path,
+        "output": arguments.output_path,
+        "conversion": get_arguments_conversion_options(arguments, ""),
+    }
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode()).hexdigest()
+
+
+def get_remaining_items(
+    journal: BatchJournal, options: str, items: list[BatchItem]
+) -> Optional[list[BatchItem]]:
+    """The items of a resumed run that are not done yet.
+
+    :param journal: The journal of the run.
+    :param options: The fingerprint of the run, see get_run_options.
+    :param items: The items of the run.
+    :return: The items to convert, None if the journal is of another run.
+    """
+    journal_options, last_events = journal.get_state()
+    if journal_options is None:
+        logging.warning("No journal in %s, converting every image", journal.path)
+        return items
+
+    if journal_options != options:
+        logging.error("The journal %s is of a run with other options", journal.path)
+        return None
+
+    remaining = [
+        item
+        for item in items
+        if last_events.get(str(item.input_path)) != DONE
+        or not item.output_path.exists()
+    ]
+    logging.info(
+        "Resuming, %s of %s images already converted",
+        len(items) - len(remaining),
+        len(items),
+    )
+    return remaining
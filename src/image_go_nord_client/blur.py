@@ -0,0 +1,74 @@
+"""Gaussian blur of converted images by bands of rows.
+
+Pillow's GaussianBlur is already separable (three box blur passes on each
+axis), so every band of rows is blurred by Pillow together with the rows
+around it reached by the kernel, and the result is written back in place.
+The output is the same as blurring the whole image at once, the bands can be
+blurred by several threads as Pillow releases the GIL while filtering, and
+the bands of a single color are skipped.
+"""
+
+import math
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from image_go_nord_client.bands import get_bands, run_bands
+
+__ALL__ = ["blur_pixels", "get_blur_halo"]
+
+DEFAULT_BLUR_RADIUS = 1.0
+BLUR_PASSES = 3
+MIN_BAND_ROWS = 64
+
+
+def get_blur_halo(radius: float) -> int:
+    """The number of rows on each side of a pixel that change its blur.
+
+    :param radius: The standard deviation of the Gaussian blur.
+    """
+    # Every pass is a box blur of a radius up to the standard deviation.
+    return BLUR_PASSES * (math.ceil(radius) + 1)
+
+
+def blur_pixels(
+    pixels: np.ndarray, radius: float = DEFAULT_BLUR_RADIUS, threads: int = 1
+) -> np.ndarray:
+    """Blur an array (H, W, C) of uint8 pixels in place.
+
+    :param pixels: The pixels to blur, they are overwritten.
+    :param radius: The standard deviation of the Gaussian blur.
+    :param threads: The number of threads blurring the bands of rows.
+    :return: The pixels array.
+    """
+    halo = get_blur_halo(radius)
+    bands = get_bands(pixels.shape[0], threads, MIN_BAND_ROWS)
+
+    # The rows around every band are copied before any band is overwritten,
+    # so the bands can be blurred in any order.
+    halos = {
+        band.start: (
+            pixels[max(0, band.start - halo) : band.start].copy(),
+            pixels[band.stop : band.stop + halo].copy(),
+        )
+        for band in bands
+    }
+
+    def blur_band(band: slice) -> None:
+        band_pixels = pixels[band]
+        above, below = halos[band.start]
+        rows = band_pixels
+        if len(above) or len(below):
+            rows = np.concatenate([above, band_pixels, below])
+
+        # The first row is enough to tell most bands are not of a single color.
+        if (rows[0] == rows[0, 0]).all() and (rows == rows[0, 0]).all():
+            # The blur of a single color is the same color.
+            return
+
+        blurred = Image.fromarray(rows).filter(ImageFilter.GaussianBlur(radius))
+        first = len(above)
+        band_pixels[...] = np.asarray(blurred)[first : first + len(band_pixels)]
+
+    run_bands(blur_band, bands, threads)
+    return pixels
@@ -0,0 +1,545 @@
+"""Conversion of images in process, without the command line.
+
+A Converter is configured once with a palette and the conversion options, and
+then converts any number of images given as Pillow images, NumPy arrays or
+encoded bytes, with no argument parsing or palette lookup per image. It also
+converts image files, which the command line uses for all its conversions:
+animations frame by frame, big images by strips and, with a result cache,
+only the images not converted yet.
+
+A Converter can be shared by threads. The numpy engine only reads its
+settings while converting, so its conversions run concurrently. GoNord keeps
+some settings in class attributes shared by all its instances, so the
+conversions with the GoNord engine run one at a time.
+"""
+
+import logging
+import sys
+import threading
+from contextlib import nullcontext
+from functools import partial
+from io import BytesIO
+from pathlib import Path
+from typing import Optional, Sequence, Union
+
+from image_go_nord_client import (
+    STREAM_PATH,
+    Palette,
+    get_palette_dict,
+)
+from image_go_nord_client.lazy_import import LazyAttribute
+from image_go_nord_client.profiling import profile_stage
+
+__ALL__ = [
+    "Converter",
+    "configure_engine",
+    "create_go_nord",
+    "find_palette",
+    "open_image_file",
+    "save_image",
+]
+
+DEFAULT_PALETTE = "nord"
+# The command line keeps GoNord, the reference engine, as default so that its
+# outputs do not change between releases. The Converter is used by programs
+# converting many images, which need the numpy engine, faster and giving the
+# same images (see --verify).
+DEFAULT_ENGINE = "numpy"
+DEFAULT_OUTPUT_FORMAT = "PNG"
+
+# ImageGoNord loads Pillow, import it only when an image is converted so that
+# --help, --version and argument errors stay fast.
+GoNord = LazyAttribute("ImageGoNord", "GoNord")
+
+# GoNord shares the palette data of a conversion between its instances, see
+# the module docstring.
+_go_nord_lock = threading.Lock()
+
+
+def create_go_nord(engine: str = "gonord"):
+    """Create the object converting the images.
+
+    :param engine: "gonord" for ImageGoNord's GoNord, the reference
+        implementation, or "numpy" for the vectorized NumpyGoNord.
+    """
+    if engine == "numpy":
+        from image_go_nord_client.numpy_engine import NumpyGoNord
+
+        return NumpyGoNord()
+
+    go_nord = GoNord()
+    # A new GoNord resets the average box of the class, shared by all the
+    # instances, this one keeps its own.
+    go_nord.AVG_BOX_DATA = dict(go_nord.AVG_BOX_DATA)
+    return go_nord
+
+
+def open_image_file(go_nord, input_path: Union[str, Path], profiler=None):
+    """Open an image file, from stdin when the path is STREAM_PATH.
+    Animations are opened with all their frames, see convert_animation.
+
+    :param go_nord: The engine opening the still images.
+    :param profiler: A Profiler recording the decoding of the image.
+    :return: The Pillow image.
+    """
+    from image_go_nord_client.animation import open_animation
+
+    input_path = str(input_path)
+    with profile_stage(profiler, "decode"):
+        source = input_path
+        if input_path == STREAM_PATH:
+            source = BytesIO(sys.stdin.buffer.read())
+
+        if animation := open_animation(source):
+            return animation
+
+        if input_path == STREAM_PATH:
+            source.seek(0)
+
+        image = go_nord.open_image(source)
+        if profiler:
+            # Pillow decodes the image when it is first used.
+            image.load()
+
+    return image
+
+
+def save_image(image, output_path: str, image_format: Optional[str], save=None) -> None:
+    """Save a converted image, to stdout when the path is STREAM_PATH.
+
+    :param image: The converted Pillow image.
+    :param output_path: The path of the image.
+    :param image_format: The Pillow format of the image, or None to infer it
+        from the extension of the path.
+    :param save: The function saving the image to a path or a file object
+        with a format, image.save by default.
+    """
+    save = save or image.save
+    if output_path != STREAM_PATH:
+        save(output_path, image_format)
+        return
+
+    # Some formats seek back while saving, which stdout can not do.
+    buffer = BytesIO()
+    save(buffer, image_format)
+    sys.stdout.buffer.write(buffer.getbuffer())
+    sys.stdout.buffer.flush()
+
+
+def find_palette(
+    name: str,
+    colors: Sequence[str] = (),
+    palette_dirs: Sequence[Union[str, Path]] = (),
+) -> tuple[Palette, list[str]]:
+    """Find a palette and the color sets to use.
+
+    :param name: The name of the palette, case insensitive.
+    :param colors: The names of the color sets, all of them if empty.
+    :param palette_dirs: Directories of palettes to add to the known ones for
+        this lookup, their palettes replace the ones with the same name.
+    :return: The palette and the sorted color set names to use.
+    :raises ValueError: If the palette or one of the colors does not exist.
+    """
+    if not (palette := get_palette_dict(palette_dirs).get(name.lower())):
+        raise ValueError(f"No palette found with the name {name}")
+
+    all_colors_names = sorted([color.name for color in palette.colors])
+    if not set(colors).issubset(set(all_colors_names)):
+        raise ValueError(
+            f"Color {colors} not found, possible colors are {all_colors_names}"
+        )
+
+    return palette, list(colors) if colors else all_colors_names
+
+
+def configure_engine(
+    go_nord,
+    palette: Palette,
+    colors: Sequence[str],
+    enable_blur: bool = False,
+    blur_radius: Optional[float] = None,
+    enable_avg_pixels: bool = False,
+    disable_avg_pixels: bool = False,
+    pixels_area: Sequence = (),
+    threads: Optional[int] = None,
+    use_lookup_table: bool = False,
+    indexed_output: bool = False,
+) -> None:
+    """Apply a palette and the conversion options to a GoNord instance.
+
+    :param go_nord: The GoNord or NumpyGoNord instance to configure.
+    :param palette: The palette to convert the images to.
+    :param colors: The color sets of the palette to use.
+    :param enable_blur: Blur the converted images.
+    :param blur_radius: The radius of the blur, numpy engine only.
+    :param enable_avg_pixels: Average the pixels in a box before mapping
+        them to the palette.
+    :param disable_avg_pixels: Do not average the pixels.
+    :param pixels_area: The width and the height of the average box, the
+        height is the width when it is missing.
+    :param threads: The number of threads of a conversion, numpy engine only.
+    :param use_lookup_table: Map the colors with a lookup table, numpy engine
+        only.
+    :param indexed_output: Convert RGB images to palette images, numpy engine
+        only.
+    """
+    if enable_blur:
+        go_nord.enable_gaussian_blur()
+
+    if blur_radius:
+        go_nord.set_blur_radius(blur_radius)
+
+    if enable_avg_pixels:
+        go_nord.enable_avg_algorithm()
+
+    if disable_avg_pixels:
+        go_nord.disable_avg_algorithm()
+
+    if pixels_area:
+        w = pixels_area[0]
+        h = pixels_area[1] if len(pixels_area) > 1 else w
+        # GoNord iterates over the box, its size must be integers.
+        go_nord.set_avg_box_data(w=int(w), h=int(h))
+
+    if threads:
+        go_nord.set_threads(threads)
+
+    if use_lookup_table:
+        go_nord.enable_lookup_table()
+
+    if indexed_output:
+        go_nord.enable_indexed_output()
+
+    # The colors come from the palette registry, the engine does not read the
+    # color set files again.
+    go_nord.reset_palette()
+    palette_colors = {color.name: color for color in palette.colors}
+    for color in colors:
+        for hex_color in palette_colors[color].hex_colors:
+            go_nord.add_color_to_palette("#" + hex_color)
+
+
+class Converter:
+    """Convert images to a palette, configured once for many images."""
+
+    def __init__(
+        self,
+        palette: Union[str, Palette] = DEFAULT_PALETTE,
+        colors: Sequence[str] = (),
+        engine: str = DEFAULT_ENGINE,
+        enable_blur: bool = False,
+        blur_radius: Optional[float] = None,
+        enable_avg_pixels: bool = False,
+        disable_avg_pixels: bool = False,
+        pixels_area: Sequence = (),
+        threads: Optional[int] = None,
+        use_lookup_table: bool = False,
+        indexed_output: bool = False,
+        tile_memory: Optional[int] = None,
+        result_cache=None,
+        palette_dirs: Sequence[Union[str, Path]] = (),
+        go_nord=None,
+        profiler=None,
+    ):
+        """
+        :param palette: The name of the palette, or a Palette.
+        :param colors: The color sets of the palette, all of them if empty.
+        :param engine: "numpy" for the vectorized engine or "gonord" for
+            ImageGoNord's GoNord, the reference implementation.
+        :param tile_memory: Convert the image files by strips of rows using
+            about this many megabytes, numpy engine only.
+        :param result_cache: A ResultCache keeping the converted image files,
+            see convert_file.
+        :param palette_dirs: Directories of palettes to add to the known ones.
+        :param go_nord: A new instance of the engine to configure, created by
+            the Converter by default.
+        :param profiler: A Profiler recording the stages of the conversions.
+        :raises ValueError: If the palette or one of the colors does not
+            exist, or if an option is not supported by the engine.
+        """
+        if engine != "numpy" and (
+            blur_radius or threads or use_lookup_table or indexed_output or tile_memory
+        ):
+            raise ValueError(
+                "blur_radius, threads, use_lookup_table, indexed_output and "
+                "tile_memory need the numpy engine"
+            )
+
+        if indexed_output and enable_blur:
+            raise ValueError("The blur adds colors that are not in the palette")
+
+        if indexed_output and tile_memory:
+            raise ValueError("The images converted by strips can not be indexed")
+
+        if enable_avg_pixels and disable_avg_pixels:
+            raise ValueError("The average box can not be enabled and disabled")
+
+        if isinstance(palette, str):
+            palette, colors = find_palette(palette, colors, palette_dirs)
+        elif not colors:
+            colors = sorted(color.name for color in palette.colors)
+
+        self.palette = palette
+        self.colors = list(colors)
+        self.engine = engine
+        self.tile_memory = tile_memory
+        self.result_cache = result_cache
+        self.profiler = profiler
+        # The options changing the converted images, see get_cache_options.
+        self.options = {
+            "enable_blur": enable_blur,
+            "blur_radius": blur_radius,
+            "enable_avg_pixels": enable_avg_pixels,
+            "disable_avg_pixels": disable_avg_pixels,
+            "pixels_area": list(pixels_area),
+            "indexed_output": indexed_output,
+            "tile_memory": tile_memory,
+        }
+        self.lock = nullcontext() if engine == "numpy" else _go_nord_lock
+        with self.lock:
+            self.go_nord = go_nord or create_go_nord(engine)
+            configure_engine(
+                self.go_nord,
+                palette,
+                self.colors,
+                enable_blur=enable_blur,
+                blur_radius=blur_radius,
+                enable_avg_pixels=enable_avg_pixels,
+                disable_avg_pixels=disable_avg_pixels,
+                pixels_area=pixels_area,
+                threads=threads,
+                use_lookup_table=use_lookup_table,
+                indexed_output=indexed_output,
+            )
+            if engine == "numpy":
+                self.go_nord.set_profiler(profiler)
+
+    def convert_image(self, image, save_path: str = ""):
+        """Convert a Pillow image, the image is not changed.
+
+        :param image: The image to convert.
+        :param save_path: The path where to save the converted image, if any.
+        :return: The converted Pillow image.
+        """
+        with profile_stage(self.profiler, "convert"):
+            # The numpy engine converts palette images by their color table.
+            if self.engine == "numpy":
+                return self.go_nord.convert_image(image, save_path=save_path)
+
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+            with self.lock:
+                # GoNord converts the image in place.
+                return self.go_nord.convert_image(image.copy(), save_path=save_path)
+
+    def prepare_image(self, image, find_unique: bool = False):
+        """Do the part of the conversion of a Pillow image that does not
+        depend on the palette, to convert it with several Converters of the
+        numpy engine having the same options, see convert_prepared_image.
+
+        :param find_unique: Find the distinct colors of the image, worth it
+            when the image is converted to several palettes.
+        """
+        return self.go_nord.prepare_image(image, find_unique=find_unique)
+
+    def convert_prepared_image(self, prepared):
+        """Convert an image prepared by prepare_image.
+
+        :return: The converted Pillow image.
+        """
+        with profile_stage(self.profiler, "convert"):
+            return self.go_nord.convert_prepared_image(prepared)
+
+    def convert_pixels(self, pixels):
+        """Convert an array (H, W, 3) or (H, W, 4) of uint8 pixels.
+
+        :return: A new array with the converted pixels.
+        """
+        import numpy as np
+        from PIL import Image
+
+        if self.engine != "numpy":
+            return np.asarray(self.convert_image(Image.fromarray(pixels)))
+
+        from image_go_nord_client.blur import blur_pixels
+
+        with profile_stage(self.profiler, "convert"):
+            converted = self.go_nord.convert_pixels(pixels)
+            if self.go_nord.use_gaussian_blur:
+                with profile_stage(self.profiler, "blur"):
+                    blur_pixels(
+                        converted, self.go_nord.blur_radius, self.go_nord.threads
+                    )
+
+        return converted
+
+    def convert_bytes(self, data: bytes, output_format: Optional[str] = None) -> bytes:
+        """Convert an encoded image, like the content of a PNG file.
+
+        :param data: The encoded image.
+        :param output_format: The Pillow format of the converted image, the
+            format of the input image by default.
+        :return: The encoded converted image.
+        """
+        from PIL import Image
+
+        with profile_stage(self.profiler, "decode"):
+            image = Image.open(BytesIO(data))
+            image.load()
+        output_format = output_format or image.format or DEFAULT_OUTPUT_FORMAT
+        converted = self.convert_image(image)
+
+        with profile_stage(self.profiler, "encode"):
+            buffer = BytesIO()
+            converted.save(buffer, format=output_format)
+            return buffer.getvalue()
+
+    def convert(self, image, output_format: Optional[str] = None):
+        """Convert a Pillow image, a NumPy array or an encoded image.
+
+        :param image: The image to convert.
+        :param output_format: The Pillow format of the converted image, for
+            encoded images only.
+        :return: The converted image, of the same type as the image.
+        """
+        if isinstance(image, (bytes, bytearray, memoryview)):
+            return self.convert_bytes(bytes(image), output_format)
+
+        if hasattr(image, "__array_interface__") and not hasattr(image, "mode"):
+            return self.convert_pixels(image)
+
+        return self.convert_image(image)
+
+    def get_cache_options(
+        self, output_path: Union[str, Path], output_format: Optional[str] = None
+    ) -> dict:
+        """The options that can change an image file converted by convert_file,
+        the key of the result cache with the bytes of the input image."""
+        from image_go_nord_client.result_cache import get_conversion_options
+
+        return get_conversion_options(
+            self.palette,
+            self.colors,
+            self.engine,
+            self.options,
+            output_path,
+            output_format,
+        )
+
+    def open_file(self, input_path: Union[str, Path]):
+        """Open an image file, see open_image_file."""
+        return open_image_file(self.go_nord, input_path, self.profiler)
+
+    def convert_file(
+        self,
+        input_path: Union[str, Path],
+        output_path: Union[str, Path],
+        output_format: Optional[str] = None,
+        image=None,
+    ) -> None:
+        """Convert an image file, read from stdin or written to stdout when
+        its path is STREAM_PATH.
+
+        Animations are converted frame by frame, and with tile_memory the
+        images are read and written by strips when their format allows it.
+        With a result cache, an image already converted with the same options
+        is copied from the cache.
+
+        :param output_format: The Pillow format of the converted image, from
+            the extension of the output path by default.
+        :param image: The input image, if already opened with open_file.
+        """
+        # The key is read from the bytes of the file, the image is opened
+        # only when it is not in the cache.
+        key = self.get_cache_key(input_path, output_path, output_format)
+        if self.fetch_cached(key, output_path):
+            return
+
+        self.convert_file_without_cache(input_path, output_path, output_format, image)
+        self.store_cached(key, output_path)
+
+    def get_cache_key(
+        self,
+        input_path: Union[str, Path],
+        output_path: Union[str, Path],
+        output_format: Optional[str] = None,
+    ) -> Optional[str]:
+        """The key of the conversion of an image file in the result cache.
+
+        :return: None without a result cache or when a path is STREAM_PATH,
+            the conversion is not cached.
+        """
+        input_path, output_path = str(input_path), str(output_path)
+        if not self.result_cache or STREAM_PATH in (input_path, output_path):
+            return None
+
+        return self.result_cache.get_key(
+            input_path, self.get_cache_options(output_path, output_format)
+        )
+
+    def fetch_cached(self, key: Optional[str], output_path: Union[str, Path]) -> bool:
+        """Copy the converted image of a key from the result cache.
+
+        :param key: The key of get_cache_key.
+        :return: False if the conversion is not cached or not in the cache.
+        """
+        if key is None or not self.result_cache.fetch(key, output_path):
+            return False
+
+        logging.info("Copied from the result cache: %s", output_path)
+        return True
+
+    def store_cached(self, key: Optional[str], output_path: Union[str, Path]) -> None:
+        """Store a converted image file in the result cache.
+
+        :param key: The key of get_cache_key, nothing is stored if None.
+        """
+        if key is not None:
+            self.result_cache.store(key, output_path)
+
+    def convert_file_without_cache(
+        self,
+        input_path: Union[str, Path],
+        output_path: Union[str, Path],
+        output_format: Optional[str] = None,
+        image=None,
+    ) -> None:
+        """Convert an image file as convert_file, without the result cache."""
+        input_path, output_path = str(input_path), str(output_path)
+        if self.tile_memory:
+            from image_go_nord_client.tiled import MEGABYTE, convert_image_tiled
+
+            with profile_stage(self.profiler, "convert"):
+                convert_image_tiled(
+                    self.go_nord,
+                    input_path,
+                    output_path,
+                    self.tile_memory * MEGABYTE,
+                )
+            return
+
+        from image_go_nord_client.animation import convert_animation, is_animation
+
+        if image is None:
+            image = self.open_file(input_path)
+
+        if is_animation(image):
+            # The frames are decoded and converted one after the other.
+            with profile_stage(self.profiler, "convert"), self.lock:
+                save_image(
+                    image,
+                    output_path,
+                    output_format,
+                    partial(convert_animation, self.go_nord, image),
+                )
+            return
+
+        # The profile times the encoding apart from the conversion.
+        if output_path == STREAM_PATH or output_format or self.profiler:
+            converted = self.convert_image(image)
+            with profile_stage(self.profiler, "encode"):
+                save_image(converted, output_path, output_format)
+            return
+
+        self.convert_image(image, save_path=output_path)
@@ -0,0 +1,374 @@
+"""Conversion daemon on a Unix socket.
+
+``image-go-nord-client serve`` runs a long lived daemon converting images for
+the client: the palettes, the lookup tables and the imaging stack are loaded
+once by its worker processes and stay warm between the jobs.
+
+A job is a JSON line with the command line arguments of the client, its
+working directory and the environment variables read by the conversion
+(palette and cache directories), applied by the worker running the job, so
+the daemon converts as the client would. The answer is a JSON line with the exit code and the log
+of the conversion. The jobs run on a bounded pool of worker processes with a
+limited queue, when the queue is full the job is refused as busy and the
+client converts the image by itself.
+
+Only the user running the daemon can use it: the socket is readable and
+writable by its owner only, and the jobs of the connections of other users
+are refused where the system tells the user of the peer (SO_PEERCRED).
+"""
+
+import argparse
+import json
+import logging
+import os
+import socket
+import signal
+import socketserver
+import struct
+import sys
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+from image_go_nord_client import SERVE_COMMAND
+
+__ALL__ = ["ConversionDaemon", "forward_to_daemon", "get_socket_path", "serve"]
+
+SOCKET_ENV = "IMAGE_GO_NORD_SOCKET"
+DEFAULT_QUEUE_SIZE = 16
+# Jobs are small, the answer is sent once the conversion is done.
+MAX_REQUEST_SIZE = 1024 * 1024
+CONNECT_TIMEOUT_SECONDS = 1.0
+
+STATUS_DONE = "done"
+STATUS_BUSY = "busy"
+# Variables of the client applied to its jobs: the palette directories and
+# the directories of the lookup tables and of the results cache.
+FORWARDED_ENV = (
+    "IMAGE_GO_NORD_PALETTES",
+    "IMAGE_GO_NORD_CACHE_DIR",
+    "XDG_CACHE_HOME",
+    "HOME",
+)
+
+
+def get_socket_path() -> Path:
+    """The path of the daemon socket, $IMAGE_GO_NORD_SOCKET or a socket of
+    the user in the runtime directory."""
+    if socket_path := os.environ.get(SOCKET_ENV):
+        return Path(socket_path)
+
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return Path(runtime_dir) / f"image-go-nord-client-{os.getuid()}.sock"
+
+
+def send_request(socket_path: Union[str, Path], request: dict) -> dict:
+    """Send a request to the daemon and wait for its answer."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.settimeout(CONNECT_TIMEOUT_SECONDS)
+        client.connect(str(socket_path))
+        # The conversion can take any time, only the connection has a timeout.
+        client.settimeout(None)
+        client.sendall(json.dumps(request).encode() + b"\n")
+        with client.makefile("rb") as answer:
+            return json.loads(answer.readline())
+
+
+def get_forwarded_environment() -> dict[str, Optional[str]]:
+    """The variables of the environment sent with a job, None when unset."""
+    return {name: os.environ.get(name) for name in FORWARDED_ENV}
+
+
+def apply_environment(env: dict[str, Optional[str]]) -> None:
+    """Set the forwarded variables of a job in the environment."""
+    for name in FORWARDED_ENV:
+        if (value := env.get(name)) is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+
+def is_valid_answer(answer) -> bool:
+    if not isinstance(answer, dict):
+        return False
+
+    if answer.get("status") == STATUS_BUSY:
+        return True
+
+    return (
+        answer.get("status") == STATUS_DONE
+        and type(answer.get("exit_code")) is int
+        and isinstance(answer.get("output"), str)
+    )
+
+
+def forward_to_daemon(argv: list[str], quiet: bool = False) -> Optional[int]:
+    """Convert with the daemon when it is running.
+
+    :param argv: The command line arguments of the client.
+    :param quiet: Do not print the log of the conversion.
+    :return: The exit code of the conversion, or None if the daemon is not
+        running or is busy and the client has to convert by itself.
+    """
+    socket_path = get_socket_path()
+    try:
+        # The socket can be in the shared temporary directory, a socket of
+        # another user would get the images of the client.
+        if socket_path.stat().st_uid != os.getuid():
+            logging.warning("Not using %s, owned by another user", socket_path)
+            return None
+
+        answer = send_request(
+            socket_path,
+            {"argv": argv, "cwd": os.getcwd(), "env": get_forwarded_environment()},
+        )
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as error:
+        logging.debug("Daemon not available at %s: %s", socket_path, error)
+        return None
+
+    if not is_valid_answer(answer):
+        logging.warning("Invalid answer of the daemon, converting without it")
+        return None
+
+    if answer["status"] == STATUS_BUSY:
+        logging.info("The daemon is busy, converting without it")
+        return None
+
+    if not quiet:
+        sys.stderr.write(answer["output"])
+    return answer["exit_code"]
+
+
+def run_job(
+    argv: list[str], cwd: str, env: dict[str, Optional[str]]
+) -> tuple[int, str]:
+    """Run the client in a worker process of the daemon, in the working
+    directory and with the environment variables of the client.
+
+    :return: The exit code and the log of the client.
+    """
+    from contextlib import redirect_stderr, redirect_stdout
+    from io import StringIO
+
+    from image_go_nord_client.main import main
+    from image_go_nord_client.palette_registry import clear_user_registries
+
+    # A worker runs a single job at a time, it can change its directory and
+    # its environment. The palette directories of the previous jobs are
+    # dropped, a job sees only its own.
+    os.chdir(cwd)
+    apply_environment(env)
+    clear_user_registries()
+    output = StringIO()
+    handler = logging.StreamHandler(output)
+    handler.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+    root_logger = logging.getLogger()
+    handlers, root_logger.handlers = root_logger.handlers, [handler]
+    try:
+        with redirect_stdout(output), redirect_stderr(output):
+            try:
+                exit_code = main(argv)
+            except SystemExit as error:
+                exit_code = error.code if isinstance(error.code, int) else 1
+            except Exception:
+                logging.exception("Failed to convert")
+                exit_code = 1
+    finally:
+        root_logger.handlers = handlers
+
+    return exit_code or 0, output.getvalue()
+
+
+def get_peer_uid(connection: socket.socket) -> Optional[int]:
+    """The user id of the process at the other end of a Unix socket, None if
+    the system does not tell it."""
+    if not hasattr(socket, "SO_PEERCRED"):
+        return None
+
+    credentials = connection.getsockopt(
+        socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i")
+    )
+    _, uid, _ = struct.unpack("3i", credentials)
+    return uid
+
+
+def _init_worker() -> None:
+    # Load the imaging stack and the palettes before the first job.
+    import ImageGoNord  # noqa: F401
+
+    from image_go_nord_client import numpy_engine  # noqa: F401
+    from image_go_nord_client.palette_registry import get_palette_registry
+
+    get_palette_registry().get_palettes()
+
+
+class _JobHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        daemon = self.server.conversion_daemon
+        try:
+            request = json.loads(self.rfile.readline(MAX_REQUEST_SIZE))
+            argv, cwd = list(request["argv"]), str(request["cwd"])
+            env = {
+                name: None if value is None else str(value)
+                for name, value in dict(request.get("env", {})).items()
+            }
+        except (ValueError, KeyError, TypeError):
+            logging.warning("Invalid request refused")
+            return
+
+        answer = daemon.run(argv, cwd, env)
+        self.wfile.write(json.dumps(answer).encode() + b"\n")
+
+
+class _UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self) -> None:
+        super().server_bind()
+        # Before listening, no connection can be accepted with the
+        # permissions of the umask.
+        os.chmod(self.server_address, 0o600)
+
+    def verify_request(self, request, client_address) -> bool:
+        uid = get_peer_uid(request)
+        if uid is not None and uid != os.getuid():
+            logging.warning("Refused a job of the user %s", uid)
+            return False
+
+        return True
+
+
+class ConversionDaemon:
+    """Run the jobs of the clients on a bounded pool of worker processes."""
+
+    def __init__(
+        self,
+        socket_path: Union[str, Path],
+        workers: int,
+        queue_size: int = DEFAULT_QUEUE_SIZE,
+    ):
+        """
+        :param socket_path: The path of the Unix socket.
+        :param workers: The number of worker processes.
+        :param queue_size: The number of jobs waiting for a worker, beyond it
+            the jobs are refused as busy.
+        """
+        from concurrent.futures import ProcessPoolExecutor
+        from multiprocessing import get_context
+
+        self.socket_path = Path(socket_path)
+        self.slots = threading.BoundedSemaphore(workers + queue_size)
+        # The workers are started while the server threads run, spawn them
+        # instead of forking a multithreaded process.
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+        )
+        self.server = _UnixServer(str(self.socket_path), _JobHandler)
+        self.server.conversion_daemon = self
+
+    def run(self, argv: list[str], cwd: str, env: dict[str, Optional[str]]) -> dict:
+        """Run a job, or refuse it when the queue is full."""
+        if not self.slots.acquire(blocking=False):
+            return {"status": STATUS_BUSY, "exit_code": None, "output": ""}
+
+        try:
+            exit_code, output = self.executor.submit(run_job, argv, cwd, env).result()
+        finally:
+            self.slots.release()
+
+        return {"status": STATUS_DONE, "exit_code": exit_code, "output": output}
+
+    def serve_forever(self) -> None:
+        self.server.serve_forever()
+
+    def shutdown(self) -> None:
+        """Stop serving, wait the running jobs and remove the socket."""
+        self.server.shutdown()
+        self.server.server_close()
+        self.executor.shutdown()
+        self.socket_path.unlink(missing_ok=True)
+
+
+def is_daemon_running(socket_path: Union[str, Path]) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        try:
+            client.connect(str(socket_path))
+        except OSError:
+            return False
+
+    return True
+
+
+def get_serve_argument_parser() -> argparse.ArgumentParser:
+    from image_go_nord_client import parse_positive_int
+
+    parser = argparse.ArgumentParser(
+        prog=f"image-go-nord-client {SERVE_COMMAND}",
+        description="Run a daemon converting the images of the client.",
+    )
+    parser.add_argument(
+        "--socket",
+        type=Path,
+        dest="socket_path",
+        metavar="PATH",
+        default=None,
+        help=f"path of the Unix socket (default: ${SOCKET_ENV} or a socket in "
+        "the user runtime directory)",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=parse_positive_int,
+        dest="workers",
+        metavar="N",
+        default=None,
+        help="number of worker processes (default: cpu count)",
+    )
+    parser.add_argument(
+        "--queue-size",
+        type=int,
+        dest="queue_size",
+        metavar="N",
+        default=DEFAULT_QUEUE_SIZE,
+        help="number of jobs waiting for a worker before the next ones are "
+        f"refused (default: {DEFAULT_QUEUE_SIZE})",
+    )
+    return parser
+
+
+def serve(argv: list[str]) -> int:
+    """Run the daemon until it is interrupted.
+
+    :param argv: The arguments after the serve command.
+    """
+    arguments = get_serve_argument_parser().parse_args(argv)
+    socket_path = arguments.socket_path or get_socket_path()
+    if socket_path.exists():
+        if is_daemon_running(socket_path):
+            logging.error("A daemon is already running on %s", socket_path)
+            return 1
+
+        # Left by a daemon that did not stop cleanly.
+        socket_path.unlink()
+
+    def stop(signal_number, frame):
+        raise KeyboardInterrupt
+
+    signal.signal(signal.SIGTERM, stop)
+
+    workers = arguments.workers or os.cpu_count() or 1
+    daemon = ConversionDaemon(socket_path, workers, max(arguments.queue_size, 0))
+    logging.info("Serving on %s with %s workers", socket_path, workers)
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        logging.info("Stopping the daemon")
+    finally:
+        daemon.shutdown()
+
+    return 0
@@ -0,0 +1,95 @@
+"""Conversion of a single image to several palettes (--target).
+
+The image is decoded once and, on the numpy engine, the part of the
+conversion that does not depend on the palette (the average box, the unique
+colors) is computed once and shared by all the targets. Animations are
+converted frame by frame for every target. With a result cache, the targets
+already converted are copied from it and the image is decoded only if one of
+them is missing.
+"""
+
+import logging
+from argparse import Namespace
+
+from image_go_nord_client import Target
+
+__ALL__ = ["run_targets"]
+
+
+def get_target_arguments(arguments, target: Target) -> Namespace:
+    """The arguments of a single conversion to a target.
+
+    :param arguments: The parsed command line arguments.
+    :param target: The target of the conversion.
+    """
+    return Namespace(
+        **{
+            **vars(arguments),
+            "palette": target.palette,
+            "colors": target.colors,
+            "output_path": target.output_path,
+        }
+    )
+
+
+def run_targets(arguments) -> int:
+    """Convert the input image to every target of the arguments.
+
+    :param arguments: The parsed command line arguments.
+    :return: The exit code, 1 if a palette of the targets can not be used or
+        a conversion fails.
+    """
+    from image_go_nord_client.animation import is_animation
+    from image_go_nord_client.converter import save_image
+    from image_go_nord_client.main import create_converter
+
+    targets_arguments = [
+        get_target_arguments(arguments, target) for target in arguments.targets
+    ]
+    # Check all the palettes before doing any work.
+    converters = []
+    for target_arguments in targets_arguments:
+        if not (converter := create_converter(target_arguments)):
+            return 1
+        converters.append(converter)
+
+    image = None
+    prepared = None
+    failures = 0
+    for converter, target_arguments in zip(converters, targets_arguments):
+        output_path = target_arguments.output_path
+        try:
+            key = converter.get_cache_key(
+                arguments.input_path, output_path, arguments.output_format
+            )
+            if converter.fetch_cached(key, output_path):
+                continue
+
+            if image is None:
+                image = converters[0].open_file(arguments.input_path)
+                logging.info("Loading input image: %s", arguments.input_path)
+
+            if is_animation(image) or arguments.engine != "numpy":
+                converter.convert_file_without_cache(
+                    arguments.input_path, output_path, arguments.output_format, image
+                )
+            else:
+                # The targets differ only by their palettes.
+                if prepared is None:
+                    prepared = converter.prepare_image(
+                        image, find_unique=len(targets_arguments) > 1
+                    )
+                converted = converter.convert_prepared_image(prepared)
+                save_image(converted, output_path, arguments.output_format)
+            converter.store_cached(key, output_path)
+        except Exception as error:
+            failures += 1
+            logging.error(
+                "Failed to convert %s: %s: %s", output_path, type(error).__name__, error
+            )
+            continue
+
+        logging.info("Saved image: %s", output_path)
+
+    logging.info("Converted the image to %s targets", len(targets_arguments) - failures)
+    return 1 if failures else 0
@@ -0,0 +1,91 @@
+"""Append-only journal of a batch run, to resume it after a crash.
+
+Every batch run writes a line of JSON to its journal when it starts, with the
+fingerprint of its options, and the workers write a line when they start to
+convert an image and when they are done with it or failed. A line is written
+by a single write on a file opened in append mode and synced to the disk, so
+the lines of the workers never mix and a killed run loses at most the line it
+was writing.
+
+A run resumed with --resume reads the journal and converts only the images
+that are not done, the ones in progress or failed when the run stopped
+included. The journal of a batch is kept in the cache directory of the
+client, under a name given by its output directory, unless --journal is used.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Optional, Union
+
+__ALL__ = ["BatchJournal", "get_journal_path"]
+
+JOURNALS_DIR = "journals"
+RUN = "run"
+STARTED = "started"
+DONE = "done"
+FAILED = "failed"
+
+
+def get_journal_path(output_dir: Union[str, Path]) -> Path:
+    """The default path of the journal of the batches writing to a directory."""
+    from image_go_nord_client.lookup_table import get_cache_dir
+
+    name = hashlib.sha256(str(Path(output_dir).resolve()).encode()).hexdigest()
+    return get_cache_dir() / JOURNALS_DIR / f"{name[:32]}.jsonl"
+
+
+class BatchJournal:
+    """The journal of the runs of a batch."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+
+    def reset(self) -> None:
+        """Start a new journal, for a run that is not resumed."""
+        self.path.write_text("")
+
+    def record(self, event: str, **fields) -> None:
+        """Append an event to the journal.
+
+        :param event: RUN, STARTED, DONE or FAILED.
+        :param fields: The data of the event, like the input path.
+        """
+        line = json.dumps({"event": event, "time": time.time(), **fields}) + "\n"
+        with open(self.path, "a") as file:
+            file.write(line)
+            file.flush()
+            os.fsync(file.fileno())
+
+    def read(self) -> list[dict]:
+        """The events of the journal, none if it does not exist."""
+        try:
+            lines = self.path.read_text().splitlines()
+        except FileNotFoundError:
+            return []
+
+        events = []
+        for line in lines:
+            try:
+                events.append(json.loads(line))
+            except ValueError:
+                # The last line of a killed run can be cut.
+                logging.debug("Skipped a cut line of the journal %s", self.path)
+
+        return events
+
+    def get_state(self) -> tuple[Optional[str], dict[str, str]]:
+        """The options of the first run of the journal and the last event of
+        every input path."""
+        options = None
+        last_events = {}
+        for event in self.read():
+            if event["event"] == RUN:
+                options = options or event["options"]
+            else:
+                last_events[event["input"]] = event["event"]
+
+        return options, last_events
@@ -0,0 +1,26 @@
+from importlib import import_module
+from typing import Any
+
+__ALL__ = ["LazyAttribute"]
+
+
+class LazyAttribute:
+    """Stand-in for a module attribute that imports the module on first use.
+
+    Calling it calls the real attribute, so a class can be replaced by a
+    LazyAttribute and instantiated as usual without paying its import cost
+    until an instance is really needed.
+    """
+
+    def __init__(self, module_name: str, attribute_name: str):
+        self.module_name = module_name
+        self.attribute_name = attribute_name
+
+    def load(self) -> Any:
+        return getattr(import_module(self.module_name), self.attribute_name)
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"<lazy {self.module_name}.{self.attribute_name}>"
@@ -0,0 +1,139 @@
+"""RGB to palette lookup tables.
+
+A lookup table stores the index of the nearest palette color of every one of
+the 2^24 rgb colors, so converting a pixel is a single indexed read. Building
+one takes a couple of seconds, so the tables are saved in the user cache
+directory and reused by the following runs with the same palette colors.
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+
+__ALL__ = ["get_cache_dir", "get_lookup_table", "lookup_palette_indices"]
+
+CACHE_DIR_ENV = "IMAGE_GO_NORD_CACHE_DIR"
+LOOKUP_TABLES_DIR = "lookup-tables"
+# Change it when the content of the tables changes to ignore the old ones.
+LOOKUP_TABLE_VERSION = "1"
+RED_LEVELS_PER_STEP = 16
+
+_lookup_table_lock = threading.Lock()
+
+
+def get_cache_dir() -> Path:
+    """The directory where the client keeps its cache, $IMAGE_GO_NORD_CACHE_DIR
+    or image-go-nord-client in the user cache directory."""
+    if cache_dir := os.environ.get(CACHE_DIR_ENV):
+        return Path(cache_dir)
+
+    user_cache_dir = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(user_cache_dir) / "image-go-nord-client"
+
+
+def get_lookup_table_key(palette_names: list[str]) -> str:
+    """The cache key of the lookup table of a palette.
+
+    :param palette_names: The hex codes of the palette colors, in palette
+        order, as read from the palette files.
+    """
+    content = "\n".join([LOOKUP_TABLE_VERSION, *palette_names])
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def build_lookup_table(palette: np.ndarray) -> np.ndarray:
+    """Compute the nearest palette color of every rgb color.
+
+    :param palette: Array (P, 3) of the palette colors, on ties the first
+        one wins.
+    :return: Array (2^24,) of palette indices, indexed by (r << 16 | g << 8 | b).
+    """
+    dtype = np.uint8 if len(palette) <= 256 else np.uint16
+    table = np.empty(1 << 24, dtype=dtype)
+    levels = np.arange(256, dtype=np.int16)
+    palette = palette.astype(np.int16)
+
+    for red_start in range(0, 256, RED_LEVELS_PER_STEP):
+        reds = levels[red_start : red_start + RED_LEVELS_PER_STEP]
+        best_distances = np.full(
+            (len(reds), 256, 256), np.iinfo(np.int16).max, dtype=np.int16
+        )
+        best_indices = np.zeros(best_distances.shape, dtype=dtype)
+        for index, (red, green, blue) in enumerate(palette):
+            distances = (
+                np.abs(reds - red)[:, None, None]
+                + np.abs(levels - green)[None, :, None]
+                + np.abs(levels - blue)[None, None, :]
+            )
+            closer = distances < best_distances
+            best_distances[closer] = distances[closer]
+            best_indices[closer] = index
+
+        table[red_start << 16 : (red_start + len(reds)) << 16] = best_indices.ravel()
+
+    return table
+
+
+def _save_lookup_table(table: np.ndarray, path: Path) -> None:
+    # Write and rename so that other processes never read a partial table.
+    path.parent.mkdir(parents=True, exist_ok=True)
+    file_descriptor, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "wb") as file:
+            np.save(file, table)
+        os.replace(temp_path, path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+
+@lru_cache(maxsize=16)
+def _load_lookup_table(key: str, palette_bytes: bytes, cache_dir: Path) -> np.ndarray:
+    path = cache_dir / LOOKUP_TABLES_DIR / f"{key}.npy"
+    if path.exists():
+        try:
+            return np.load(path)
+        except (OSError, ValueError):
+            pass
+
+    palette = np.frombuffer(palette_bytes, dtype=np.int16).reshape(-1, 3)
+    table = build_lookup_table(palette)
+    try:
+        _save_lookup_table(table, path)
+    except OSError:
+        pass
+
+    return table
+
+
+def get_lookup_table(palette_names: list[str], palette: np.ndarray) -> np.ndarray:
+    """Get the lookup table of a palette, from memory, from the cache directory
+    or building it.
+
+    :param palette_names: The hex codes of the palette colors.
+    :param palette: Array (P, 3) of the palette colors.
+    """
+    # The threads converting an image ask for the same table at once, only
+    # the first one builds it.
+    with _lookup_table_lock:
+        return _load_lookup_table(
+            get_lookup_table_key(palette_names),
+            palette.astype(np.int16).tobytes(),
+            get_cache_dir(),
+        )
+
+
+def lookup_palette_indices(colors: np.ndarray, table: np.ndarray) -> np.ndarray:
+    """Find the nearest palette color of every color with a lookup table.
+
+    :param colors: Array (N, 3) of rgb colors.
+    :param table: The lookup table of the palette.
+    :return: Array (N,) of indices in the palette.
+    """
+    colors = colors.astype(np.intp)
+    return table[colors[:, 0] << 16 | colors[:, 1] << 8 | colors[:, 2]]
@@ -2,74 +2,319 @@
 
 import logging
 import sys
-from typing import Union
+from pathlib import Path
+from typing import Optional, Union
 
-from ImageGoNord import GoNord
-
-from image_go_nord_client import get_argument_parser, get_palette_dict
+from image_go_nord_client import (
+    SERVE_COMMAND,
+    STREAM_PATH,
+    SYNC_COMMAND,
+    WORKER_COMMAND,
+    Palette,
+    get_argument_parser,
+)
+from image_go_nord_client.batch import is_batch_input, run_batch
+from image_go_nord_client.converter import Converter, create_go_nord, find_palette
+from image_go_nord_client.fanout import run_targets
+from image_go_nord_client.profiling import run_profiled
+from image_go_nord_client.verify import verify_engine
 
 __ALL__ = ["main"]
 
+# Formats of palette images written by --indexed, by output extension.
+EXTENSION_FORMATS = {
+    ".png": "PNG",
+    ".gif": "GIF",
+    ".bmp": "BMP",
+    ".tif": "TIFF",
+    ".tiff": "TIFF",
+}
+INDEXED_FORMATS = set(EXTENSION_FORMATS.values())
+
 logging.basicConfig(
     level=logging.INFO,
     format="[%(levelname)s] %(message)s",
 )
 
 
-def main(argv: Union[list[str], None] = None):
+def resolve_palette(arguments) -> Optional[tuple[Palette, list[str]]]:
+    """Find the palette and the color sets selected by the arguments.
 
-    if argv is None:
-        argv = sys.argv.copy()
+    :param arguments: The parsed command line arguments.
+    :return: The palette and the sorted color set names to use, or None if
+        the palette or one of the colors does not exist.
+    """
+    try:
+        return find_palette(arguments.palette, arguments.colors, arguments.palette_dirs)
+    except ValueError as error:
+        logging.warning("%s", error)
+        return None
 
-    parser = get_argument_parser()
-    arguments, _ = parser.parse_known_args(argv.copy())
-    if arguments.quiet_mode:
-        logging.basicConfig(level=logging.CRITICAL)
 
-    go_nord = GoNord()
+def get_engine_options(arguments) -> dict:
+    """The conversion options of the arguments, see Converter."""
+    return {
+        "enable_blur": arguments.enable_blur,
+        "blur_radius": arguments.blur_radius,
+        "enable_avg_pixels": arguments.enable_avg_pixels,
+        "disable_avg_pixels": arguments.disable_avg_pixels,
+        "pixels_area": arguments.pixels_area,
+        "threads": arguments.threads,
+        "use_lookup_table": arguments.use_lookup_table,
+        "indexed_output": arguments.indexed_output,
+        "tile_memory": arguments.tile_memory,
+    }
 
-    image = go_nord.open_image(arguments.input_path)
-    logging.info("Loading input image: %s", arguments.input_path)
-
-    output_image_path = arguments.output_path
-    logging.info("Set output image name: %s", output_image_path)
 
+def log_engine_options(arguments) -> None:
     if arguments.enable_blur:
-        go_nord.enable_gaussian_blur()
         logging.info("Blur enabled")
 
+    if arguments.blur_radius:
+        logging.info("Set up blur radius: %s", arguments.blur_radius)
+
+    if arguments.enable_avg_pixels:
+        logging.info("Average pixels enabled")
+
     if arguments.disable_avg_pixels:
-        go_nord.disable_avg_algorithm()
         logging.info("No average pixels selected for algorithm optimization")
 
+    if arguments.pixels_area and not arguments.enable_avg_pixels:
+        logging.warning("--pixels-area has no effect without --avg")
+
     if arguments.pixels_area:
         w = arguments.pixels_area[0]
         h = arguments.pixels_area[1] if len(arguments.pixels_area) > 1 else w
-        go_nord.set_avg_box_data(w=w, h=h)
         logging.info("Set up pixels width area: %s", w)
         logging.info("Set up pixels height area: %s", h)
 
-    if not (selected_palette := get_palette_dict().get(arguments.palette)):
-        logging.warning("No palette found with the name %s", arguments.palette)
-        return 1
+    if arguments.threads:
+        logging.info("Set up threads: %s", arguments.threads)
+
+    if arguments.use_lookup_table:
+        logging.info("Lookup table enabled")
+
+    if arguments.indexed_output:
+        logging.info("Indexed output enabled")
+
+
+def create_converter(arguments, go_nord=None, profiler=None) -> Optional[Converter]:
+    """Create the Converter of the arguments, every conversion of the command
+    line goes through it.
+
+    :param arguments: The parsed command line arguments.
+    :param go_nord: The instance of the engine to use, if already created.
+    :param profiler: The Profiler recording the stages of the conversions.
+    :return: None if the selected palette can not be used.
+    """
+    from image_go_nord_client.result_cache import get_result_cache
+
+    log_engine_options(arguments)
+    if not (resolved := resolve_palette(arguments)):
+        return None
 
+    selected_palette, selected_colors = resolved
     logging.info("Use palette set: %s", selected_palette.name.capitalize())
-    go_nord.reset_palette()
-    go_nord.set_palette_lookup_path(str(selected_palette.path) + "/")
-
-    all_colors_names = sorted([color.name for color in selected_palette.colors])
-    if not set(arguments.colors).issubset(set(all_colors_names)):
-        logging.warning(
-            "Color %s not found, possible colors are %s",
-            arguments.colors,
-            all_colors_names,
-        )
+    return Converter(
+        selected_palette,
+        selected_colors,
+        engine=arguments.engine,
+        go_nord=go_nord,
+        result_cache=get_result_cache(arguments),
+        profiler=profiler,
+        **get_engine_options(arguments),
+    )
+
+
+def get_output_format(output_path: str, arguments) -> Optional[str]:
+    """The Pillow format of an output image, None if it is not known without
+    loading Pillow."""
+    if arguments.output_format:
+        return arguments.output_format
+
+    return EXTENSION_FORMATS.get(Path(output_path).suffix.lower())
+
+
+def is_image_format(image_format: str) -> bool:
+    """Tell if Pillow can save images in a format, like PNG or JPEG."""
+    from PIL import Image
+
+    Image.init()
+    return image_format in Image.SAVE
+
+
+def get_output_paths(arguments) -> list[str]:
+    """The output paths of the arguments, one for every target."""
+    return [target.output_path for target in arguments.targets] or [
+        arguments.output_path
+    ]
+
+
+def uses_streams(arguments) -> bool:
+    """Tell if the arguments read the image from stdin or write to stdout."""
+    return STREAM_PATH in (arguments.input_path, *get_output_paths(arguments))
+
+
+def check_arguments(parser, arguments) -> None:
+    """Check that the options of the arguments can be used together.
+
+    :param parser: The parser of the arguments, reporting the errors.
+    :param arguments: The parsed command line arguments.
+    """
+    if arguments.use_lookup_table and arguments.engine != "numpy":
+        parser.error("--lut can be used only with --engine=numpy")
+
+    if arguments.blur_radius and arguments.engine != "numpy":
+        parser.error("--blur-radius can be used only with --engine=numpy")
+
+    if arguments.threads and arguments.engine != "numpy":
+        parser.error("--threads can be used only with --engine=numpy")
+
+    if arguments.tile_memory and arguments.engine != "numpy":
+        parser.error("--tile-memory can be used only with --engine=numpy")
+
+    if arguments.indexed_output and arguments.engine != "numpy":
+        parser.error("--indexed can be used only with --engine=numpy")
+
+    if arguments.enable_avg_pixels and arguments.disable_avg_pixels:
+        parser.error("--avg can not be used with --no-avg")
+
+    if arguments.indexed_output and arguments.enable_blur:
+        parser.error("--indexed can not be used with --blur")
+
+    if arguments.indexed_output and arguments.tile_memory:
+        parser.error("--indexed can not be used with --tile-memory")
+
+    output_paths = get_output_paths(arguments)
+    streams = uses_streams(arguments)
+    if STREAM_PATH in output_paths and not arguments.output_format:
+        parser.error("--format is required to write the image to stdout")
+
+    if arguments.indexed_output and not is_batch_input(arguments.input_path):
+        for output_path in output_paths:
+            if get_output_format(output_path, arguments) not in INDEXED_FORMATS:
+                parser.error(
+                    f"--indexed can not write {output_path}, use PNG, GIF, BMP or TIFF"
+                )
+
+    if (arguments.resume or arguments.journal_path) and not is_batch_input(
+        arguments.input_path
+    ):
+        parser.error("--resume and --journal can be used only in batch mode")
+
+    if arguments.max_memory and not is_batch_input(arguments.input_path):
+        parser.error("--max-memory can be used only in batch mode")
+
+    if arguments.targets and is_batch_input(arguments.input_path):
+        parser.error("--target can be used only with a single image")
+
+    if arguments.targets and arguments.tile_memory:
+        parser.error("--target can not be used with --tile-memory")
+
+    if streams and is_batch_input(arguments.input_path):
+        parser.error("stdin and stdout can be used only with a single image")
+
+    if streams and arguments.tile_memory:
+        parser.error("--tile-memory can not be used with stdin or stdout")
+
+    if arguments.profile_stats and not arguments.profile:
+        parser.error("--profile-stats can be used only with --profile")
+
+    if arguments.profile and (
+        arguments.targets or is_batch_input(arguments.input_path)
+    ):
+        parser.error("--profile can be used only with a single image and output")
+
+
+def main(argv: Union[list[str], None] = None, use_daemon: bool = False):
+    """Run the client.
+
+    :param argv: The command line arguments, sys.argv by default.
+    :param use_daemon: Forward the conversion to the daemon if it is running,
+        enabled by the command line entry point only.
+    """
+    if argv is None:
+        argv = sys.argv.copy()
+
+    if argv[1:2] == [SERVE_COMMAND]:
+        from image_go_nord_client.daemon import serve
+
+        return serve(argv[2:])
+
+    if argv[1:2] == [SYNC_COMMAND]:
+        from image_go_nord_client.sync import sync
+
+        return sync(argv[2:])
+
+    if argv[1:2] == [WORKER_COMMAND]:
+        from image_go_nord_client.work_queue import work
+
+        return work(argv[2:])
+
+    parser = get_argument_parser()
+    arguments, _ = parser.parse_known_args(argv.copy())
+    check_arguments(parser, arguments)
+    if arguments.quiet_mode:
+        logging.basicConfig(level=logging.CRITICAL)
+
+    streams = uses_streams(arguments)
+
+    # A profile must time the conversion in this process.
+    if use_daemon and not streams and not arguments.profile:
+        from image_go_nord_client.daemon import forward_to_daemon
+
+        exit_code = forward_to_daemon(argv, quiet=arguments.quiet_mode)
+        if exit_code is not None:
+            return exit_code
+
+    if arguments.verify_engine:
+        return verify_engine(arguments)
+
+    if arguments.output_format and not is_image_format(arguments.output_format):
+        logging.error("Unknown output format: %s", arguments.output_format)
         return 1
 
-    selected_colors = arguments.colors if arguments.colors else all_colors_names
-    for color in selected_colors:
-        go_nord.add_file_to_palette(str(color) + ".txt")
+    if arguments.targets:
+        return run_targets(arguments)
+
+    if is_batch_input(arguments.input_path):
+        return run_batch(arguments)
+
+    if arguments.profile:
+        return run_profiled(convert_single_image, arguments)
+
+    return convert_single_image(arguments)
 
-    go_nord.convert_image(image, save_path=output_image_path)
+
+def convert_single_image(arguments, profiler=None) -> int:
+    """Convert the input image of the arguments to the output path.
+
+    :param arguments: The parsed command line arguments.
+    :param profiler: The Profiler recording the stages of the conversion.
+    :return: The exit code, 1 if the palette can not be used or the
+        conversion fails.
+    """
+    # The image is opened by convert_file, once it is not found in the
+    # result cache (and by strips in tiled mode).
+    logging.info("Loading input image: %s", arguments.input_path)
+    output_image_path = arguments.output_path
+    logging.info("Set output image name: %s", output_image_path)
+
+    go_nord = create_go_nord(arguments.engine)
+    if not (converter := create_converter(arguments, go_nord, profiler)):
+        return 1
+
+    try:
+        converter.convert_file(
+            arguments.input_path, output_image_path, arguments.output_format
+        )
+    except Exception as error:
+        logging.error(
+            "Failed to convert %s: %s: %s",
+            arguments.input_path,
+            type(error).__name__,
+            error,
+        )
+        return 1
 
     return 0
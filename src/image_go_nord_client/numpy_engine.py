@@ -0,0 +1,726 @@
+"""Vectorized conversion engine.
+
+NumpyGoNord exposes the same configuration methods used by the client on
+ImageGoNord's GoNord, so it can replace it in main(), but it converts the
+whole image with NumPy array operations instead of a Python loop per pixel.
+
+The output is the same as GoNord's, including its less intuitive behaviours:
+
+- the average box goes from ``w`` to ``h`` (excluded) on both axes, wraps
+  around the image on the negative side and is clipped on the positive one;
+- on RGBA images pixels with alpha below the transparency tolerance are left
+  untouched, and every palette color keeps the alpha of the first pixel (in
+  column order) converted to it, that alpha also counts in the distance of
+  the following pixels;
+- ties between palette colors are won by the lowest hex code.
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+import numpy as np
+from PIL import Image
+
+from image_go_nord_client.bands import get_bands, run_bands
+from image_go_nord_client.blur import DEFAULT_BLUR_RADIUS, blur_pixels
+from image_go_nord_client.lookup_table import get_lookup_table, lookup_palette_indices
+from image_go_nord_client.palette_registry import get_palette_registry, hex_to_rgb
+from image_go_nord_client.profiling import profile_stage
+
+__ALL__ = ["NumpyGoNord"]
+
+DEFAULT_PALETTE_PATH = Path(__file__).parent / "palettes" / "Nord"
+DEFAULT_PALETTE_FILES = ["PolarNight.txt", "SnowStorm.txt", "Frost.txt", "Aurora.txt"]
+
+# Alpha value used for the average colors that have no alpha, GoNord leaves
+# them with 3 components when all the pixels of the box are transparent.
+MISSING_ALPHA = -1
+
+# Images with fewer pixels than DEDUP_MIN_PIXELS are mapped pixel by pixel,
+# the others by unique color when they have at most DEDUP_MAX_UNIQUE_RATIO
+# unique colors per pixel. From TABLE_MIN_PIXELS the unique colors are found
+# with a table of all the rgb colors, below it by sorting the pixels when a
+# sample of DEDUP_SAMPLE_SIZE pixels has repeated colors.
+DEDUP_MIN_PIXELS = 4096
+DEDUP_MAX_UNIQUE_RATIO = 0.75
+DEDUP_SAMPLE_SIZE = 1024
+DEDUP_SAMPLE_MAX_UNIQUE_RATIO = 0.95
+TABLE_MIN_PIXELS = 1 << 18
+# Palette ("P") images index at most 256 colors.
+MAX_INDEXED_COLORS = 256
+# Modes of the images whose pixels are indices in a color table, grayscale
+# images index a table of grays.
+COLOR_TABLE_MODES = ("P", "L")
+
+
+def nearest_palette_indices(colors: np.ndarray, palette: np.ndarray) -> np.ndarray:
+    """Find the nearest palette color (manhattan distance) of every color.
+
+    :param colors: Array (N, 3) of rgb colors.
+    :param palette: Array (P, 3) of rgb colors, on ties the first one wins.
+    :return: Array (N,) of indices in the palette.
+    """
+    colors = colors.astype(np.int16)
+    best_distances = np.full(len(colors), np.iinfo(np.int16).max, dtype=np.int16)
+    best_indices = np.zeros(len(colors), dtype=np.intp)
+    for index, target in enumerate(palette.astype(np.int16)):
+        distances = np.abs(colors[:, 0] - target[0])
+        distances += np.abs(colors[:, 1] - target[1])
+        distances += np.abs(colors[:, 2] - target[2])
+        closer = distances < best_distances
+        best_distances[closer] = distances[closer]
+        best_indices[closer] = index
+
+    return best_indices
+
+
+def unique_rgb_colors(colors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Find the unique colors of an array of rgb colors.
+
+    :param colors: Array (N, 3) of rgb colors, with components from 0 to 255.
+    :return: The unique colors (U, 3) and the index in them of every color.
+    """
+    keys = colors[:, 0].astype(np.int32) << 16
+    keys |= colors[:, 1].astype(np.int32) << 8
+    keys |= colors[:, 2].astype(np.int32)
+
+    if len(keys) < TABLE_MIN_PIXELS:
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.reshape(-1)
+    else:
+        # np.zeros is lazily allocated, only the pages of the table holding
+        # the colors of the image use memory.
+        present = np.zeros(1 << 24, dtype=np.bool_)
+        present[keys] = True
+        unique_keys = np.flatnonzero(present)
+        slots = np.zeros(1 << 24, dtype=np.int32)
+        slots[unique_keys] = np.arange(len(unique_keys), dtype=np.int32)
+        inverse = slots[keys]
+
+    unique_colors = np.stack(
+        [unique_keys >> 16, (unique_keys >> 8) & 0xFF, unique_keys & 0xFF], axis=1
+    )
+    return unique_colors, inverse
+
+
+def find_unique_colors(
+    colors: np.ndarray,
+) -> Optional[tuple[np.ndarray, np.ndarray]]:
+    """Find the unique colors of an array of rgb colors when they are few.
+
+    Flat images (screenshots, illustrations) have few unique colors over many
+    pixels, mapping only those is much faster. Images with mostly unique
+    colors, or too small to gain anything, are better mapped color by color.
+
+    :param colors: Array (N, 3) of rgb colors.
+    :return: The unique colors and the index in them of every color, as
+        unique_rgb_colors, or None when mapping color by color is faster.
+    """
+    if len(colors) < DEDUP_MIN_PIXELS:
+        return None
+
+    if len(colors) < TABLE_MIN_PIXELS:
+        sample = colors[:: len(colors) // DEDUP_SAMPLE_SIZE]
+        sample_colors, _ = unique_rgb_colors(sample)
+        if len(sample_colors) > len(sample) * DEDUP_SAMPLE_MAX_UNIQUE_RATIO:
+            return None
+
+    unique_colors, inverse = unique_rgb_colors(colors)
+    if len(unique_colors) > len(colors) * DEDUP_MAX_UNIQUE_RATIO:
+        return None
+
+    return unique_colors, inverse
+
+
+def nearest_unique_indices(
+    colors: np.ndarray,
+    palette: np.ndarray,
+    nearest: Callable[[np.ndarray, np.ndarray], np.ndarray] = nearest_palette_indices,
+) -> np.ndarray:
+    """Find the nearest palette color of every color, once per unique color
+    when the colors are few (see find_unique_colors).
+
+    :param colors: Array (N, 3) of rgb colors.
+    :param palette: Array (P, 3) of rgb colors.
+    :param nearest: The function mapping rgb colors to the palette.
+    :return: Array (N,) of indices in the palette.
+    """
+    if (unique := find_unique_colors(colors)) is None:
+        return nearest(colors, palette)
+
+    unique_colors, inverse = unique
+    return nearest(unique_colors, palette)[inverse]
+
+
+def _box_ranges(positions: np.ndarray, size: int, w: int, h: int):
+    """The ranges of an axis covered by the average box at some positions.
+
+    The offsets ``range(w, h)`` before the start of the axis wrap around to
+    its end, so the box covers up to two ranges of the axis.
+
+    :return: The starts and ends (excluded) of the wrapped and of the direct
+        ranges, every one an array like positions.
+    """
+    starts = np.maximum(positions + w, -size)
+    ends = np.minimum(positions + h, size)
+    wrapped_starts = np.minimum(starts, 0)
+    wrapped_ends = np.maximum(np.minimum(ends, 0), wrapped_starts)
+    wrapped = (wrapped_starts + size, wrapped_ends + size)
+    direct_starts = np.clip(starts, 0, size)
+    direct = (direct_starts, np.maximum(ends, direct_starts))
+    return wrapped, direct
+
+
+def summed_area_table(pixels: np.ndarray) -> np.ndarray:
+    """The integral image of an array (H, W, C), with a leading zero row and
+    column, so the sum of the rows r0:r1 and columns c0:c1 is
+    ``t[r1, c1] - t[r0, c1] - t[r1, c0] + t[r0, c0]``.
+    """
+    height, width, channels = pixels.shape
+    table = np.zeros((height + 1, width + 1, channels), dtype=np.int64)
+    np.cumsum(pixels, axis=0, dtype=np.int64, out=table[1:, 1:])
+    np.cumsum(table[1:, 1:], axis=1, out=table[1:, 1:])
+    return table
+
+
+def box_sums(
+    pixels: np.ndarray, w: int, h: int, rows: Optional[np.ndarray] = None
+) -> tuple[np.ndarray, np.ndarray]:
+    """Sum the pixels of the average box around every pixel.
+
+    The box covers the offsets ``range(w, h)`` on both axes, offsets before
+    the start of an axis wrap around while the ones after its end are
+    skipped, like the pixel access of Pillow used by GoNord. The sums are
+    read from a summed-area table, so their cost does not depend on the
+    size of the box.
+
+    :param pixels: Array (H, W, C) of the image, or any object with a shape
+        that returns the rows of the image when indexed by an array.
+    :param rows: The rows whose boxes are summed, all of them by default.
+        Only the rows covered by those boxes are read from pixels.
+    :return: The sums (R, W, C) and the number of pixels (R, W) of each box.
+    """
+    height, width, channels = pixels.shape
+    rows = np.arange(height) if rows is None else np.asarray(rows)
+
+    row_ranges = _box_ranges(rows, height, w, h)
+    column_ranges = _box_ranges(np.arange(width), width, w, h)
+
+    # Every row of a range is needed, so a range of image rows is also a
+    # range of the band of needed rows.
+    coverage = np.zeros(height + 1, dtype=np.int64)
+    for row_starts, row_ends in row_ranges:
+        np.add.at(coverage, row_starts, 1)
+        np.add.at(coverage, row_ends, -1)
+    needed_rows = np.flatnonzero(np.cumsum(coverage[:-1]) > 0)
+    table = summed_area_table(np.asarray(pixels[needed_rows]))
+
+    sums = np.zeros((len(rows), width, channels), dtype=np.int64)
+    for row_starts, row_ends in row_ranges:
+        band_starts = np.searchsorted(needed_rows, row_starts)
+        band_ends = band_starts + row_ends - row_starts
+        for column_starts, column_ends in column_ranges:
+            sums += table[band_ends[:, None], column_ends[None, :]]
+            sums -= table[band_starts[:, None], column_ends[None, :]]
+            sums -= table[band_ends[:, None], column_starts[None, :]]
+            sums += table[band_starts[:, None], column_starts[None, :]]
+
+    height_counts = sum(ends - starts for starts, ends in row_ranges)
+    width_counts = sum(ends - starts for starts, ends in column_ranges)
+    return sums, height_counts[:, None] * width_counts[None, :]
+
+
+def average_colors(
+    pixels: np.ndarray, w: int, h: int, rows: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Compute the average color of the box around every pixel, as GoNord.
+
+    :param pixels: Array (H, W, C) of the image.
+    :param rows: The rows whose averages are computed, all of them by default.
+    :return: Array (R, W, C) of the average colors, on RGBA images the alpha
+        is MISSING_ALPHA where GoNord would return a rgb color.
+    """
+    sums, counts = box_sums(pixels, w, h, rows)
+    counts = np.maximum(counts, 1)[..., None]
+    averages = sums // counts
+    if pixels.shape[2] > 3:
+        # GoNord starts the alpha sum from 255 instead of 0.
+        alpha_sums = sums[..., 3:] + 255
+        averages[..., 3:] = np.where(
+            alpha_sums != 255, alpha_sums // counts, MISSING_ALPHA
+        )
+
+    return averages
+
+
+def _pack_colors(colors: np.ndarray) -> np.ndarray:
+    # The alpha of the average colors can go up to 510, 10 bits are enough.
+    keys = colors[:, 0].astype(np.int64) << 8 | colors[:, 1]
+    keys = keys << 8 | colors[:, 2]
+    return keys << 10 | (colors[:, 3] - MISSING_ALPHA)
+
+
+def map_rgba_colors(
+    colors: np.ndarray,
+    palette: np.ndarray,
+    nearest: Callable[[np.ndarray, np.ndarray], np.ndarray] = nearest_palette_indices,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Map RGBA colors, given in the order GoNord visits them, to the palette.
+
+    :param colors: Array (N, 4) of the colors to convert.
+    :param palette: Array (P, 3) of the rgb palette colors.
+    :param nearest: The function mapping rgb colors to the palette.
+    :return: The palette index of every color and the alpha taken by every
+        palette color (MISSING_ALPHA if it was never chosen).
+    """
+    palette_alphas = np.full(len(palette), MISSING_ALPHA, dtype=np.int64)
+    if not len(colors):
+        return np.zeros(0, dtype=np.intp), palette_alphas
+
+    alphas = colors[:, 3]
+    if alphas[0] != MISSING_ALPHA and (alphas == alphas[0]).all():
+        # With a single alpha the alpha distance is always 0.
+        indices = nearest(colors[:, :3], palette)
+        palette_alphas[np.unique(indices)] = alphas[0]
+        return indices, palette_alphas
+
+    # GoNord caches the choice of every color, so only the first occurrence
+    # of a color matters and the unique colors are handled in that order.
+    _, first, inverse = np.unique(
+        _pack_colors(colors), return_index=True, return_inverse=True
+    )
+    order = np.argsort(first)
+    ranks = np.empty_like(order)
+    ranks[order] = np.arange(len(order))
+    unique_colors = colors[first[order]]
+    unique_alphas = unique_colors[:, 3]
+    rgb_distances = np.abs(
+        unique_colors[:, None, :3].astype(np.int32) - palette[None, :, :]
+    ).sum(axis=2)
+
+    # A palette color changes the following distances only when it is chosen
+    # the first time, so the choices are recomputed at most once per color.
+    unique_indices = np.empty(len(unique_colors), dtype=np.intp)
+    start = 0
+    while start < len(unique_colors):
+        alphas = unique_alphas[start:, None]
+        chosen = palette_alphas != MISSING_ALPHA
+        alpha_distances = np.where(
+            (alphas != MISSING_ALPHA) & chosen[None, :],
+            np.abs(alphas - palette_alphas[None, :]),
+            0,
+        )
+        indices = (rgb_distances[start:] + alpha_distances).argmin(axis=1)
+        first_choices = ~chosen[indices] & (unique_alphas[start:] != MISSING_ALPHA)
+        if not first_choices.any():
+            unique_indices[start:] = indices
+            break
+
+        end = int(first_choices.argmax()) + 1
+        unique_indices[start : start + end] = indices[:end]
+        palette_alphas[indices[end - 1]] = unique_alphas[start + end - 1]
+        start += end
+
+    return unique_indices[ranks[inverse.reshape(-1)]], palette_alphas
+
+
+@dataclass
+class PreparedPixels:
+    """The part of the conversion of some pixels that does not depend on the
+    palette: the colors to map (the average colors with the average box) and,
+    on RGBA images, the mask of the pixels to convert with their colors in
+    the order GoNord visits them.
+    """
+
+    pixels: np.ndarray
+    colors: np.ndarray
+    unique_colors: Optional[tuple[np.ndarray, np.ndarray]] = None
+    convertible: Optional[np.ndarray] = None
+
+
+class NumpyGoNord:
+    """Drop-in replacement of GoNord converting images with NumPy."""
+
+    TRANSPARENCY_TOLERANCE = 190
+
+    def __init__(self):
+        self.palette_lookup_path = str(DEFAULT_PALETTE_PATH) + "/"
+        self.palette_data: dict[str, tuple[int, int, int]] = {}
+        for file in DEFAULT_PALETTE_FILES:
+            self.add_file_to_palette(file)
+
+        self.use_gaussian_blur = False
+        self.blur_radius = DEFAULT_BLUR_RADIUS
+        self.use_avg_color = False
+        self.avg_box_data = {"w": -2, "h": 2}
+        self.use_lookup_table = False
+        self.threads = 1
+        self.use_indexed_output = False
+        self.profiler = None
+
+    def set_palette_lookup_path(self, path: str) -> None:
+        self.palette_lookup_path = path
+
+    def reset_palette(self) -> None:
+        self.palette_data = {}
+
+    def add_color_to_palette(self, hex_color: str) -> None:
+        self.palette_data[hex_color[1:]] = hex_to_rgb(hex_color[1:])
+
+    def add_file_to_palette(self, file: str) -> None:
+        registry = get_palette_registry()
+        for hex_color in registry.get_hex_colors(self.palette_lookup_path + file):
+            self.palette_data[hex_color] = hex_to_rgb(hex_color)
+
+    def get_palette_array(self) -> np.ndarray:
+        """The palette colors as an array (P, 3), sorted by hex code."""
+        return np.array(
+            [self.palette_data[name] for name in sorted(self.palette_data)],
+            dtype=np.int16,
+        ).reshape(-1, 3)
+
+    def enable_lookup_table(self) -> None:
+        """Map the colors with a lookup table cached on disk."""
+        self.use_lookup_table = True
+
+    def disable_lookup_table(self) -> None:
+        self.use_lookup_table = False
+
+    def nearest_indices(self, colors: np.ndarray, palette: np.ndarray) -> np.ndarray:
+        """Find the nearest color of the palette of every rgb color.
+
+        :param colors: Array (N, 3) of rgb colors.
+        :param palette: The palette array of this instance.
+        :return: Array (N,) of indices in the palette.
+        """
+        if self.use_lookup_table:
+            table = get_lookup_table(sorted(self.palette_data), palette)
+            return lookup_palette_indices(colors, table)
+
+        return nearest_unique_indices(colors, palette)
+
+    def parallel_nearest_indices(
+        self, colors: np.ndarray, palette: np.ndarray
+    ) -> np.ndarray:
+        """Find the nearest color of the palette of every rgb color, splitting
+        the colors between the threads.
+        """
+        indices = np.empty(len(colors), dtype=np.intp)
+
+        def nearest_band(band: slice) -> None:
+            indices[band] = self.nearest_indices(colors[band], palette)
+
+        run_bands(nearest_band, get_bands(len(colors), self.threads), self.threads)
+        return indices
+
+    def set_threads(self, threads: int) -> None:
+        """Set the number of threads converting the bands of rows of an image."""
+        self.threads = threads
+
+    def enable_indexed_output(self) -> None:
+        """Convert images to palette ("P") images whose color table is the
+        palette, when they are not blurred and all their pixels are opaque."""
+        self.use_indexed_output = True
+
+    def disable_indexed_output(self) -> None:
+        self.use_indexed_output = False
+
+    def set_profiler(self, profiler) -> None:
+        """Record the stages of the conversions with a Profiler."""
+        self.profiler = profiler
+
+    def enable_gaussian_blur(self) -> None:
+        self.use_gaussian_blur = True
+
+    def disable_gaussian_blur(self) -> None:
+        self.use_gaussian_blur = False
+
+    def set_blur_radius(self, radius: float) -> None:
+        """Set the standard deviation of the Gaussian blur, 1 as GoNord."""
+        self.blur_radius = radius
+
+    def enable_avg_algorithm(self) -> None:
+        self.use_avg_color = True
+
+    def disable_avg_algorithm(self) -> None:
+        self.use_avg_color = False
+
+    def set_avg_box_data(self, w=-2, h=2) -> None:
+        self.avg_box_data = {"w": int(w), "h": int(h)}
+
+    def open_image(self, path) -> Image.Image:
+        image = Image.open(path)
+        # Images with a color table are converted by convert_image.
+        if image.mode in COLOR_TABLE_MODES:
+            return image
+
+        if isinstance(image.getpixel((0, 0)), int):
+            image = image.convert("RGB")
+
+        return image
+
+    def prepare_pixels(
+        self,
+        pixels: np.ndarray,
+        rows: Optional[np.ndarray] = None,
+        find_unique: bool = False,
+    ) -> PreparedPixels:
+        """Compute the part of the conversion that does not depend on the
+        palette, to convert the same pixels to several palettes.
+
+        :param pixels: Array (H, W, 3) or (H, W, 4) of the image.
+        :param rows: Prepare only these rows of the image, the average box
+            still reads the rows around them.
+        :param find_unique: Find the unique colors of rgb images once, instead
+            of at every conversion.
+        """
+        source = pixels
+        if rows is None:
+            rows = np.arange(len(source))
+        else:
+            pixels = np.asarray(source[rows])
+
+        colors = pixels
+        if self.use_avg_color:
+            colors = np.empty(pixels.shape, dtype=np.int64)
+
+            def average_band(band: slice) -> None:
+                colors[band] = average_colors(
+                    source, **self.avg_box_data, rows=rows[band]
+                )
+
+            run_bands(average_band, get_bands(len(rows), self.threads), self.threads)
+
+        prepared = PreparedPixels(pixels=pixels, colors=colors)
+        if pixels.shape[2] == 3:
+            if find_unique and not self.use_lookup_table:
+                prepared.unique_colors = find_unique_colors(colors.reshape(-1, 3))
+            return prepared
+
+        # GoNord visits the pixels column by column, the order matters for
+        # the alpha of the palette colors.
+        prepared.convertible = (
+            pixels.transpose(1, 0, 2)[..., 3] >= self.TRANSPARENCY_TOLERANCE
+        )
+        prepared.colors = colors.transpose(1, 0, 2)[prepared.convertible].astype(
+            np.int64
+        )
+        return prepared
+
+    def convert_prepared(self, prepared: PreparedPixels) -> np.ndarray:
+        """Convert pixels prepared by prepare_pixels to the palette.
+
+        :return: A new array with the converted pixels.
+        """
+        palette = self.get_palette_array()
+        if not len(palette):
+            raise ValueError("The palette is empty")
+
+        pixels, colors = prepared.pixels, prepared.colors
+        converted = pixels.copy()
+        if pixels.shape[2] == 3:
+            if prepared.unique_colors is not None:
+                unique_colors, inverse = prepared.unique_colors
+                indices = self.parallel_nearest_indices(unique_colors, palette)
+                converted[...] = palette[indices[inverse]].reshape(pixels.shape)
+                return converted
+
+            def convert_band(band: slice) -> None:
+                band_colors = colors[band]
+                indices = self.nearest_indices(band_colors.reshape(-1, 3), palette)
+                converted[band] = palette[indices].reshape(band_colors.shape)
+
+            run_bands(convert_band, get_bands(len(pixels), self.threads), self.threads)
+            return converted
+
+        columns = converted.transpose(1, 0, 2)
+        indices, palette_alphas = map_rgba_colors(
+            colors, palette, self.parallel_nearest_indices
+        )
+        alphas = palette_alphas[indices]
+        alphas[alphas == MISSING_ALPHA] = 255
+        columns[prepared.convertible] = np.concatenate(
+            [palette[indices], np.minimum(alphas, 255)[:, None]], axis=1
+        )
+        return converted
+
+    def convert_prepared_indices(
+        self, prepared: PreparedPixels
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Find the palette color of every pixel prepared by prepare_pixels,
+        without building the converted pixels.
+
+        :return: An array (H, W) of uint8 indices in the palette array and
+            the alpha of every palette color, 255 on RGB images.
+        :raises ValueError: If some pixels of an RGBA image are too
+            transparent to be converted.
+        """
+        palette = self.get_palette_array()
+        if not 0 < len(palette) <= MAX_INDEXED_COLORS:
+            raise ValueError(f"The palette must have 1 to {MAX_INDEXED_COLORS} colors")
+
+        pixels, colors = prepared.pixels, prepared.colors
+        indices = np.empty(pixels.shape[:2], dtype=np.uint8)
+        if pixels.shape[2] == 4:
+            if not prepared.convertible.all():
+                raise ValueError("Some pixels are too transparent to be converted")
+
+            color_indices, palette_alphas = map_rgba_colors(
+                colors, palette, self.parallel_nearest_indices
+            )
+            # The colors are in column order.
+            indices.T[...] = color_indices.reshape(indices.T.shape)
+            palette_alphas[palette_alphas == MISSING_ALPHA] = 255
+            return indices, np.minimum(palette_alphas, 255)
+
+        alphas = np.full(len(palette), 255, dtype=np.int64)
+        if prepared.unique_colors is not None:
+            unique_colors, inverse = prepared.unique_colors
+            unique_indices = self.parallel_nearest_indices(unique_colors, palette)
+            indices[...] = unique_indices[inverse].reshape(indices.shape)
+            return indices, alphas
+
+        def convert_band(band: slice) -> None:
+            band_colors = colors[band]
+            band_indices = self.nearest_indices(band_colors.reshape(-1, 3), palette)
+            indices[band] = band_indices.reshape(band_colors.shape[:2])
+
+        run_bands(convert_band, get_bands(len(pixels), self.threads), self.threads)
+        return indices, alphas
+
+    def is_indexed_output(self, prepared: PreparedPixels) -> bool:
+        """Tell if prepared pixels can be converted to a palette image: not
+        blurred, with a palette fitting a color table and, on RGBA images,
+        every pixel converted."""
+        return (
+            self.use_indexed_output
+            and not self.use_gaussian_blur
+            and len(self.palette_data) <= MAX_INDEXED_COLORS
+            and (prepared.convertible is None or prepared.convertible.all())
+        )
+
+    def convert_pixels(
+        self, pixels: np.ndarray, rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Convert an array (H, W, 3) or (H, W, 4) of pixels to the palette.
+
+        :param rows: Convert only these rows of the image, the average box
+            still reads the rows around them.
+        :return: A new array with the converted pixels.
+        """
+        with profile_stage(self.profiler, "prepare"):
+            prepared = self.prepare_pixels(pixels, rows)
+
+        with profile_stage(self.profiler, "map"):
+            return self.convert_prepared(prepared)
+
+    def prepare_image(
+        self, image: Image.Image, find_unique: bool = False
+    ) -> PreparedPixels:
+        """Prepare the pixels of a Pillow image, see prepare_pixels."""
+        with profile_stage(self.profiler, "prepare"):
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+            return self.prepare_pixels(np.asarray(image), find_unique=find_unique)
+
+    def convert_prepared_image(
+        self, prepared: PreparedPixels, save_path: str = ""
+    ) -> Image.Image:
+        """Convert an image prepared by prepare_image to the palette.
+
+        :param prepared: The prepared pixels of the image.
+        :param save_path: The path where to save the converted image, if any.
+        :return: The converted image, a palette image with the indexed output.
+        """
+        if self.is_indexed_output(prepared):
+            with profile_stage(self.profiler, "map"):
+                indices, alphas = self.convert_prepared_indices(prepared)
+
+            palette = self.get_palette_array().astype(np.uint8)
+            if (alphas == 255).all():
+                # The color table is the palette array the indices point to.
+                converted = Image.fromarray(indices)
+                converted.putpalette(palette.tobytes())
+            else:
+                # Not every format stores the alpha of the palette colors.
+                rgba_palette = np.concatenate([palette, alphas[:, None]], axis=1)
+                converted = Image.fromarray(rgba_palette.astype(np.uint8)[indices])
+        else:
+            with profile_stage(self.profiler, "map"):
+                pixels = self.convert_prepared(prepared)
+
+            if self.use_gaussian_blur:
+                with profile_stage(self.profiler, "blur"):
+                    blur_pixels(pixels, self.blur_radius, self.threads)
+
+            converted = Image.fromarray(pixels)
+
+        if save_path != "":
+            with profile_stage(self.profiler, "encode"):
+                self.save_image_to_file(converted, save_path)
+
+        return converted
+
+    def can_convert_color_table(self, image: Image.Image) -> bool:
+        """Tell if an image can be converted by its color table: a palette or
+        grayscale image, converted pixel by pixel without blur or average
+        box, which would mix the colors of neighbour pixels."""
+        return (
+            image.mode in COLOR_TABLE_MODES
+            and not self.use_gaussian_blur
+            and not self.use_avg_color
+        )
+
+    def convert_color_table(
+        self, image: Image.Image, save_path: str = ""
+    ) -> Image.Image:
+        """Convert a palette or grayscale image by mapping only the colors of
+        its color table, at most 256 whatever the size of the image.
+
+        The transparent index of the image is dropped, as when the image is
+        converted to RGB.
+
+        :param image: The source "P" or "L" image.
+        :param save_path: The path where to save the converted image, if any.
+        :return: The converted image, a palette image with the same indices
+            with the indexed output, an RGB image otherwise.
+        """
+        palette = self.get_palette_array()
+        if not len(palette):
+            raise ValueError("The palette is empty")
+
+        with profile_stage(self.profiler, "map"):
+            # A grayscale image converted to "P" keeps its values as indices
+            # in a table of grays.
+            converted = image.convert("P") if image.mode == "L" else image.copy()
+            converted.info.pop("transparency", None)
+            table = np.asarray(converted.getpalette("RGB"), dtype=np.uint8)
+            indices = self.nearest_indices(table.reshape(-1, 3), palette)
+            converted.putpalette(palette.astype(np.uint8)[indices].tobytes())
+
+        if not self.use_indexed_output:
+            converted = converted.convert("RGB")
+
+        if save_path != "":
+            with profile_stage(self.profiler, "encode"):
+                self.save_image_to_file(converted, save_path)
+
+        return converted
+
+    def convert_image(self, image: Image.Image, save_path: str = "") -> Image.Image:
+        """Convert a Pillow image to the palette.
+
+        :param image: The source image, palette and grayscale images are
+            converted by their color table when possible.
+        :param save_path: The path where to save the converted image, if any.
+        :return: The converted image.
+        """
+        if self.can_convert_color_table(image):
+            return self.convert_color_table(image, save_path)
+
+        return self.convert_prepared_image(self.prepare_image(image), save_path)
+
+    def save_image_to_file(self, image: Image.Image, path: str) -> None:
+        image.save(path)
@@ -0,0 +1,201 @@
+"""Compiled registry of the available palettes.
+
+The registry scans the palette directories once, parses every color set file
+and keeps the result in memory: the palette lookups do not touch the
+filesystem until a palette file changes. Changes are detected comparing the
+modification times of the palette files, at most every REVALIDATE_SECONDS.
+
+The registry of the process has the palettes shipped with the client and the
+ones of $IMAGE_GO_NORD_PALETTES. The directories of user palettes given to a
+lookup get their own registries layered over it, so they never change the
+palettes seen by the other lookups.
+"""
+
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Optional, Sequence, Union
+
+from image_go_nord_client import Color, Palette
+
+__ALL__ = ["PaletteRegistry", "get_palette_registry"]
+
+BUILTIN_PALETTES_DIR = Path(__file__).parent / "palettes"
+PALETTES_DIRS_ENV = "IMAGE_GO_NORD_PALETTES"
+PALETTE_FILE_EXTENSION = ".txt"
+REVALIDATE_SECONDS = 2.0
+# The registries of user directories kept, the least recently created are
+# dropped first.
+MAX_USER_REGISTRIES = 8
+
+
+def read_palette_file(path: Union[str, Path]) -> list[str]:
+    """Read the hex colors of a palette file, without the leading '#'.
+
+    :param path: The path of the palette .txt file.
+    """
+    lines = Path(path).read_text().splitlines()
+    return [line.strip().replace("#", "") for line in lines if line.strip()]
+
+
+def hex_to_rgb(hex_color: str) -> tuple[int, int, int]:
+    return (
+        int(hex_color[0:2], 16),
+        int(hex_color[2:4], 16),
+        int(hex_color[4:6], 16),
+    )
+
+
+def compile_color(path: Path) -> Color:
+    """Parse a color set file, dropping the duplicated colors.
+
+    :param path: The path of the color set .txt file.
+    """
+    return Color(
+        name=path.name.replace(PALETTE_FILE_EXTENSION, ""),
+        path=path,
+        hex_colors=tuple(dict.fromkeys(read_palette_file(path))),
+    )
+
+
+def _iter_palette_files(directory: Path):
+    for folder in sorted(directory.iterdir()):
+        if not folder.is_dir():
+            continue
+
+        files = sorted(
+            file
+            for file in folder.iterdir()
+            if file.is_file() and file.suffix == PALETTE_FILE_EXTENSION
+        )
+        yield folder, files
+
+
+class PaletteRegistry:
+    """In-memory manifest of the palettes found in a list of directories.
+
+    Every directory contains a folder for each palette, with a .txt file for
+    each color set. When two directories have a palette with the same name
+    the one in the last directory is used.
+    """
+
+    def __init__(self, directories: list[Union[str, Path]]):
+        self.directories = [Path(directory) for directory in directories]
+        self._palettes: Optional[dict[str, Palette]] = None
+        self._colors_by_path: dict[Path, Color] = {}
+        self._signature = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def invalidate(self) -> None:
+        """Force the palette files to be read again on the next lookup."""
+        with self._lock:
+            self._palettes = None
+
+    def get_signature(self) -> tuple:
+        """The size and the modification time of all the palette files."""
+        signature = []
+        for directory in self.directories:
+            if not directory.is_dir():
+                continue
+
+            for folder, files in _iter_palette_files(directory):
+                for file in files:
+                    stat = file.stat()
+                    signature.append((str(file), stat.st_mtime_ns, stat.st_size))
+
+        return tuple(signature)
+
+    def _compile(self) -> dict[str, Palette]:
+        palettes = {}
+        colors_by_path = {}
+        for directory in self.directories:
+            if not directory.is_dir():
+                continue
+
+            for folder, files in _iter_palette_files(directory):
+                colors = [compile_color(file) for file in files]
+                colors_by_path.update({color.path: color for color in colors})
+                palettes[folder.name.lower()] = Palette(
+                    name=folder.name.lower(), path=folder, colors=colors
+                )
+
+        self._colors_by_path = colors_by_path
+        return palettes
+
+    def get_palettes(self) -> dict[str, Palette]:
+        """The palettes by lowercase name, compiled on the first call and
+        compiled again when the palette files change."""
+        with self._lock:
+            now = time.monotonic()
+            if (
+                self._palettes is not None
+                and now - self._checked_at < REVALIDATE_SECONDS
+            ):
+                return self._palettes
+
+            signature = self.get_signature()
+            if self._palettes is None or signature != self._signature:
+                self._palettes = self._compile()
+                self._signature = signature
+
+            self._checked_at = now
+            return self._palettes
+
+    def get_hex_colors(self, path: Union[str, Path]) -> tuple[str, ...]:
+        """The hex colors of a color set file, read from the registry when
+        the file belongs to a registered palette.
+
+        :param path: The path of the color set .txt file.
+        """
+        self.get_palettes()
+        if color := self._colors_by_path.get(Path(path)):
+            return color.hex_colors
+
+        return tuple(dict.fromkeys(read_palette_file(path)))
+
+
+_registry: Optional[PaletteRegistry] = None
+_registry_directories: Optional[str] = None
+_user_registries: dict[tuple[Path, ...], PaletteRegistry] = {}
+
+
+def get_palette_registry(
+    palette_dirs: Sequence[Union[str, Path]] = (),
+) -> PaletteRegistry:
+    """The registry of the process, with the palettes shipped with the client
+    and the directories listed in $IMAGE_GO_NORD_PALETTES, built again when
+    the variable changes (the daemon applies the one of every job).
+
+    :param palette_dirs: Directories of user palettes, the registry returned
+        is then a registry of its own with these directories last, so their
+        palettes replace the ones with the same name.
+    """
+    global _registry, _registry_directories
+
+    user_directories = os.environ.get(PALETTES_DIRS_ENV, "")
+    if _registry is None or user_directories != _registry_directories:
+        _registry_directories = user_directories
+        _registry = PaletteRegistry(
+            [
+                BUILTIN_PALETTES_DIR,
+                *[path for path in user_directories.split(os.pathsep) if path],
+            ]
+        )
+
+    if not palette_dirs:
+        return _registry
+
+    directories = (*_registry.directories, *map(Path, palette_dirs))
+    if (registry := _user_registries.get(directories)) is None:
+        if len(_user_registries) >= MAX_USER_REGISTRIES:
+            _user_registries.pop(next(iter(_user_registries)))
+        registry = _user_registries[directories] = PaletteRegistry(directories)
+
+    return registry
+
+
+def clear_user_registries() -> None:
+    """Drop the registries of the user directories, see get_palette_registry."""
+    _user_registries.clear()
@@ -0,0 +1,167 @@
+"""Wall time, cpu time and peak memory of the stages of a conversion.
+
+A Profiler records the stages run inside its stage() context manager. It
+only reads the clocks and the peak resident memory of the process at the
+start and at the end of a stage, so it is cheap enough to stay enabled on
+production conversions. Nested stages are recorded with the names of their
+parents, like "convert/map".
+
+The peak memory is the high-water mark of the resident memory of the
+process, read from getrusage: the peak after a stage and the increase of
+the peak during the stage, which is the memory the stage needed beyond the
+memory used before it.
+"""
+
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+__ALL__ = ["Profiler", "profile_stage"]
+
+MEGABYTE = 1024 * 1024
+STAGE_SEPARATOR = "/"
+
+
+def get_peak_memory() -> Optional[int]:
+    """The peak resident memory of the process in bytes, None if unknown."""
+    try:
+        import resource
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux counts kilobytes, macOS bytes.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+@dataclass
+class StageStats:
+    name: str
+    calls: int = 0
+    wall_time: float = 0.0
+    cpu_time: float = 0.0
+    peak_memory: Optional[int] = None
+    peak_increase: Optional[int] = None
+
+
+class Profiler:
+    """Collect the stats of the stages of conversions, from any thread."""
+
+    def __init__(self):
+        self.stages: dict[str, StageStats] = {}
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    @contextmanager
+    def stage(self, name: str):
+        """Record the time and the memory of the code run in the context."""
+        parents = getattr(self.local, "parents", [])
+        self.local.parents = [*parents, name]
+        full_name = STAGE_SEPARATOR.join(self.local.parents)
+        # Listed from its start, before the stages nested in it.
+        with self.lock:
+            self.stages.setdefault(full_name, StageStats(full_name))
+
+        start_peak = get_peak_memory()
+        start_cpu = time.process_time()
+        start_wall = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall_time = time.perf_counter() - start_wall
+            cpu_time = time.process_time() - start_cpu
+            peak = get_peak_memory()
+            self.local.parents = parents
+            self.record(full_name, wall_time, cpu_time, start_peak, peak)
+
+    def record(
+        self,
+        name: str,
+        wall_time: float,
+        cpu_time: float,
+        start_peak: Optional[int],
+        peak: Optional[int],
+    ) -> None:
+        with self.lock:
+            stats = self.stages.setdefault(name, StageStats(name))
+            stats.calls += 1
+            stats.wall_time += wall_time
+            stats.cpu_time += cpu_time
+            if peak is not None:
+                stats.peak_memory = max(stats.peak_memory or 0, peak)
+                stats.peak_increase = max(stats.peak_increase or 0, peak - start_peak)
+
+    def get_stats(self) -> list[StageStats]:
+        """The stats of the stages, in the order they were first run."""
+        with self.lock:
+            return list(self.stages.values())
+
+    def to_json(self) -> str:
+        return json.dumps(
+            {"stages": [asdict(stats) for stats in self.get_stats()]}, indent=2
+        )
+
+    def to_table(self) -> str:
+        def megabytes(size: Optional[int]) -> str:
+            return "-" if size is None else f"{size / MEGABYTE:.1f}"
+
+        rows = [("stage", "calls", "wall s", "cpu s", "peak MB", "+peak MB")]
+        for stats in self.get_stats():
+            rows.append(
+                (
+                    stats.name,
+                    str(stats.calls),
+                    f"{stats.wall_time:.4f}",
+                    f"{stats.cpu_time:.4f}",
+                    megabytes(stats.peak_memory),
+                    megabytes(stats.peak_increase),
+                )
+            )
+
+        widths = [max(len(row[column]) for row in rows) for column in range(6)]
+        return "\n".join(
+            "  ".join(
+                cell.ljust(width) if column == 0 else cell.rjust(width)
+                for column, (cell, width) in enumerate(zip(row, widths))
+            )
+            for row in rows
+        )
+
+    def format(self, profile_format: str = "table") -> str:
+        """The stats as a "table" or as "json"."""
+        return self.to_json() if profile_format == "json" else self.to_table()
+
+
+def profile_stage(profiler: Optional[Profiler], name: str):
+    """The stage of a profiler, or a context doing nothing without one."""
+    return profiler.stage(name) if profiler else nullcontext()
+
+
+def run_profiled(function, arguments) -> int:
+    """Run a conversion with a Profiler and print its stats to stderr.
+
+    :param function: The conversion, called with the arguments and the
+        Profiler, returning the exit code.
+    :param arguments: The parsed command line arguments.
+    """
+    profiler = Profiler()
+    cprofile = None
+    if arguments.profile_stats:
+        import cProfile
+
+        cprofile = cProfile.Profile()
+        cprofile.enable()
+
+    try:
+        exit_code = function(arguments, profiler)
+    finally:
+        if cprofile:
+            cprofile.disable()
+            cprofile.dump_stats(arguments.profile_stats)
+
+    print(profiler.format(arguments.profile_format), file=sys.stderr)
+    return exit_code
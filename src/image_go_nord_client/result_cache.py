@@ -0,0 +1,245 @@
+"""Content addressed cache of converted images.
+
+A converted image is stored under a hash of the input image bytes and of
+every option that can change the output bytes: the palette files contents,
+the selected colors, the blur, the average box, the output format and the
+versions of the engine and of Pillow. Converting the same image with the same
+options again copies the stored image instead of converting it.
+
+The cache has a size cap, the least recently used images are removed when it
+goes over it. The cache directory is scanned only when the size of the images
+stored since the last scan takes it over the cap, or every RESCAN_STORES
+stores to count the images stored by other processes.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Sequence, Union
+
+from image_go_nord_client import STREAM_PATH, Palette, get_version
+
+__ALL__ = ["ResultCache", "get_result_cache"]
+
+RESULTS_DIR = "results"
+DEFAULT_CACHE_SIZE_MB = 1024
+MEGABYTE = 1024 * 1024
+# Change it when the conversion changes without a change of version.
+RESULT_CACHE_VERSION = "1"
+TEMP_SUFFIX = ".tmp"
+READ_CHUNK_SIZE = 1024 * 1024
+RESCAN_STORES = 256
+
+_result_caches: dict[tuple[str, int], "ResultCache"] = {}
+
+
+@lru_cache(maxsize=None)
+def get_engine_versions(engine: str) -> dict[str, str]:
+    """The versions of the code producing the converted images of an engine."""
+    from importlib.metadata import PackageNotFoundError, version
+
+    from PIL import __version__ as pillow_version
+
+    versions = {"client": get_version(), "pillow": pillow_version}
+    if engine == "gonord":
+        try:
+            versions["gonord"] = version("image-go-nord")
+        except PackageNotFoundError:
+            versions["gonord"] = "unknown"
+
+    return versions
+
+
+def get_conversion_options(
+    palette: Palette,
+    colors: Sequence[str],
+    engine: str,
+    options: dict,
+    output_path: Union[str, Path],
+    output_format: Optional[str] = None,
+) -> dict:
+    """The options of a conversion that can change the converted image.
+
+    :param palette: The palette of the conversion.
+    :param colors: The color sets of the palette.
+    :param engine: The engine converting the image.
+    :param options: The options of the Converter, see Converter.options.
+    :param output_path: The path of the converted image.
+    :param output_format: The Pillow format of the converted image, if not
+        given by the extension of the path.
+    """
+    palette_files = {
+        color: hashlib.sha256(
+            (Path(palette.path) / f"{color}.txt").read_bytes()
+        ).hexdigest()
+        for color in colors
+    }
+    return {
+        "version": RESULT_CACHE_VERSION,
+        "engine": engine,
+        "engine_versions": get_engine_versions(engine),
+        "palette_files": palette_files,
+        "colors": list(colors),
+        "blur": options["enable_blur"],
+        "blur_radius": options["blur_radius"],
+        "avg": options["enable_avg_pixels"],
+        "no_avg": options["disable_avg_pixels"],
+        "pixels_area": list(options["pixels_area"]),
+        # The strips conversion writes PNG files with its own encoder.
+        "tiled": bool(options["tile_memory"]),
+        "indexed": options["indexed_output"],
+        "format": output_format or Path(output_path).suffix.lower(),
+    }
+
+
+def get_arguments_conversion_options(arguments, output_path: str) -> Optional[dict]:
+    """The options of the command line arguments that can change the converted
+    image, see get_conversion_options.
+
+    :return: The options, or None if the palette can not be used.
+    """
+    from image_go_nord_client.main import get_engine_options, resolve_palette
+
+    if not (resolved := resolve_palette(arguments)):
+        return None
+
+    palette, colors = resolved
+    return get_conversion_options(
+        palette,
+        colors,
+        arguments.engine,
+        get_engine_options(arguments),
+        output_path,
+        arguments.output_format,
+    )
+
+
+class ResultCache:
+    """Converted images stored by key, with a size cap."""
+
+    def __init__(self, directory: Union[str, Path], max_size: int):
+        """
+        :param directory: The directory of the cache.
+        :param max_size: The maximum size in bytes of the stored images.
+        """
+        self.directory = Path(directory) / RESULTS_DIR
+        self.max_size = max_size
+        # The size found by the last scan plus the images stored since.
+        self.size: Optional[int] = None
+        self.stores_since_scan = 0
+
+    def get_key(self, input_path: Union[str, Path], options: dict) -> str:
+        """The key of the conversion of an image file with some options."""
+        digest = hashlib.sha256()
+        with open(input_path, "rb") as file:
+            while chunk := file.read(READ_CHUNK_SIZE):
+                digest.update(chunk)
+
+        digest.update(json.dumps(options, sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def get_entry_path(self, key: str, output_path: Union[str, Path]) -> Path:
+        return self.directory / key[:2] / (key + Path(output_path).suffix.lower())
+
+    def fetch(self, key: str, output_path: Union[str, Path]) -> bool:
+        """Copy the image stored with a key to the output path.
+
+        :return: False if there is no image stored with the key.
+        """
+        entry_path = self.get_entry_path(key, output_path)
+        try:
+            # The output is a copy and not a hard link, so writing it later
+            # never changes the stored image.
+            shutil.copyfile(entry_path, output_path)
+        except FileNotFoundError:
+            return False
+
+        # The modification time is the last use of the entry.
+        try:
+            os.utime(entry_path)
+        except FileNotFoundError:
+            pass
+
+        return True
+
+    def store(self, key: str, output_path: Union[str, Path]) -> None:
+        """Store a converted image with a key and remove the least recently
+        used images over the size cap."""
+        entry_path = self.get_entry_path(key, output_path)
+        entry_path.parent.mkdir(parents=True, exist_ok=True)
+        # Copy and rename so that other processes never read a partial image.
+        file_descriptor, temp_path = tempfile.mkstemp(
+            dir=entry_path.parent, suffix=TEMP_SUFFIX
+        )
+        try:
+            with os.fdopen(file_descriptor, "wb") as file, open(
+                output_path, "rb"
+            ) as output_file:
+                shutil.copyfileobj(output_file, file)
+                entry_size = file.tell()
+            os.replace(temp_path, entry_path)
+        except BaseException:
+            Path(temp_path).unlink(missing_ok=True)
+            raise
+
+        self.stores_since_scan += 1
+        if self.size is not None:
+            self.size += entry_size
+        if (
+            self.size is None
+            or self.size > self.max_size
+            or self.stores_since_scan >= RESCAN_STORES
+        ):
+            self.evict()
+
+    def get_entries(self) -> list[tuple[int, int, Path]]:
+        """The modification time, the size and the path of every image."""
+        entries = []
+        for path in self.directory.glob("*/*"):
+            if path.suffix == TEMP_SUFFIX:
+                continue
+
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        return entries
+
+    def evict(self) -> None:
+        """Remove the least recently used images until the cache fits its cap."""
+        entries = self.get_entries()
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self.max_size:
+                break
+
+            path.unlink(missing_ok=True)
+            size -= entry_size
+            logging.debug("Removed from the result cache: %s", path.name)
+
+        self.size = size
+        self.stores_since_scan = 0
+
+
+def get_result_cache(arguments) -> Optional[ResultCache]:
+    """The result cache selected by the arguments, None when it is not used."""
+    if not arguments.cache_dir:
+        return None
+
+    if STREAM_PATH in (arguments.input_path, arguments.output_path):
+        logging.info("The result cache is not used with stdin or stdout")
+        return None
+
+    # Kept for the process, so a batch worker scans the cache only sometimes.
+    key = (str(arguments.cache_dir), arguments.cache_size or DEFAULT_CACHE_SIZE_MB)
+    if key not in _result_caches:
+        _result_caches[key] = ResultCache(key[0], key[1] * MEGABYTE)
+
+    return _result_caches[key]
@@ -0,0 +1,163 @@
+"""Batch conversions admitted under a memory budget.
+
+With --max-memory the batch does not run --jobs conversions at any time: the
+headers of the images are read first, without decoding them, to estimate the
+memory every conversion needs, and a conversion starts only when it fits in
+the memory left by the running ones and by the worker processes. The largest
+images that fit start first, so the big ones do not end the batch alone, and
+small images fill the memory left while the big ones run. The number of
+conversions running grows when small images are left and shrinks while big
+ones run.
+
+An image needing more memory than the budget is converted alone, use
+--tile-memory to convert such images by strips.
+"""
+
+import logging
+from bisect import bisect_right
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Iterator, Optional
+
+from PIL import Image, UnidentifiedImageError
+
+from image_go_nord_client.animation import ANIMATION_FORMATS, is_animation
+from image_go_nord_client.batch import (
+    BatchItem,
+    BatchResult,
+    _convert_item,
+    _init_worker,
+)
+from image_go_nord_client.journal import BatchJournal
+from image_go_nord_client.tiled import MEGABYTE, WORKING_BYTES_PER_PIXEL
+
+__ALL__ = ["MemoryQueue", "convert_by_memory", "estimate_peak_memory"]
+
+# Rough memory of a worker process with the engine loaded, before converting.
+WORKER_MEMORY = 80 * MEGABYTE
+# Rough memory needed by GoNord to convert a pixel: the converted copy and
+# the blurred copy of the image.
+GONORD_BYTES_PER_PIXEL = 16
+# Bytes of a pixel of a converted frame kept until the animation is saved.
+FRAME_BYTES_PER_PIXEL = 4
+
+
+def estimate_peak_memory(item: BatchItem, arguments) -> int:
+    """Estimate the memory the conversion of an image needs from its header.
+
+    :param item: The image and its output.
+    :param arguments: The parsed command line arguments.
+    :return: The estimate in bytes, 0 if the image can not be opened.
+    """
+    try:
+        with Image.open(item.input_path) as image:
+            pixels = image.width * image.height
+            decoded_bytes = pixels * len(image.getbands())
+            frames = 1
+            # The encoders keep all the converted frames until the animation
+            # is written, the other formats get only the first frame.
+            output_format = Image.registered_extensions().get(
+                item.output_path.suffix.lower()
+            )
+            if is_animation(image) and output_format in ANIMATION_FORMATS:
+                frames = image.n_frames
+    except (OSError, UnidentifiedImageError):
+        # The conversion fails early, reading the file.
+        return 0
+
+    if arguments.tile_memory:
+        working_bytes = arguments.tile_memory * MEGABYTE
+    elif arguments.engine == "numpy":
+        working_bytes = pixels * WORKING_BYTES_PER_PIXEL
+    else:
+        working_bytes = pixels * GONORD_BYTES_PER_PIXEL
+
+    frames_bytes = (frames - 1) * pixels * FRAME_BYTES_PER_PIXEL
+    return decoded_bytes + working_bytes + frames_bytes
+
+
+class MemoryQueue:
+    """The items waiting to be converted, sorted by estimated memory."""
+
+    def __init__(self, estimates: list[int]):
+        self.indices = sorted(range(len(estimates)), key=estimates.__getitem__)
+        self.estimates = [estimates[index] for index in self.indices]
+
+    def __len__(self) -> int:
+        return len(self.indices)
+
+    def pop_fitting(self, available: int) -> Optional[int]:
+        """Remove the largest item fitting in some memory.
+
+        :return: The index of the item, None if no item fits.
+        """
+        position = bisect_right(self.estimates, available) - 1
+        if position < 0:
+            return None
+
+        del self.estimates[position]
+        return self.indices.pop(position)
+
+    def pop_largest(self) -> int:
+        self.estimates.pop()
+        return self.indices.pop()
+
+
+def convert_by_memory(
+    arguments,
+    items: list[BatchItem],
+    jobs: int,
+    journal: Optional[BatchJournal] = None,
+) -> Iterator[BatchResult]:
+    """Convert images by a pool of at most jobs worker processes, running
+    only the conversions fitting in --max-memory.
+
+    :param arguments: The parsed command line arguments.
+    :param items: The images to convert.
+    :param jobs: The maximum number of worker processes.
+    :param journal: The journal where the workers record the conversions.
+    :return: The result of every item, in order.
+    """
+    budget = arguments.max_memory * MEGABYTE
+    jobs = max(1, min(jobs, budget // WORKER_MEMORY))
+    available = budget - jobs * WORKER_MEMORY
+    estimates = [estimate_peak_memory(item, arguments) for item in items]
+    logging.info(
+        "Converting in %s MB with up to %s jobs, the images need about %s MB",
+        arguments.max_memory,
+        jobs,
+        sum(estimates) // MEGABYTE,
+    )
+
+    queue = MemoryQueue(estimates)
+    running = {}
+    results = {}
+    next_index = 0
+    with ProcessPoolExecutor(
+        max_workers=jobs, initializer=_init_worker, initargs=(arguments, journal)
+    ) as executor:
+        while queue or running:
+            while queue and len(running) < jobs:
+                index = queue.pop_fitting(available)
+                if index is None:
+                    if running:
+                        break
+
+                    index = queue.pop_largest()
+                    logging.warning(
+                        "%s needs about %s MB, more than --max-memory allows",
+                        items[index].input_path,
+                        estimates[index] // MEGABYTE,
+                    )
+
+                running[executor.submit(_convert_item, items[index])] = index
+                available -= estimates[index]
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                available += estimates[index]
+                results[index] = future.result()
+
+            while next_index in results:
+                yield results.pop(next_index)
+                next_index += 1
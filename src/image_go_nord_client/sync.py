@@ -0,0 +1,328 @@
+"""Incremental mirror of a tree of images into a tree of converted images.
+
+The sync command converts every image of a source directory, recursively, to
+the same relative path in an output directory, and records in a manifest the
+hash of every input with the fingerprints of the conversion options and of
+the palette files. The next runs convert only the images that are new, whose
+content changed, or whose options or palette files changed, and remove the
+outputs of the removed images.
+
+An input is hashed only when its size or modification time changed since the
+last run, so a run on an unchanged tree only reads the metadata of the files.
+
+With --watch the tree is synced again when it changes, on the notifications
+of the file system when watchdog is installed, every --watch-interval seconds
+otherwise.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from dataclasses import asdict, dataclass, replace
+from pathlib import Path
+from typing import Optional
+
+from image_go_nord_client import (
+    SYNC_COMMAND,
+    get_argument_parser,
+    parse_positive_float,
+)
+from image_go_nord_client.batch import (
+    IMAGE_EXTENSIONS,
+    BatchItem,
+    convert_batch_items,
+    get_batch_jobs,
+    get_batch_output_dir,
+)
+
+__ALL__ = ["sync", "sync_tree"]
+
+MANIFEST_NAME = ".image-go-nord-sync.json"
+# Change it when the manifest or the fingerprints change.
+MANIFEST_VERSION = 1
+DEFAULT_WATCH_INTERVAL = 2.0
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class ManifestEntry:
+    input_hash: str
+    input_size: int
+    input_mtime_ns: int
+    options: str
+    palette: str
+
+
+def get_sync_argument_parser():
+    """The parser of the sync command: the conversion options and the sync
+    options."""
+    parser = get_argument_parser()
+    parser.prog += " " + SYNC_COMMAND
+    group = parser.add_argument_group("sync options")
+    group.add_argument(
+        "--watch",
+        action="store_true",
+        dest="watch",
+        default=False,
+        help="keep running and sync the tree again when it changes",
+    )
+    group.add_argument(
+        "--watch-interval",
+        type=parse_positive_float,
+        dest="watch_interval",
+        metavar="SECONDS",
+        default=DEFAULT_WATCH_INTERVAL,
+        help="with --watch, seconds between two checks of the tree, when the "
+        "file system notifications are not available (default: 2)",
+    )
+    group.add_argument(
+        "--manifest",
+        type=str,
+        dest="manifest_path",
+        metavar="PATH",
+        default=None,
+        help=f"path of the manifest (default: {MANIFEST_NAME} in the output "
+        "directory)",
+    )
+    return parser
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(READ_CHUNK_SIZE):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def hash_json(value) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+def get_fingerprints(arguments, output_path: Path) -> Optional[tuple[str, str]]:
+    """The fingerprints of the conversion options and of the palette files of
+    an output image.
+
+    :return: The fingerprints, or None if the palette can not be used.
+    """
+    from image_go_nord_client.result_cache import get_arguments_conversion_options
+
+    if not (options := get_arguments_conversion_options(arguments, str(output_path))):
+        return None
+
+    palette_files = options.pop("palette_files")
+    return hash_json(options), hash_json(palette_files)
+
+
+def load_manifest(path: Path) -> dict[str, ManifestEntry]:
+    """The entries of a manifest by relative input path, none if the manifest
+    does not exist or can not be read."""
+    try:
+        data = json.loads(path.read_text())
+        if data["version"] != MANIFEST_VERSION:
+            return {}
+
+        return {name: ManifestEntry(**entry) for name, entry in data["entries"].items()}
+    except FileNotFoundError:
+        return {}
+    except (ValueError, KeyError, TypeError):
+        logging.warning("Unreadable manifest %s, converting every image", path)
+        return {}
+
+
+def save_manifest(path: Path, entries: dict[str, ManifestEntry]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = {
+        "version": MANIFEST_VERSION,
+        "entries": {name: asdict(entry) for name, entry in sorted(entries.items())},
+    }
+    # Written to a temporary file and renamed, an interrupted run keeps the
+    # previous manifest.
+    file_descriptor, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "w") as file:
+            json.dump(data, file, indent=1)
+        os.replace(temp_path, path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+
+def collect_sync_items(source_dir: Path, output_dir: Path) -> dict[str, BatchItem]:
+    """The images of a source tree by relative path, with their outputs."""
+    return {
+        path.relative_to(source_dir).as_posix(): BatchItem(
+            input_path=path, output_path=output_dir / path.relative_to(source_dir)
+        )
+        for path in sorted(source_dir.rglob("*"))
+        if path.is_file() and path.suffix.lower() in IMAGE_EXTENSIONS
+    }
+
+
+def sync_tree(
+    arguments, source_dir: Path, output_dir: Path, manifest_path: Path
+) -> int:
+    """Convert the images of a source tree changed since the last sync.
+
+    :param arguments: The parsed command line arguments.
+    :param source_dir: The directory of the images to convert.
+    :param output_dir: The directory of the converted images.
+    :param manifest_path: The path of the manifest of the conversions.
+    :return: 0 if all the images are up to date, 1 otherwise.
+    """
+    entries = load_manifest(manifest_path)
+    items = collect_sync_items(source_dir, output_dir)
+    fingerprints = {}
+    synced_entries = {}
+    stale = {}
+    for name, item in items.items():
+        suffix = item.output_path.suffix.lower()
+        if suffix not in fingerprints:
+            fingerprints[suffix] = get_fingerprints(arguments, item.output_path)
+            if fingerprints[suffix] is None:
+                return 1
+
+        options, palette = fingerprints[suffix]
+        stat = item.input_path.stat()
+        entry = entries.get(name)
+        if (
+            entry
+            and (entry.options, entry.palette) == (options, palette)
+            and item.output_path.exists()
+        ):
+            if (entry.input_size, entry.input_mtime_ns) == (
+                stat.st_size,
+                stat.st_mtime_ns,
+            ):
+                synced_entries[name] = entry
+                continue
+
+            # Touched or copied again, but with the same content.
+            if hash_file(item.input_path) == entry.input_hash:
+                synced_entries[name] = replace(
+                    entry, input_size=stat.st_size, input_mtime_ns=stat.st_mtime_ns
+                )
+                continue
+
+        # Hashed before the conversion, a change during it is seen next time.
+        stale[name] = ManifestEntry(
+            hash_file(item.input_path),
+            stat.st_size,
+            stat.st_mtime_ns,
+            options,
+            palette,
+        )
+
+    removed = [name for name in entries if name not in items]
+    for name in removed:
+        (output_dir / name).unlink(missing_ok=True)
+        logging.info("Removed the output of %s", name)
+
+    failures = 0
+    if stale:
+        stale_items = [items[name] for name in stale]
+        jobs = get_batch_jobs(arguments, stale_items)
+        logging.info("Converting %s changed images with %s jobs", len(stale), jobs)
+        for name, result in zip(
+            stale, convert_batch_items(arguments, stale_items, jobs)
+        ):
+            if result.error:
+                failures += 1
+                logging.error("Failed to convert %s: %s", name, result.error)
+            else:
+                synced_entries[name] = stale[name]
+
+    if synced_entries != entries:
+        save_manifest(manifest_path, synced_entries)
+
+    # Watched trees are synced often, the runs changing nothing are quiet.
+    logging.log(
+        logging.INFO if stale or removed else logging.DEBUG,
+        "Synced %s: %s converted, %s removed, %s up to date",
+        source_dir,
+        len(stale) - failures,
+        len(removed),
+        len(items) - len(stale),
+    )
+    return 1 if failures else 0
+
+
+def start_observer(directory: Path, changed: threading.Event):
+    """Set an event on the changes of a directory tree.
+
+    :return: The running watchdog observer, None when watchdog is missing.
+    """
+    try:
+        from watchdog.events import FileSystemEventHandler
+        from watchdog.observers import Observer
+    except ImportError:
+        return None
+
+    class ChangeHandler(FileSystemEventHandler):
+        def on_any_event(self, event) -> None:
+            changed.set()
+
+    observer = Observer()
+    observer.schedule(ChangeHandler(), str(directory), recursive=True)
+    observer.start()
+    return observer
+
+
+def watch_tree(
+    arguments, source_dir: Path, output_dir: Path, manifest_path: Path
+) -> int:
+    """Sync a tree, and again every time it changes, until interrupted."""
+    changed = threading.Event()
+    observer = start_observer(source_dir, changed)
+    if observer is None:
+        logging.info(
+            "Checking %s every %s seconds", source_dir, arguments.watch_interval
+        )
+
+    try:
+        while True:
+            sync_tree(arguments, source_dir, output_dir, manifest_path)
+            # The interval is also a safety net for missed notifications.
+            changed.wait(arguments.watch_interval)
+            changed.clear()
+    except KeyboardInterrupt:
+        return 0
+    finally:
+        if observer is not None:
+            observer.stop()
+            observer.join()
+
+
+def sync(argv: list[str]) -> int:
+    """Run the sync command.
+
+    :param argv: The arguments following the sync command.
+    """
+    from image_go_nord_client.main import check_arguments
+
+    parser = get_sync_argument_parser()
+    arguments = parser.parse_args(argv)
+    check_arguments(parser, arguments)
+    source_dir = Path(arguments.input_path)
+    if not source_dir.is_dir():
+        parser.error("sync needs a source directory as --img")
+
+    if arguments.verify_engine:
+        parser.error("--verify can not be used with sync")
+
+    output_dir = get_batch_output_dir(arguments.output_path)
+    if output_dir.resolve().is_relative_to(source_dir.resolve()):
+        parser.error("the output directory can not be inside the source directory")
+
+    if arguments.quiet_mode:
+        logging.getLogger().setLevel(logging.CRITICAL)
+
+    manifest_path = Path(arguments.manifest_path or output_dir / MANIFEST_NAME)
+    if arguments.watch:
+        return watch_tree(arguments, source_dir, output_dir, manifest_path)
+
+    return sync_tree(arguments, source_dir, output_dir, manifest_path)
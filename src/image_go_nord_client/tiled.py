@@ -0,0 +1,463 @@
+"""Conversion of big images by horizontal strips.
+
+The image is converted a strip of rows at a time, so the memory used by the
+conversion depends on the size of a strip and not on the size of the image.
+Every strip is converted with the rows around it needed by the average box
+and by the blur, so the result has no seams.
+
+Uncompressed inputs (PPM, BMP, TGA, single strip TIFF) are read a strip at a
+time from the file and 8 bit PNG inputs are decoded a strip at a time from
+their IDAT chunks. PNG outputs are written a strip at a time. The other
+formats can not be read or written by strips, they are decoded or saved by
+Pillow in memory with a warning, the memory budget does not hold for them.
+"""
+
+import logging
+import struct
+import threading
+import zlib
+from io import BytesIO
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Union
+
+import numpy as np
+from PIL import Image
+
+from image_go_nord_client.blur import blur_pixels, get_blur_halo
+from image_go_nord_client.profiling import profile_stage
+
+__ALL__ = ["convert_image_tiled"]
+
+MEGABYTE = 1024 * 1024
+# Rough memory needed by the conversion of a pixel: the int64 box sums, the
+# colors, the distances and the palette indices.
+WORKING_BYTES_PER_PIXEL = 96
+PNG_CHUNK_SIZE = 256 * 1024
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Color types of the PNG files decoded by strips, with the number of bytes of
+# a pixel in the file, and the Pillow raw modes of their 8 bit variants.
+PNG_PIXEL_SIZES = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}
+PNG_RAW_MODES = ("L", "RGB", "P", "LA", "RGBA")
+
+# Raw modes of uncompressed files that can be read by rows: the number of
+# bytes of a pixel in the file and the position of the r, g, b (, a) bytes.
+RAW_MODES = {
+    "RGB": (3, (0, 1, 2)),
+    "BGR": (3, (2, 1, 0)),
+    "RGBX": (4, (0, 1, 2)),
+    "BGRX": (4, (2, 1, 0)),
+    "RGBA": (4, (0, 1, 2, 3)),
+    "BGRA": (4, (2, 1, 0, 3)),
+}
+
+
+class RawImageRows:
+    """Rows of an uncompressed image file, read from the file when indexed.
+
+    It has the shape of the image array (H, W, C) and indexing it with an
+    array of row numbers returns those rows as an array.
+    """
+
+    def __init__(self, path: Union[str, Path], image: Image.Image):
+        _, extents, offset, args = image.tile[0]
+        rawmode, stride, orientation = args if isinstance(args, tuple) else (args, 0, 1)
+        self.file_channels, self.channel_order = RAW_MODES[rawmode]
+        width, height = image.size
+        self.shape = (height, width, len(self.channel_order))
+        self.orientation = orientation
+        self.data = np.memmap(
+            path,
+            dtype=np.uint8,
+            mode="r",
+            offset=offset,
+            shape=(height, stride or width * self.file_channels),
+        )
+
+    @staticmethod
+    def is_supported(image: Image.Image) -> bool:
+        if len(image.tile) != 1 or image.mode not in ("RGB", "RGBA"):
+            return False
+
+        codec, extents, _, args = image.tile[0]
+        rawmode = args[0] if isinstance(args, tuple) else args
+        return (
+            codec == "raw"
+            and tuple(extents) == (0, 0, *image.size)
+            and rawmode in RAW_MODES
+            and len(RAW_MODES[rawmode][1]) == len(image.mode)
+        )
+
+    def __getitem__(self, rows: np.ndarray) -> np.ndarray:
+        height, width, _ = self.shape
+        rows = np.asarray(rows)
+        file_rows = rows if self.orientation > 0 else height - 1 - rows
+        raw = self.data[file_rows, : width * self.file_channels]
+        raw = raw.reshape(len(rows), width, self.file_channels)
+        return raw[..., self.channel_order]
+
+
+def get_png_chunk(chunk_type: bytes, data: bytes) -> bytes:
+    """Encode a PNG chunk, with its length and its checksum."""
+    return (
+        struct.pack(">I", len(data))
+        + chunk_type
+        + data
+        + struct.pack(">I", zlib.crc32(chunk_type + data))
+    )
+
+
+def read_png_header(file: BinaryIO) -> tuple[bytes, bytes]:
+    """Read the chunks of a PNG file before its image data.
+
+    :param file: The PNG file, at its start. It is left at the start of the
+        first IDAT chunk.
+    :return: The data of the IHDR chunk and the encoded PLTE and tRNS chunks,
+        needed to decode the pixels.
+    """
+    if file.read(len(PNG_SIGNATURE)) != PNG_SIGNATURE:
+        raise ValueError("Not a PNG file")
+
+    header, color_chunks = b"", b""
+    while len(chunk_header := file.read(8)) == 8:
+        length, chunk_type = struct.unpack(">I4s", chunk_header)
+        if chunk_type == b"IDAT":
+            file.seek(-8, 1)
+            return header, color_chunks
+
+        data = file.read(length)
+        file.read(4)
+        if chunk_type == b"IHDR":
+            header = data
+        elif chunk_type in (b"PLTE", b"tRNS"):
+            color_chunks += get_png_chunk(chunk_type, data)
+
+    raise ValueError("Truncated PNG file, no image data")
+
+
+def iter_png_lines(file: BinaryIO, line_size: int, batch_lines: int) -> Iterator[bytes]:
+    """Decompress the IDAT chunks of a PNG file a few scanlines at a time.
+
+    :param file: The PNG file, at the start of the first IDAT chunk.
+    :param line_size: The size of a scanline, with its filter type byte.
+    :param batch_lines: The number of scanlines yielded at once, the last
+        batch can be smaller.
+    """
+    decompressor = zlib.decompressobj()
+    batch_size = line_size * batch_lines
+    lines = b""
+    while len(chunk_header := file.read(8)) == 8:
+        length, chunk_type = struct.unpack(">I4s", chunk_header)
+        if chunk_type != b"IDAT":
+            break
+
+        while length:
+            data = file.read(min(length, PNG_CHUNK_SIZE))
+            if not data:
+                raise ValueError("Truncated PNG file")
+
+            length -= len(data)
+            # Limit the output, a few bytes can decompress to a whole image.
+            while data:
+                lines += decompressor.decompress(data, batch_size - len(lines))
+                data = decompressor.unconsumed_tail
+                if len(lines) == batch_size:
+                    yield lines
+                    lines = b""
+        file.read(4)
+
+    lines += decompressor.flush()
+    if len(lines) % line_size:
+        raise ValueError("Truncated PNG file")
+
+    for start in range(0, len(lines), batch_size):
+        yield lines[start : start + batch_size]
+
+
+class PngImageRows:
+    """Rows of a PNG file, decoded from its IDAT chunks when indexed.
+
+    It has the shape of the image array (H, W, C) and indexing it with an
+    array of row numbers returns those rows as an array, like RawImageRows.
+    The rows are decoded in order and kept until drop_rows_before is called.
+    The last tail_rows rows, read first by the average box wrapping around
+    the top of the image, are decoded by a first pass over the file.
+
+    The scanlines are unfiltered by Pillow: every batch is decoded as a PNG
+    of its own, starting with the last row of the previous batch.
+    """
+
+    def __init__(self, path: Union[str, Path], tail_rows: int = 0):
+        self.path = Path(path)
+        with open(self.path, "rb") as file:
+            self.header, self.color_chunks = read_png_header(file)
+
+        width, height, _, color_type, _, _, _ = struct.unpack(">IIBBBBB", self.header)
+        self.row_size = width * PNG_PIXEL_SIZES[color_type]
+        self.shape = (height, width, 4 if color_type in (4, 6) else 3)
+        self.lock = threading.Lock()
+
+        self.tail_start = height - min(tail_rows, height)
+        self.tail = np.empty((0, *self.shape[1:]), dtype=np.uint8)
+        if self.tail_start < height:
+            for first, rows in self._iter_rows():
+                if first + len(rows) > self.tail_start:
+                    self.tail = np.concatenate(
+                        [self.tail, rows[max(0, self.tail_start - first) :]]
+                    )
+
+        self.rows = self._iter_rows()
+        self.window = np.empty((0, *self.shape[1:]), dtype=np.uint8)
+        self.window_start = self.decoded_rows = self.first_kept_row = 0
+
+    @staticmethod
+    def is_supported(image: Image.Image) -> bool:
+        """Tell if a PNG opened by Pillow is a non interlaced 8 bit image."""
+        return (
+            image.format == "PNG"
+            and len(image.tile) == 1
+            and image.tile[0][3] in PNG_RAW_MODES
+            and not image.info.get("interlace")
+        )
+
+    def _decode_lines(self, lines: bytes, previous_row: Optional[bytes]) -> Image.Image:
+        # A first unfiltered row copied from the previous batch lets the
+        # filters of the batch read the row above it.
+        if previous_row is not None:
+            lines = b"\0" + previous_row + lines
+
+        width = self.shape[1]
+        height = len(lines) // (self.row_size + 1)
+        png = (
+            PNG_SIGNATURE
+            + get_png_chunk(
+                b"IHDR", struct.pack(">II", width, height) + self.header[8:]
+            )
+            + self.color_chunks
+            + get_png_chunk(b"IDAT", zlib.compress(lines, 0))
+            + get_png_chunk(b"IEND", b"")
+        )
+        image = Image.open(BytesIO(png))
+        image.load()
+        if previous_row is not None:
+            image = image.crop((0, 1, width, height))
+
+        return image
+
+    def _iter_rows(self) -> Iterator[tuple[int, np.ndarray]]:
+        """Decode the rows in order, yield the number of the first row and the
+        rows (R, W, C) of every batch."""
+        line_size = self.row_size + 1
+        first, previous_row = 0, None
+        with open(self.path, "rb") as file:
+            read_png_header(file)
+            for lines in iter_png_lines(
+                file, line_size, max(1, PNG_CHUNK_SIZE // line_size)
+            ):
+                image = self._decode_lines(lines, previous_row)
+                previous_row = image.tobytes()[-self.row_size :]
+                if image.mode not in ("RGB", "RGBA"):
+                    image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+                yield first, np.asarray(image)
+                first += image.height
+
+    def drop_rows_before(self, row: int) -> None:
+        """Free the decoded rows before a row, they can not be read anymore."""
+        with self.lock:
+            self.first_kept_row = max(self.first_kept_row, row)
+            dropped = min(max(0, row - self.window_start), len(self.window))
+            self.window = self.window[dropped:]
+            self.window_start += dropped
+
+    def close(self) -> None:
+        self.rows.close()
+
+    def __getitem__(self, rows: np.ndarray) -> np.ndarray:
+        rows = np.asarray(rows)
+        pixels = np.empty((len(rows), *self.shape[1:]), dtype=np.uint8)
+        in_tail = rows >= self.tail_start
+        pixels[in_tail] = self.tail[rows[in_tail] - self.tail_start]
+        if not len(file_rows := rows[~in_tail]):
+            return pixels
+
+        with self.lock:
+            if file_rows.min() < self.first_kept_row:
+                raise ValueError(
+                    f"Row {file_rows.min()} of {self.path} is no longer decoded"
+                )
+
+            batches = [self.window]
+            while self.decoded_rows <= file_rows.max():
+                first, batch = next(self.rows)
+                self.decoded_rows = first + len(batch)
+                batches.append(batch[max(0, self.first_kept_row - first) :])
+
+            self.window = np.concatenate(batches)
+            self.window_start = self.decoded_rows - len(self.window)
+            pixels[~in_tail] = self.window[file_rows - self.window_start]
+
+        return pixels
+
+
+def open_image_rows(path: Union[str, Path], tail_rows: int = 0):
+    """Open an image to be read by rows, without decoding it when possible.
+
+    :param tail_rows: The number of rows at the end of the image read with
+        the first rows, see PngImageRows.
+    :return: An array (H, W, C), a RawImageRows or a PngImageRows.
+    """
+    image = Image.open(path)
+    if RawImageRows.is_supported(image):
+        return RawImageRows(path, image)
+
+    if PngImageRows.is_supported(image):
+        image.close()
+        return PngImageRows(path, tail_rows)
+
+    logging.warning(
+        "Decoding %s in memory, only uncompressed and 8 bit PNG images are read "
+        "by strips",
+        path,
+    )
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+    return np.asarray(image)
+
+
+class PngStripWriter:
+    """Write a PNG file a strip of rows at a time."""
+
+    def __init__(self, path: Union[str, Path], width: int, height: int, mode: str):
+        self.path = Path(path)
+        self.file = open(path, "wb")
+        self.compressor = zlib.compressobj(6)
+        self.previous_row = np.zeros(width * len(mode), dtype=np.uint8)
+        self.pending = b""
+
+        color_type = 6 if mode == "RGBA" else 2
+        self.file.write(PNG_SIGNATURE)
+        self.write_chunk(
+            b"IHDR", struct.pack(">IIBBBBB", width, height, 8, color_type, 0, 0, 0)
+        )
+
+    def write_chunk(self, chunk_type: bytes, data: bytes) -> None:
+        self.file.write(get_png_chunk(chunk_type, data))
+
+    def write_rows(self, rows: np.ndarray) -> None:
+        """Append rows (R, W, C) of uint8 pixels, filtered with "Up"."""
+        rows = rows.reshape(len(rows), -1)
+        previous_rows = np.concatenate([self.previous_row[None, :], rows[:-1]])
+        filtered = np.empty((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+        filtered[:, 0] = 2
+        filtered[:, 1:] = rows - previous_rows
+        self.previous_row = rows[-1].copy()
+
+        self.pending += self.compressor.compress(filtered.tobytes())
+        if len(self.pending) >= PNG_CHUNK_SIZE:
+            self.write_chunk(b"IDAT", self.pending)
+            self.pending = b""
+
+    def close(self) -> None:
+        self.write_chunk(b"IDAT", self.pending + self.compressor.flush())
+        self.write_chunk(b"IEND", b"")
+        self.file.close()
+
+    def abort(self) -> None:
+        """Close and remove the partial file."""
+        self.file.close()
+        self.path.unlink(missing_ok=True)
+
+
+class ImageStripWriter:
+    """Collect the strips of an image and save it with Pillow when complete."""
+
+    def __init__(self, path: Union[str, Path], width: int, height: int, mode: str):
+        self.path = path
+        self.pixels = np.empty((height, width, len(mode)), dtype=np.uint8)
+        self.written_rows = 0
+        self.saving = False
+
+    def write_rows(self, rows: np.ndarray) -> None:
+        self.pixels[self.written_rows : self.written_rows + len(rows)] = rows
+        self.written_rows += len(rows)
+
+    def close(self) -> None:
+        self.saving = True
+        Image.fromarray(self.pixels).save(self.path)
+
+    def abort(self) -> None:
+        """Remove the partial file of a failed save, the output path is not
+        touched before."""
+        if self.saving:
+            Path(self.path).unlink(missing_ok=True)
+
+
+def get_strip_height(width: int, memory_budget: int, halo: int) -> int:
+    """The number of rows of a strip whose conversion fits the memory budget.
+
+    :param width: The width of the image.
+    :param memory_budget: The memory, in bytes, available to a strip.
+    :param halo: The rows converted above and below every strip.
+    """
+    rows = memory_budget // (width * WORKING_BYTES_PER_PIXEL)
+    return max(1, rows - 2 * halo)
+
+
+def convert_image_tiled(
+    go_nord,
+    input_path: Union[str, Path],
+    output_path: Union[str, Path],
+    memory_budget: int,
+) -> None:
+    """Convert an image by strips of rows fitting a memory budget.
+
+    :param go_nord: The configured NumpyGoNord.
+    :param input_path: The path of the image to convert.
+    :param output_path: The path of the converted image.
+    :param memory_budget: The memory, in bytes, available to a strip.
+    """
+    # The average box reads the rows above a pixel, wrapping around to the
+    # last rows of the image at its top.
+    box_halo = max(0, -go_nord.avg_box_data["w"]) if go_nord.use_avg_color else 0
+    pixels = open_image_rows(input_path, tail_rows=box_halo)
+    height, width, channels = pixels.shape
+    mode = "RGBA" if channels == 4 else "RGB"
+
+    blur_halo = get_blur_halo(go_nord.blur_radius) if go_nord.use_gaussian_blur else 0
+    strip_height = get_strip_height(width, memory_budget, blur_halo)
+    logging.info("Converting by strips of %s rows", strip_height)
+
+    if Path(output_path).suffix.lower() == ".png":
+        writer = PngStripWriter(output_path, width, height, mode)
+    else:
+        logging.warning(
+            "Saving %s once the whole image is converted, only PNG images are "
+            "written by strips",
+            output_path,
+        )
+        writer = ImageStripWriter(output_path, width, height, mode)
+
+    try:
+        for start in range(0, height, strip_height):
+            stop = min(start + strip_height, height)
+            first, last = max(0, start - blur_halo), min(height, stop + blur_halo)
+            if isinstance(pixels, PngImageRows):
+                pixels.drop_rows_before(first - box_halo)
+            converted = go_nord.convert_pixels(pixels, rows=np.arange(first, last))
+
+            if go_nord.use_gaussian_blur:
+                with profile_stage(go_nord.profiler, "blur"):
+                    blur_pixels(converted, go_nord.blur_radius, go_nord.threads)
+
+            with profile_stage(go_nord.profiler, "encode"):
+                writer.write_rows(converted[start - first : stop - first])
+
+        with profile_stage(go_nord.profiler, "encode"):
+            writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+    finally:
+        if isinstance(pixels, PngImageRows):
+            pixels.close()
@@ -0,0 +1,82 @@
+import logging
+from argparse import Namespace
+from pathlib import Path
+
+from image_go_nord_client.batch import collect_batch_items, is_batch_input
+
+__ALL__ = ["verify_engine"]
+
+
+def are_conversions_identical(expected, actual) -> bool:
+    """Compare two converted Pillow images pixel by pixel.
+
+    :param expected: The image converted by the reference engine.
+    :param actual: The image converted by the engine under verification.
+    """
+    if actual.mode == "P":
+        # An indexed output is identical if its colors are.
+        actual = actual.convert(expected.mode)
+
+    return (
+        expected.mode == actual.mode
+        and expected.size == actual.size
+        and expected.tobytes() == actual.tobytes()
+    )
+
+
+def verify_engine(arguments) -> int:
+    """Convert the input images with the selected engine and with GoNord, the
+    reference engine, and check that the results are pixel-identical.
+
+    :param arguments: The parsed command line arguments.
+    :return: 0 if every image is identical, 1 otherwise.
+    """
+    from image_go_nord_client.main import create_converter
+
+    if is_batch_input(arguments.input_path):
+        paths = [
+            item.input_path
+            for item in collect_batch_items(arguments.input_path, Path("."))
+        ]
+    else:
+        paths = [Path(arguments.input_path)]
+
+    # The options of the numpy engine only are left out of the reference.
+    reference_arguments = Namespace(
+        **{
+            **vars(arguments),
+            "engine": "gonord",
+            "use_lookup_table": False,
+            "threads": None,
+            "blur_radius": None,
+            "indexed_output": False,
+            "tile_memory": None,
+        }
+    )
+    if not (
+        (reference := create_converter(reference_arguments))
+        and (engine := create_converter(arguments))
+    ):
+        return 1
+
+    logging.info("Verifying the %s engine on %s images", arguments.engine, len(paths))
+    mismatches = 0
+    for path in paths:
+        try:
+            expected = reference.convert_image(reference.open_file(path))
+            actual = engine.convert_image(engine.open_file(path))
+        except Exception as error:
+            mismatches += 1
+            logging.error(
+                "Failed to convert %s: %s: %s", path, type(error).__name__, error
+            )
+            continue
+
+        if are_conversions_identical(expected, actual):
+            logging.info("Identical: %s", path)
+        else:
+            mismatches += 1
+            logging.error("Different: %s", path)
+
+    logging.info("%s of %s images are identical", len(paths) - mismatches, len(paths))
+    return 1 if mismatches else 0
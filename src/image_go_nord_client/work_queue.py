@@ -0,0 +1,473 @@
+"""Job manifests converted by workers sharing a directory.
+
+A job manifest lists the images to convert, every item with its input,
+output, palette, colors and flags (options of the client, like --blur). It
+is a JSON file, a list of items or {"items": [...]}, or a CSV file with the
+columns input, output, palette, colors (separated by commas) and flags
+(quoted like in a shell). Relative paths are relative to the manifest. Every
+item is checked with the parser of the client before the first conversion.
+
+Any number of worker commands, on one machine or on many machines sharing
+the queue directory, convert the items of a manifest with no server:
+
+- a worker claims an item by creating its lease file, which only one worker
+  can create, and renews the lease while converting the item;
+- a lease not renewed in time has expired, the worker reclaiming it creates
+  the lease of the next generation, which again only one worker can create;
+- the result of an item is recorded in the results directory, the workers
+  stop when every item has a result.
+
+The leases compare the clocks of the machines, they must be synchronized
+within a fraction of the lease time.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import os
+import shlex
+import socket
+import tempfile
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Optional, Union
+
+from image_go_nord_client import (
+    WORKER_COMMAND,
+    get_argument_parser,
+    parse_positive_float,
+)
+
+__ALL__ = ["JobItem", "WorkQueue", "load_job_manifest", "run_worker"]
+
+LEASES_DIR = "leases"
+RESULTS_DIR = "results"
+LEASE_SUFFIX = ".lease"
+DEFAULT_LEASE_TIME = 60.0
+DEFAULT_POLL_INTERVAL = 5.0
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class JobItem:
+    input: str
+    output: str
+    palette: str = "nord"
+    colors: list[str] = field(default_factory=list)
+    flags: list[str] = field(default_factory=list)
+
+    def get_argv(self, base_dir: Path) -> list[str]:
+        """The command line converting the item, with paths relative to a
+        directory."""
+        argv = [
+            f"--img={base_dir / self.input}",
+            f"--out={base_dir / self.output}",
+            f"--palette={self.palette}",
+        ]
+        if self.colors:
+            argv.append(f"--colors={','.join(self.colors)}")
+
+        return argv + self.flags
+
+
+@dataclass
+class Lease:
+    item_id: str
+    generation: int
+    path: Path
+
+
+def get_item_id(index: int, item: JobItem) -> str:
+    """The id of an item, changed when the item changes in the manifest."""
+    digest = hashlib.sha256(json.dumps(asdict(item), sort_keys=True).encode())
+    return f"{index:06d}-{digest.hexdigest()[:12]}"
+
+
+def parse_item(index: int, data: dict) -> JobItem:
+    colors = data.get("colors") or []
+    flags = data.get("flags") or []
+    try:
+        return JobItem(
+            input=data["input"],
+            output=data["output"],
+            palette=data.get("palette") or "nord",
+            colors=colors.split(",") if isinstance(colors, str) else list(colors),
+            flags=shlex.split(flags) if isinstance(flags, str) else list(flags),
+        )
+    except KeyError as error:
+        raise ValueError(f"Item {index}: missing {error.args[0]}") from None
+
+
+def get_item_arguments(item: JobItem, base_dir: Path) -> argparse.Namespace:
+    """Parse the options of an item as the client does.
+
+    :raises ValueError: If the options can not convert a single image.
+    """
+    from image_go_nord_client.batch import is_batch_input
+    from image_go_nord_client.converter import find_palette
+    from image_go_nord_client.main import (
+        check_arguments,
+        is_image_format,
+        uses_streams,
+    )
+
+    def fail(message: str = "") -> None:
+        raise ValueError(message or "only conversion options can be used")
+
+    parser = get_argument_parser()
+    parser.error = fail
+    # The --help and --version actions exit the parser.
+    parser.exit = lambda status=0, message=None: fail(message)
+    arguments, unknown = parser.parse_known_args(item.get_argv(base_dir))
+    if unknown:
+        fail(f"unknown options {' '.join(unknown)}")
+
+    check_arguments(parser, arguments)
+    if (
+        is_batch_input(arguments.input_path)
+        or uses_streams(arguments)
+        or arguments.targets
+    ):
+        fail("an item converts a single image to a single output file")
+
+    if arguments.verify_engine or arguments.profile or arguments.resume:
+        fail("--verify, --profile and --resume can not be used in a job")
+
+    if arguments.output_format and not is_image_format(arguments.output_format):
+        fail(f"unknown output format {arguments.output_format}")
+
+    find_palette(arguments.palette, arguments.colors, arguments.palette_dirs)
+    return arguments
+
+
+def load_job_manifest(
+    path: Union[str, Path],
+) -> list[tuple[str, JobItem, argparse.Namespace]]:
+    """Read and check a job manifest.
+
+    :param path: The path of the JSON or CSV manifest.
+    :return: The id, the item and the parsed options of every item.
+    :raises ValueError: If the manifest or one of its items is not valid.
+    """
+    path = Path(path)
+    with open(path, newline="") as file:
+        if path.suffix.lower() == ".csv":
+            rows = list(csv.DictReader(file))
+        else:
+            rows = json.load(file)
+            if isinstance(rows, dict):
+                rows = rows.get("items")
+
+    if not isinstance(rows, list):
+        raise ValueError("The manifest must be a list of items")
+
+    items = []
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            raise ValueError(f"Item {index}: not an object")
+
+        item = parse_item(index, row)
+        try:
+            arguments = get_item_arguments(item, path.parent)
+        except ValueError as error:
+            raise ValueError(f"Item {index}: {error}") from None
+
+        items.append((get_item_id(index, item), item, arguments))
+
+    return items
+
+
+def write_json_atomically(path: Path, data: dict) -> None:
+    file_descriptor, temp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(file_descriptor, "w") as file:
+            json.dump(data, file)
+        os.replace(temp_path, path)
+    except BaseException:
+        Path(temp_path).unlink(missing_ok=True)
+        raise
+
+
+class WorkQueue:
+    """The leases and the results of the items of a manifest in a directory
+    shared by the workers."""
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        worker_id: str,
+        lease_time: float = DEFAULT_LEASE_TIME,
+    ):
+        self.leases_dir = Path(directory) / LEASES_DIR
+        self.results_dir = Path(directory) / RESULTS_DIR
+        self.worker_id = worker_id
+        self.lease_time = lease_time
+        self.leases_dir.mkdir(parents=True, exist_ok=True)
+        self.results_dir.mkdir(parents=True, exist_ok=True)
+
+    def get_results(self) -> dict[str, dict]:
+        """The recorded results by item id."""
+        results = {}
+        for path in self.results_dir.glob("*.json"):
+            try:
+                results[path.stem] = json.loads(path.read_text())
+            except (FileNotFoundError, ValueError):
+                continue
+
+        return results
+
+    def has_result(self, item_id: str) -> bool:
+        return (self.results_dir / f"{item_id}.json").exists()
+
+    def get_lease_path(self, item_id: str, generation: int) -> Path:
+        return self.leases_dir / f"{item_id}.{generation}{LEASE_SUFFIX}"
+
+    def get_generation(self, item_id: str) -> int:
+        """The generation of the current lease of an item, -1 if it has none."""
+        generations = [
+            int(path.name[len(item_id) + 1 : -len(LEASE_SUFFIX)])
+            for path in self.leases_dir.glob(f"{item_id}.*{LEASE_SUFFIX}")
+        ]
+        return max(generations, default=-1)
+
+    def get_expiry(self, path: Path) -> float:
+        try:
+            return json.loads(path.read_text())["expires"]
+        except (ValueError, KeyError):
+            # Created but not written yet, or by a worker killed meanwhile.
+            return path.stat().st_mtime + self.lease_time
+
+    def write_lease(self, lease: Lease) -> None:
+        write_json_atomically(
+            lease.path,
+            {"worker": self.worker_id, "expires": time.time() + self.lease_time},
+        )
+
+    def claim(self, item_id: str) -> Optional[Lease]:
+        """Claim an item without lease or with an expired one.
+
+        :return: The lease, None if another worker holds or took it.
+        """
+        generation = self.get_generation(item_id)
+        try:
+            if generation >= 0:
+                path = self.get_lease_path(item_id, generation)
+                if self.get_expiry(path) > time.time():
+                    return None
+                logging.info("Reclaiming %s, its lease has expired", item_id)
+
+            lease_path = self.get_lease_path(item_id, generation + 1)
+            os.close(os.open(lease_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        except (FileExistsError, FileNotFoundError):
+            return None
+
+        # The worker recording the item may have removed its leases since the
+        # item was checked, a result is written before the leases are removed.
+        if self.has_result(item_id):
+            lease_path.unlink(missing_ok=True)
+            return None
+
+        lease = Lease(item_id, generation + 1, lease_path)
+        self.write_lease(lease)
+        return lease
+
+    def renew(self, lease: Lease) -> bool:
+        """Extend a lease, False if it has been reclaimed by another worker."""
+        if self.get_generation(lease.item_id) != lease.generation:
+            return False
+
+        self.write_lease(lease)
+        return True
+
+    def record(self, lease: Lease, item: JobItem, error: Optional[str]) -> None:
+        """Record the result of an item and release its lease."""
+        write_json_atomically(
+            self.results_dir / f"{lease.item_id}.json",
+            {
+                "status": FAILED if error else DONE,
+                "error": error,
+                "worker": self.worker_id,
+                "input": item.input,
+                "output": item.output,
+                "time": time.time(),
+            },
+        )
+        for generation in range(lease.generation + 1):
+            self.get_lease_path(lease.item_id, generation).unlink(missing_ok=True)
+
+
+class LeaseRenewer:
+    """Renew a lease in a thread while the item is converted."""
+
+    def __init__(self, queue: WorkQueue, lease: Lease):
+        self.queue = queue
+        self.lease = lease
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self) -> None:
+        while not self.stopped.wait(self.queue.lease_time / 3):
+            if not self.queue.renew(self.lease):
+                logging.warning("The lease of %s was reclaimed", self.lease.item_id)
+                return
+
+    def __enter__(self) -> "LeaseRenewer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.stopped.set()
+        self.thread.join()
+
+
+def convert_job_item(arguments: argparse.Namespace) -> Optional[str]:
+    """Convert the image of an item, the error message if it failed."""
+    from image_go_nord_client.batch import atomic_output
+    from image_go_nord_client.main import convert_single_image
+
+    output_path = Path(arguments.output_path)
+    try:
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        with atomic_output(output_path) as temp_path:
+            item_arguments = argparse.Namespace(**vars(arguments))
+            item_arguments.output_path = str(temp_path)
+            if convert_single_image(item_arguments):
+                return "the palette can not be used"
+    except Exception as error:
+        return f"{type(error).__name__}: {error}"
+
+    return None
+
+
+def run_worker(
+    items: list[tuple[str, JobItem, argparse.Namespace]],
+    queue: WorkQueue,
+    poll_interval: float = DEFAULT_POLL_INTERVAL,
+) -> int:
+    """Convert the items of a manifest until every item has a result.
+
+    :param items: The items, see load_job_manifest.
+    :param queue: The queue shared with the other workers.
+    :param poll_interval: Seconds to wait when every item without result is
+        leased by other workers.
+    :return: 0 if every item was converted, 1 if some failed.
+    """
+    # The workers start from different items to claim less often the same.
+    offset = int(hashlib.sha256(queue.worker_id.encode()).hexdigest(), 16)
+    converted = 0
+    while True:
+        results = queue.get_results()
+        pending = [entry for entry in items if entry[0] not in results]
+        if not pending:
+            break
+
+        start = offset % len(pending)
+        claimed = False
+        for item_id, item, arguments in pending[start:] + pending[:start]:
+            if queue.has_result(item_id) or not (lease := queue.claim(item_id)):
+                continue
+
+            claimed = True
+            logging.info("Converting %s: %s", item_id, item.input)
+            with LeaseRenewer(queue, lease):
+                error = convert_job_item(arguments)
+            if error:
+                logging.error("Failed to convert %s: %s", item.input, error)
+            queue.record(lease, item, error)
+            converted += 1
+
+        if not claimed:
+            time.sleep(poll_interval)
+
+    failures = [result for result in results.values() if result["status"] == FAILED]
+    logging.info(
+        "Every item has a result, %s failed, %s converted by %s",
+        len(failures),
+        converted,
+        queue.worker_id,
+    )
+    return 1 if failures else 0
+
+
+def get_worker_argument_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog=f"image-go-nord-client {WORKER_COMMAND}",
+        description="Convert the items of a job manifest with other workers.",
+    )
+    parser.add_argument(
+        "manifest_path",
+        type=Path,
+        metavar="MANIFEST",
+        help="the JSON or CSV job manifest",
+    )
+    parser.add_argument(
+        "--queue-dir",
+        type=Path,
+        dest="queue_dir",
+        metavar="PATH",
+        default=None,
+        help="directory shared by the workers (default: the manifest path "
+        "followed by .queue)",
+    )
+    parser.add_argument(
+        "--worker-id",
+        type=str,
+        dest="worker_id",
+        metavar="ID",
+        default=None,
+        help="name of the worker in the leases and the results (default: host "
+        "name and process id)",
+    )
+    parser.add_argument(
+        "--lease-time",
+        type=parse_positive_float,
+        dest="lease_time",
+        metavar="SECONDS",
+        default=DEFAULT_LEASE_TIME,
+        help="seconds after which the item of a worker that stopped renewing "
+        f"its lease is converted by another worker (default: {DEFAULT_LEASE_TIME:g})",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=parse_positive_float,
+        dest="poll_interval",
+        metavar="SECONDS",
+        default=DEFAULT_POLL_INTERVAL,
+        help="seconds between two checks of the items leased by other workers "
+        f"(default: {DEFAULT_POLL_INTERVAL:g})",
+    )
+    parser.add_argument(
+        "-q",
+        "--quiet",
+        action="store_true",
+        dest="quiet_mode",
+        default=False,
+        help="quiet (no output)",
+    )
+    return parser
+
+
+def work(argv: list[str]) -> int:
+    """Run a worker until every item of its manifest has a result.
+
+    :param argv: The arguments after the worker command.
+    """
+    arguments = get_worker_argument_parser().parse_args(argv)
+    if arguments.quiet_mode:
+        logging.getLogger().setLevel(logging.CRITICAL)
+
+    try:
+        items = load_job_manifest(arguments.manifest_path)
+    except (OSError, ValueError) as error:
+        logging.error("Invalid manifest %s: %s", arguments.manifest_path, error)
+        return 2
+
+    queue_dir = arguments.queue_dir or Path(f"{arguments.manifest_path}.queue")
+    worker_id = arguments.worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    queue = WorkQueue(queue_dir, worker_id, arguments.lease_time)
+    return run_worker(items, queue, arguments.poll_interval)
@@ -0,0 +1,197 @@
+import gc
+import tempfile
+import warnings
+import weakref
+from io import BytesIO
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+import numpy as np
+from ImageGoNord import GoNord
+from PIL import Image, ImageSequence
+
+from image_go_nord_client.animation import (
+    MAX_FRAME_WORKERS,
+    FrameTask,
+    convert_animation,
+    get_frame_workers,
+    map_in_order,
+    open_animation,
+    read_frame_tasks,
+)
+from image_go_nord_client.numpy_engine import NumpyGoNord
+
+
+def create_animation(image_format: str, alpha: bool = False) -> BytesIO:
+    random = np.random.default_rng(12)
+    background = random.integers(0, 256, (30, 40, 4 if alpha else 3), dtype=np.uint8)
+    frames = []
+    for index in range(6):
+        pixels = background.copy()
+        pixels[2 + 3 * index : 7 + 3 * index, 5:15, :3] = (250, 20 * index, 10)
+        frames.append(Image.fromarray(pixels))
+
+    animation = BytesIO()
+    frames[0].save(
+        animation,
+        format=image_format,
+        save_all=True,
+        append_images=frames[1:],
+        duration=[100 + 10 * index for index in range(6)],
+        loop=2,
+    )
+    animation.seek(0)
+    return animation
+
+
+def convert_frames_one_by_one(go_nord, animation) -> list[np.ndarray]:
+    return [
+        np.asarray(go_nord.convert_image(frame.convert("RGB")).convert("RGB"))
+        for frame in ImageSequence.Iterator(Image.open(animation))
+    ]
+
+
+class AnimationShould(TestCase):
+    def test_open_only_animations(self):
+        self.assertIsNotNone(open_animation(create_animation("GIF")))
+        still = BytesIO()
+        Image.new("RGB", (4, 4)).save(still, format="PNG")
+
+        self.assertIsNone(open_animation(still))
+        self.assertIsNone(open_animation("missing.gif"))
+
+    def test_close_the_still_images(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            still_path = Path(tmpdirname) / "still.png"
+            Image.new("RGB", (4, 4)).save(still_path)
+
+            with warnings.catch_warnings(record=True) as caught:
+                warnings.simplefilter("always", ResourceWarning)
+                self.assertIsNone(open_animation(still_path))
+                gc.collect()
+
+        self.assertEqual([], [w for w in caught if w.category is ResourceWarning])
+
+    def test_find_the_unchanged_frames_and_the_changed_boxes(self):
+        animation = ImageSequence.Iterator(Image.open(create_animation("PNG")))
+        frames = [frame.copy() for frame, _ in zip(animation, range(2))]
+        frames.append(frames[1].copy())
+
+        tasks = list(read_frame_tasks(frames, "RGB", True))
+
+        self.assertEqual(3, len(tasks))
+        self.assertIsNone(tasks[0].box)
+        self.assertEqual((30, 40, 3), tasks[0].pixels.shape)
+        self.assertEqual((slice(2, 10), slice(5, 15)), tasks[1].box)
+        self.assertEqual((8, 10, 3), tasks[1].pixels.shape)
+        self.assertIsNone(tasks[2].pixels)
+        self.assertEqual([100, 110, 110], [task.duration for task in tasks])
+
+    def test_convert_every_frame_as_a_whole_image(self):
+        for image_format in ("GIF", "PNG"):
+            for go_nord in (GoNord(), NumpyGoNord()):
+                animation = create_animation(image_format)
+                expected = convert_frames_one_by_one(go_nord, animation)
+                output = BytesIO()
+
+                convert_animation(
+                    go_nord, open_animation(animation), output, image_format
+                )
+
+                converted = Image.open(output)
+                self.assertEqual(6, converted.n_frames)
+                self.assertEqual(2, converted.info["loop"])
+                for frame, expected_frame in zip(
+                    ImageSequence.Iterator(converted), expected
+                ):
+                    np.testing.assert_array_equal(
+                        expected_frame, np.asarray(frame.convert("RGB"))
+                    )
+
+    def test_convert_frames_in_parallel_and_with_alpha(self):
+        go_nord = NumpyGoNord()
+        go_nord.set_threads(3)
+        go_nord.enable_gaussian_blur()
+        animation = create_animation("PNG", alpha=True)
+        expected = [
+            np.asarray(go_nord.convert_image(frame.convert("RGBA")))
+            for frame in ImageSequence.Iterator(Image.open(animation))
+        ]
+        output = BytesIO()
+
+        convert_animation(go_nord, open_animation(animation), output, "PNG")
+
+        converted = Image.open(output)
+        self.assertEqual(
+            [100, 110, 120, 130, 140, 150],
+            [frame.info["duration"] for frame in ImageSequence.Iterator(converted)],
+        )
+        for frame, expected_frame in zip(ImageSequence.Iterator(converted), expected):
+            np.testing.assert_array_equal(expected_frame, np.asarray(frame))
+
+    def test_convert_webp_animations(self):
+        go_nord = NumpyGoNord()
+        output = BytesIO()
+
+        convert_animation(
+            go_nord, open_animation(create_animation("GIF")), output, "WEBP"
+        )
+
+        converted = Image.open(output)
+        self.assertEqual("WEBP", converted.format)
+        self.assertEqual(6, converted.n_frames)
+        self.assertEqual(2, converted.info["loop"])
+
+    def test_not_keep_the_converted_frames_while_writing_them(self):
+        animation = open_animation(create_animation("GIF"))
+        for image_format in ("GIF", "PNG", "WEBP"):
+            frames = []
+            most_alive = []
+
+            def convert_frames(go_nord, image, mode):
+                for index in range(6):
+                    frame = Image.new(mode, image.size, (40 * index, 0, 0))
+                    frames.append(weakref.ref(frame))
+                    most_alive.append(sum(alive() is not None for alive in frames))
+                    yield frame, FrameTask(None, None, 100, None)
+
+            with self.subTest(image_format), patch(
+                "image_go_nord_client.animation.convert_frames", convert_frames
+            ):
+                output = BytesIO()
+                convert_animation(NumpyGoNord(), animation, output, image_format)
+
+                self.assertEqual(6, Image.open(output).n_frames)
+                self.assertLessEqual(max(most_alive), 3)
+
+    def test_size_the_frame_pool_from_the_cpu_count(self):
+        go_nord = NumpyGoNord()
+        with patch("os.cpu_count", return_value=12):
+            self.assertEqual(1, get_frame_workers(GoNord()))
+            self.assertEqual(MAX_FRAME_WORKERS, get_frame_workers(go_nord))
+            go_nord.set_threads(4)
+            self.assertEqual(3, get_frame_workers(go_nord))
+
+    def test_save_the_first_frame_to_still_formats(self):
+        go_nord = NumpyGoNord()
+        animation = create_animation("GIF")
+        output = BytesIO()
+
+        convert_animation(go_nord, open_animation(animation), output, "JPEG")
+
+        self.assertEqual(1, getattr(Image.open(output), "n_frames", 1))
+
+    def test_map_in_order_reading_few_items_ahead(self):
+        read = []
+
+        def items():
+            for item in range(20):
+                read.append(item)
+                yield item
+
+        results = map_in_order(Mock(side_effect=lambda item: item * 2), items(), 2)
+
+        self.assertEqual(0, next(results))
+        self.assertLessEqual(len(read), 5)
+        self.assertEqual([2 * item for item in range(1, 20)], list(results))
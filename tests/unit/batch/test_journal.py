@@ -0,0 +1,56 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from image_go_nord_client.batch import atomic_output
+from image_go_nord_client.journal import DONE, RUN, STARTED, BatchJournal
+
+
+class BatchJournalShould(TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.temp_path = Path(self.temp_dir.name)
+        self.journal = BatchJournal(self.temp_path / "journal.jsonl")
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_give_the_last_event_of_every_input(self):
+        self.journal.reset()
+        self.journal.record(RUN, options="abc")
+        self.journal.record(STARTED, input="a.png", output="out/a.png")
+        self.journal.record(STARTED, input="b.png", output="out/b.png")
+        self.journal.record(DONE, input="a.png", output="out/a.png")
+        self.journal.record(RUN, options="abc")
+
+        self.assertEqual(
+            ("abc", {"a.png": DONE, "b.png": STARTED}), self.journal.get_state()
+        )
+
+    def test_skip_the_line_cut_by_a_killed_run(self):
+        self.journal.reset()
+        self.journal.record(RUN, options="abc")
+        with open(self.journal.path, "a") as file:
+            file.write('{"event": "done", "inp')
+
+        self.assertEqual(("abc", {}), self.journal.get_state())
+        self.assertEqual((None, {}), BatchJournal(self.temp_path / "none").get_state())
+
+    def test_write_outputs_atomically(self):
+        output_path = self.temp_path / "image.png"
+        output_path.write_bytes(b"previous")
+
+        with self.assertRaises(RuntimeError):
+            with atomic_output(output_path) as temp_path:
+                self.assertEqual(".png", temp_path.suffix)
+                temp_path.write_bytes(b"partial")
+                raise RuntimeError("killed")
+
+        self.assertEqual(b"previous", output_path.read_bytes())
+        with atomic_output(output_path) as temp_path:
+            temp_path.write_bytes(b"converted")
+
+        self.assertEqual(b"converted", output_path.read_bytes())
+        self.assertEqual(
+            ["image.png"], [path.name for path in self.temp_path.iterdir()]
+        )
@@ -0,0 +1,145 @@
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from PIL import Image
+
+from image_go_nord_client import get_argument_parser
+from image_go_nord_client import scheduler
+from image_go_nord_client.batch import BatchItem, BatchResult
+from image_go_nord_client.scheduler import (
+    MemoryQueue,
+    convert_by_memory,
+    estimate_peak_memory,
+)
+from image_go_nord_client.tiled import MEGABYTE, WORKING_BYTES_PER_PIXEL
+
+
+def parse_arguments(*options):
+    return get_argument_parser().parse_args(["--img=images", "--out=out", *options])
+
+
+class EstimatePeakMemoryShould(TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.temp_path = Path(self.temp_dir.name)
+        self.image_path = self.temp_path / "image.png"
+        Image.new("RGB", (40, 30)).save(self.image_path)
+        self.item = BatchItem(self.image_path, self.temp_path / "out.png")
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_grow_with_the_pixels_of_the_image(self):
+        estimate = estimate_peak_memory(self.item, parse_arguments("--engine=numpy"))
+
+        self.assertEqual(1200 * (3 + WORKING_BYTES_PER_PIXEL), estimate)
+
+    def test_be_bounded_by_the_strips_in_tiled_mode(self):
+        arguments = parse_arguments("--engine=numpy", "--tile-memory=2")
+
+        estimate = estimate_peak_memory(self.item, arguments)
+
+        self.assertEqual(1200 * 3 + 2 * MEGABYTE, estimate)
+
+    def test_count_every_frame_kept_by_the_encoders(self):
+        still = estimate_peak_memory(self.item, parse_arguments())
+        frames = [Image.new("RGB", (40, 30), (index, 0, 0)) for index in range(3)]
+        frames[0].save(self.image_path, save_all=True, append_images=frames[1:])
+
+        for extension in [".png", ".gif", ".webp"]:
+            with self.subTest(extension):
+                item = BatchItem(self.image_path, self.temp_path / f"out{extension}")
+
+                estimate = estimate_peak_memory(item, parse_arguments())
+
+                self.assertEqual(still + 2 * 1200 * 4, estimate)
+
+        first_frame_item = BatchItem(self.image_path, self.temp_path / "out.jpg")
+        self.assertEqual(
+            still, estimate_peak_memory(first_frame_item, parse_arguments())
+        )
+
+    def test_be_zero_for_unreadable_images(self):
+        self.image_path.write_text("not an image")
+
+        self.assertEqual(0, estimate_peak_memory(self.item, parse_arguments()))
+
+
+class MemoryQueueShould(TestCase):
+    def test_give_the_largest_item_that_fits(self):
+        queue = MemoryQueue([5, 1, 8, 3])
+
+        self.assertEqual(2, queue.pop_fitting(10))
+        self.assertEqual(0, queue.pop_fitting(7))
+        self.assertIsNone(queue.pop_fitting(0))
+        self.assertEqual(3, queue.pop_largest())
+        self.assertEqual(1, len(queue))
+
+
+class ConvertByMemoryShould(TestCase):
+    sizes = {"medium": 5, "big": 8, "small1": 1, "small2": 1, "small3": 1}
+
+    def setUp(self) -> None:
+        self.started = []
+        self.running = set()
+        self.peak_memory = 0
+        self.lock = threading.Lock()
+
+    def convert_item(self, item: BatchItem) -> BatchResult:
+        name = item.input_path.name
+        with self.lock:
+            self.started.append(name)
+            self.running.add(name)
+            memory = sum(self.sizes[running] for running in self.running)
+            self.peak_memory = max(self.peak_memory, memory)
+
+        time.sleep(0.05 * self.sizes[name])
+        with self.lock:
+            self.running.remove(name)
+
+        return BatchResult(item=item)
+
+    def convert(self, max_memory: int, jobs: int) -> list[BatchResult]:
+        items = [BatchItem(Path(name), Path(name)) for name in self.sizes]
+        arguments = parse_arguments(f"--max-memory={max_memory}")
+
+        with patch.object(scheduler, "WORKER_MEMORY", 1), patch.object(
+            scheduler, "ProcessPoolExecutor", ThreadPoolExecutor
+        ), patch.object(scheduler, "_init_worker", lambda *args: None), patch.object(
+            scheduler, "_convert_item", self.convert_item
+        ), patch.object(
+            scheduler,
+            "estimate_peak_memory",
+            lambda item, arguments: self.sizes[item.input_path.name] * MEGABYTE,
+        ):
+            results = list(convert_by_memory(arguments, items, jobs))
+
+        self.assertEqual(items, [result.item for result in results])
+        return results
+
+    def test_start_the_largest_images_that_fit_first(self):
+        self.convert(max_memory=11, jobs=4)
+
+        self.assertEqual("big", self.started[0])
+        self.assertTrue(all(name.startswith("small") for name in self.started[1:3]))
+        self.assertEqual("medium", self.started[-1])
+        self.assertLessEqual(self.peak_memory, 11)
+
+    def test_convert_alone_an_image_bigger_than_the_memory(self):
+        with self.assertLogs(level="WARNING") as cm:
+            self.convert(max_memory=6, jobs=4)
+
+        self.assertEqual("medium", self.started[0])
+        self.assertIn("big needs about 8 MB", cm.output[0])
+        self.assertEqual(8, self.peak_memory)
+
+    def test_run_at_most_jobs_conversions(self):
+        self.convert(max_memory=100, jobs=2)
+
+        self.assertEqual(["big", "medium"], self.started[:2])
+        self.assertLessEqual(self.peak_memory, 13)
@@ -0,0 +1,71 @@
+import importlib.util
+from pathlib import Path
+from unittest import TestCase
+
+BENCHMARK_PATH = Path(__file__).parents[3] / "benchmarks" / "conversion_benchmark.py"
+
+
+def load_benchmark():
+    spec = importlib.util.spec_from_file_location(
+        "conversion_benchmark", BENCHMARK_PATH
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+benchmark = load_benchmark()
+
+
+def get_result(relative_speed: float) -> dict:
+    return {"relative_speed": relative_speed}
+
+
+class CompareShould(TestCase):
+    def test_report_the_cases_slower_than_the_tolerance(self):
+        baseline = {"fast": get_result(1.0), "slow": get_result(1.0)}
+        results = {"fast": get_result(0.76), "slow": get_result(0.74)}
+
+        self.assertEqual(["slow"], benchmark.compare(results, baseline, 0.25))
+
+    def test_accept_the_cases_faster_than_the_baseline(self):
+        baseline = {"case": get_result(1.0)}
+
+        self.assertEqual([], benchmark.compare({"case": get_result(1.2)}, baseline, 0))
+
+    def test_ignore_the_cases_missing_from_the_baseline(self):
+        baseline = {"case": get_result(1.0)}
+        results = {"case": get_result(1.0), "new": get_result(0.01)}
+
+        self.assertEqual([], benchmark.compare(results, baseline, 0.25))
+
+    def test_report_the_cases_failing_only_in_the_results(self):
+        baseline = {"fixed": {"error": "IndexError"}, "broken": get_result(1.0)}
+        results = {"fixed": get_result(1.0), "broken": {"error": "IndexError"}}
+
+        self.assertEqual(["broken"], benchmark.compare(results, baseline, 0.25))
+
+    def test_compare_the_speeds_relative_to_the_reference_case(self):
+        baseline = {
+            benchmark.REFERENCE_NAME: {"megapixels_per_second": 10.0},
+            "case": {"megapixels_per_second": 5.0},
+        }
+        # A machine two times slower.
+        results = {
+            benchmark.REFERENCE_NAME: {"megapixels_per_second": 5.0},
+            "case": {"megapixels_per_second": 2.5},
+            "failed": {"error": "IndexError"},
+        }
+        benchmark.add_relative_speeds(baseline)
+        benchmark.add_relative_speeds(results)
+
+        self.assertEqual(0.5, results["case"]["relative_speed"])
+        self.assertNotIn("relative_speed", results["failed"])
+        self.assertEqual([], benchmark.compare(results, baseline, 0.01))
+
+
+class VariantsShould(TestCase):
+    def test_enable_the_average_box_when_they_set_its_size(self):
+        for name, options in benchmark.VARIANTS.items():
+            if "pixels_area" in options:
+                self.assertTrue(options.get("enable_avg_pixels"), name)
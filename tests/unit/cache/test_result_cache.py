@@ -0,0 +1,88 @@
+import os
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from image_go_nord_client.result_cache import RESCAN_STORES, ResultCache
+
+
+class ResultCacheShould(TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.temp_path = Path(self.temp_dir.name)
+        self.cache = ResultCache(self.temp_path / "cache", max_size=250)
+        self.input_path = self.temp_path / "input.png"
+        self.input_path.write_bytes(b"input image")
+        self.options = {"palette_files": {"Aurora": "abc"}, "blur": False}
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def write_output(self, name: str, size: int) -> Path:
+        output_path = self.temp_path / name
+        output_path.write_bytes(name.encode().ljust(size, b"."))
+        return output_path
+
+    def test_key_the_conversions_by_input_bytes_and_options(self):
+        key = self.cache.get_key(self.input_path, self.options)
+
+        self.assertEqual(key, self.cache.get_key(self.input_path, dict(self.options)))
+        self.assertNotEqual(
+            key, self.cache.get_key(self.input_path, {**self.options, "blur": True})
+        )
+        self.input_path.write_bytes(b"other image")
+        self.assertNotEqual(key, self.cache.get_key(self.input_path, self.options))
+
+    def test_copy_the_stored_image_to_the_output(self):
+        output_path = self.write_output("output.png", 100)
+        copy_path = self.temp_path / "copy.png"
+
+        self.assertFalse(self.cache.fetch("ab12", copy_path))
+        self.cache.store("ab12", output_path)
+
+        self.assertTrue(self.cache.fetch("ab12", copy_path))
+        self.assertEqual(output_path.read_bytes(), copy_path.read_bytes())
+        # A copy, writing the output does not change the stored image.
+        copy_path.write_bytes(b"changed")
+        self.assertTrue(self.cache.fetch("ab12", output_path))
+        self.assertNotEqual(b"changed", output_path.read_bytes())
+
+    def test_remove_the_least_recently_used_images_over_the_size_cap(self):
+        for index, key in enumerate(["aa01", "bb02"]):
+            self.cache.store(key, self.write_output(f"{key}.png", 100))
+            entry_path = self.cache.get_entry_path(key, "x.png")
+            os.utime(entry_path, ns=(index * 10**9, index * 10**9))
+
+        # Using aa01 makes bb02 the least recently used image.
+        self.assertTrue(self.cache.fetch("aa01", self.temp_path / "used.png"))
+        self.cache.store("cc03", self.write_output("cc03.png", 100))
+
+        self.assertTrue(self.cache.fetch("aa01", self.temp_path / "a.png"))
+        self.assertFalse(self.cache.fetch("bb02", self.temp_path / "b.png"))
+        self.assertTrue(self.cache.fetch("cc03", self.temp_path / "c.png"))
+
+    def test_scan_the_cache_only_when_it_can_be_over_the_cap(self):
+        cache = ResultCache(self.temp_path / "cache", max_size=10**6)
+        output_path = self.write_output("output.png", 10)
+
+        with patch.object(cache, "get_entries", wraps=cache.get_entries) as scans:
+            for index in range(2 * RESCAN_STORES + 1):
+                cache.store(f"{index:04x}", output_path)
+
+        # The first store, then every RESCAN_STORES stores.
+        self.assertEqual(3, scans.call_count)
+        self.assertEqual((2 * RESCAN_STORES + 1) * 10, cache.size)
+
+    def test_scan_the_cache_when_the_stored_images_go_over_the_cap(self):
+        self.cache.store("aa01", self.write_output("aa01.png", 100))
+
+        with patch.object(
+            self.cache, "get_entries", wraps=self.cache.get_entries
+        ) as scans:
+            self.cache.store("bb02", self.write_output("bb02.png", 100))
+            self.assertEqual(0, scans.call_count)
+            self.cache.store("cc03", self.write_output("cc03.png", 100))
+            self.assertEqual(1, scans.call_count)
+
+        self.assertEqual(200, self.cache.size)
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import numpy as np
+from PIL import Image
+
+from image_go_nord_client import async_converter
+from image_go_nord_client.async_converter import AsyncConverter
+
+DATA_PATH = Path(__file__).parents[1] / "real" / "data"
+
+
+def read_pixels(data) -> np.ndarray:
+    with Image.open(data) as image:
+        return np.asarray(image.convert("RGB"))
+
+
+class AsyncConverterShould(IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.data = (DATA_PATH / "rainbow_square.png").read_bytes()
+        self.expected = read_pixels(DATA_PATH / "rainbow_nord_square.png")
+
+    async def test_convert_images_on_the_executor(self):
+        async with AsyncConverter() as converter:
+            converted = await converter.convert(Image.open(BytesIO(self.data)))
+            converted_bytes = await converter.convert_to_bytes(self.data)
+
+        np.testing.assert_array_equal(
+            self.expected, np.asarray(converted.convert("RGB"))
+        )
+        np.testing.assert_array_equal(
+            self.expected, read_pixels(BytesIO(converted_bytes))
+        )
+
+    async def test_stream_the_encoded_image_by_chunks(self):
+        async with AsyncConverter() as converter:
+            chunks = [
+                chunk
+                async for chunk in converter.stream(
+                    self.data, output_format="BMP", chunk_size=1000
+                )
+            ]
+
+        self.assertTrue(all(len(chunk) == 1000 for chunk in chunks[:-1]))
+        converted = b"".join(chunks)
+        self.assertEqual(b"BM", converted[:2])
+        np.testing.assert_array_equal(self.expected, read_pixels(BytesIO(converted)))
+
+    async def test_convert_in_worker_processes(self):
+        with ProcessPoolExecutor(1) as executor:
+            converter = AsyncConverter(executor=executor, engine="gonord")
+            converted = await converter.convert_to_bytes(self.data)
+
+        np.testing.assert_array_equal(self.expected, read_pixels(BytesIO(converted)))
+
+    async def test_limit_the_conversions_in_flight(self):
+        running, max_running = 0, 0
+        lock = threading.Lock()
+        run_conversion = async_converter._run_conversion
+
+        def counting_conversion(*args):
+            nonlocal running, max_running
+            with lock:
+                running += 1
+                max_running = max(max_running, running)
+            try:
+                return run_conversion(*args)
+            finally:
+                with lock:
+                    running -= 1
+
+        with patch.object(async_converter, "_run_conversion", counting_conversion):
+            async with AsyncConverter(max_concurrency=2) as converter:
+                await asyncio.gather(
+                    *(converter.convert_to_bytes(self.data) for _ in range(8))
+                )
+
+        self.assertLessEqual(max_running, 2)
+
+    async def test_time_out_and_release_the_slot_when_the_conversion_ends(self):
+        started, release = threading.Event(), threading.Event()
+
+        def blocked_conversion(*args):
+            started.set()
+            release.wait(5)
+            return b""
+
+        with patch.object(async_converter, "_run_conversion", blocked_conversion):
+            async with AsyncConverter(max_concurrency=1) as converter:
+                with self.assertRaises(asyncio.TimeoutError):
+                    await converter.convert(self.data, timeout=0.1)
+
+                self.assertTrue(started.is_set())
+                # The running conversion still holds the only slot.
+                with self.assertRaises(asyncio.TimeoutError):
+                    await converter.convert(self.data, timeout=0.1)
+
+                release.set()
+                self.assertEqual(b"", await converter.convert(self.data, timeout=5))
+
+    async def test_cancel_the_conversions_waiting_for_a_slot(self):
+        release = threading.Event()
+
+        def blocked_conversion(*args):
+            release.wait(5)
+            return b""
+
+        with patch.object(async_converter, "_run_conversion", blocked_conversion):
+            async with AsyncConverter(max_concurrency=1) as converter:
+                first = asyncio.create_task(converter.convert(self.data))
+                waiting = asyncio.create_task(converter.convert(self.data))
+                await asyncio.sleep(0.05)
+
+                waiting.cancel()
+                release.set()
+
+                self.assertEqual(b"", await first)
+                with self.assertRaises(asyncio.CancelledError):
+                    await waiting
@@ -0,0 +1,185 @@
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+from PIL import Image
+
+from image_go_nord_client.converter import Converter
+from image_go_nord_client.result_cache import ResultCache
+
+DATA_PATH = Path(__file__).parents[1] / "real" / "data"
+ENGINES = ("gonord", "numpy")
+
+
+def read_pixels(path: Path) -> np.ndarray:
+    with Image.open(path) as image:
+        return np.asarray(image.convert("RGB"))
+
+
+class ConverterShould(TestCase):
+    def setUp(self) -> None:
+        self.image = Image.open(DATA_PATH / "rainbow_square.png").convert("RGB")
+        self.expected = read_pixels(DATA_PATH / "rainbow_nord_square.png")
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.temp_path = Path(self.temp_dir.name)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_convert_pillow_images_without_changing_them(self):
+        for engine in ENGINES:
+            original = np.asarray(self.image).copy()
+
+            converted = Converter(engine=engine).convert(self.image)
+
+            self.assertIsInstance(converted, Image.Image)
+            np.testing.assert_array_equal(self.expected, np.asarray(converted))
+            np.testing.assert_array_equal(original, np.asarray(self.image))
+
+    def test_convert_numpy_arrays(self):
+        for engine in ENGINES:
+            converted = Converter(engine=engine).convert(np.asarray(self.image))
+
+            self.assertIsInstance(converted, np.ndarray)
+            np.testing.assert_array_equal(self.expected, converted)
+
+    def test_convert_encoded_images(self):
+        data = (DATA_PATH / "rainbow_square.png").read_bytes()
+        for engine in ENGINES:
+            converted = Converter(engine=engine).convert(data)
+
+            with Image.open(BytesIO(converted)) as image:
+                self.assertEqual("PNG", image.format)
+                np.testing.assert_array_equal(
+                    self.expected, np.asarray(image.convert("RGB"))
+                )
+
+    def test_convert_to_the_selected_colors(self):
+        converter = Converter("Nord", ["Aurora"])
+
+        converted = converter.convert(Image.open(DATA_PATH / "blue_square.png"))
+
+        np.testing.assert_array_equal(
+            read_pixels(DATA_PATH / "blue_nord_aurora_square.png"),
+            np.asarray(converted.convert("RGB")),
+        )
+
+    def test_convert_the_same_images_from_many_threads(self):
+        blue = Image.open(DATA_PATH / "blue_square.png").convert("RGB")
+        expected_blue = read_pixels(DATA_PATH / "blue_nord_aurora_square.png")
+        for engine in ENGINES:
+            converters = [
+                Converter(engine=engine),
+                Converter(colors=["Aurora"], engine=engine),
+            ]
+            jobs = [(converters[i % 2], i % 2) for i in range(16)]
+
+            with ThreadPoolExecutor(4) as executor:
+                results = list(
+                    executor.map(
+                        lambda job: job[0].convert([self.image, blue][job[1]]), jobs
+                    )
+                )
+
+            for (_, kind), converted in zip(jobs, results):
+                expected = [self.expected, expected_blue][kind]
+                np.testing.assert_array_equal(expected, np.asarray(converted))
+
+    def test_refuse_unknown_palettes_and_colors(self):
+        with self.assertRaises(ValueError):
+            Converter("NOT_FOUND")
+
+        with self.assertRaises(ValueError):
+            Converter("nord", ["NOT_FOUND"])
+
+    def test_use_the_palette_directories_only_in_their_converter(self):
+        (self.temp_path / "Nord").mkdir()
+        (self.temp_path / "Nord" / "Aurora.txt").write_text("#000000\n")
+
+        custom = Converter(palette_dirs=[self.temp_path])
+        converter = Converter()
+
+        self.assertEqual(("000000",), custom.palette.colors[0].hex_colors)
+        self.assertEqual("BF616A", converter.palette.colors[0].hex_colors[0])
+
+    def test_refuse_numpy_options_with_the_gonord_engine(self):
+        with self.assertRaises(ValueError):
+            Converter(engine="gonord", threads=2)
+
+        with self.assertRaises(ValueError):
+            Converter(engine="gonord", tile_memory=64)
+
+    def test_convert_image_files(self):
+        output_path = self.temp_path / "output.png"
+        for engine in ENGINES:
+            Converter(engine=engine).convert_file(
+                DATA_PATH / "rainbow_square.png", output_path
+            )
+
+            np.testing.assert_array_equal(self.expected, read_pixels(output_path))
+
+    def test_convert_animations_frame_by_frame(self):
+        input_path = self.temp_path / "input.gif"
+        frames = [self.image, self.image.transpose(Image.Transpose.ROTATE_90)]
+        frames[0].save(input_path, save_all=True, append_images=frames[1:])
+        output_path = self.temp_path / "output.gif"
+
+        Converter().convert_file(input_path, output_path)
+
+        with Image.open(output_path) as image:
+            self.assertEqual(2, image.n_frames)
+
+    def test_convert_image_files_by_strips(self):
+        output_path = self.temp_path / "output.png"
+
+        Converter(tile_memory=1).convert_file(
+            DATA_PATH / "rainbow_square.png", output_path
+        )
+
+        np.testing.assert_array_equal(self.expected, read_pixels(output_path))
+
+    def test_copy_the_converted_image_files_from_the_result_cache(self):
+        cache = ResultCache(self.temp_path / "cache", max_size=10**6)
+        converter = Converter(result_cache=cache)
+        first_path = self.temp_path / "first.png"
+        second_path = self.temp_path / "second.png"
+
+        converter.convert_file(DATA_PATH / "rainbow_square.png", first_path)
+        converter.go_nord = None
+        converter.convert_file(DATA_PATH / "rainbow_square.png", second_path)
+
+        self.assertEqual(first_path.read_bytes(), second_path.read_bytes())
+
+    def test_not_open_the_image_files_found_in_the_result_cache(self):
+        cache = ResultCache(self.temp_path / "cache", max_size=10**6)
+        converter = Converter(result_cache=cache)
+        output_path = self.temp_path / "output.png"
+        converter.convert_file(DATA_PATH / "rainbow_square.png", output_path)
+        output_path.unlink()
+
+        with patch.object(Converter, "open_file") as open_file:
+            converter.convert_file(DATA_PATH / "rainbow_square.png", output_path)
+
+        open_file.assert_not_called()
+        np.testing.assert_array_equal(self.expected, read_pixels(output_path))
+
+    def test_keep_the_average_box_of_every_gonord_converter(self):
+        boxes = [(2, 9), (6, 6)]
+        converters = [
+            Converter(engine=engine, enable_avg_pixels=True, pixels_area=box)
+            for box in boxes
+            for engine in ENGINES
+        ]
+
+        converted = [
+            np.asarray(converter.convert(self.image)) for converter in converters
+        ]
+
+        # The gonord and numpy conversions of every box are the same.
+        np.testing.assert_array_equal(converted[0], converted[1])
+        np.testing.assert_array_equal(converted[2], converted[3])
+        self.assertFalse(np.array_equal(converted[0], converted[2]))
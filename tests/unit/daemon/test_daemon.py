@@ -0,0 +1,137 @@
+import os
+import shutil
+import stat
+import tempfile
+import threading
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from image_go_nord_client.daemon import SOCKET_ENV, ConversionDaemon, forward_to_daemon
+from image_go_nord_client.palette_registry import (
+    BUILTIN_PALETTES_DIR,
+    PALETTES_DIRS_ENV,
+)
+
+DATA_PATH = Path(__file__).parents[1] / "real" / "data"
+
+
+class ConversionDaemonShould(TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        cls.temp_dir = tempfile.TemporaryDirectory()
+        cls.temp_path = Path(cls.temp_dir.name)
+        cls.socket_path = cls.temp_path / "daemon.sock"
+        cls.daemon = ConversionDaemon(cls.socket_path, workers=1, queue_size=0)
+        cls.thread = threading.Thread(target=cls.daemon.serve_forever)
+        cls.thread.start()
+
+    @classmethod
+    def tearDownClass(cls) -> None:
+        cls.daemon.shutdown()
+        cls.thread.join()
+        cls.temp_dir.cleanup()
+
+    def setUp(self) -> None:
+        environment = patch.dict(os.environ, {SOCKET_ENV: str(self.socket_path)})
+        environment.start()
+        self.addCleanup(environment.stop)
+
+    def test_convert_the_images_of_the_client(self):
+        output_path = self.temp_path / "output.png"
+
+        exit_code = forward_to_daemon(
+            ["client", f"-i={DATA_PATH / 'blue_square.png'}", f"-o={output_path}"],
+            quiet=True,
+        )
+
+        self.assertEqual(0, exit_code)
+        self.assertEqual(
+            (DATA_PATH / "blue_nord_square.png").read_bytes(), output_path.read_bytes()
+        )
+
+    def test_return_the_exit_code_of_failed_conversions(self):
+        exit_code = forward_to_daemon(
+            ["client", f"-i={DATA_PATH / 'blue_square.png'}", "--palette=nope"],
+            quiet=True,
+        )
+
+        self.assertEqual(1, exit_code)
+
+    def test_refuse_the_jobs_when_the_queue_is_full(self):
+        self.daemon.slots.acquire()
+        try:
+            exit_code = forward_to_daemon(
+                ["client", f"-i={DATA_PATH / 'blue_square.png'}"], quiet=True
+            )
+        finally:
+            self.daemon.slots.release()
+
+        self.assertIsNone(exit_code)
+
+    def test_let_the_client_convert_when_the_daemon_is_not_running(self):
+        with patch.dict(os.environ, {SOCKET_ENV: str(self.temp_path / "none")}):
+            self.assertIsNone(forward_to_daemon(["client", "-i=image.png"]))
+
+    def test_convert_with_the_palettes_of_the_client_environment(self):
+        palettes_dir = self.temp_path / "palettes"
+        shutil.copytree(BUILTIN_PALETTES_DIR / "Nord", palettes_dir / "Custom")
+        output_path = self.temp_path / "custom.png"
+        argv = [
+            "client",
+            f"-i={DATA_PATH / 'blue_square.png'}",
+            f"-o={output_path}",
+            "--palette=custom",
+        ]
+
+        with patch.dict(os.environ, {PALETTES_DIRS_ENV: str(palettes_dir)}):
+            exit_code = forward_to_daemon(argv, quiet=True)
+
+        self.assertEqual(0, exit_code)
+        self.assertEqual(
+            (DATA_PATH / "blue_nord_square.png").read_bytes(), output_path.read_bytes()
+        )
+        self.assertEqual(1, forward_to_daemon(argv, quiet=True))
+
+    def test_not_keep_the_palette_directories_of_the_previous_jobs(self):
+        palettes_dir = self.temp_path / "job_palettes"
+        shutil.copytree(BUILTIN_PALETTES_DIR / "Monokai", palettes_dir / "Nord")
+        output_path = self.temp_path / "previous_job.png"
+        argv = ["client", f"-i={DATA_PATH / 'blue_square.png'}", f"-o={output_path}"]
+
+        forward_to_daemon([*argv, f"--palettes-dir={palettes_dir}"], quiet=True)
+        exit_code = forward_to_daemon(argv, quiet=True)
+
+        self.assertEqual(0, exit_code)
+        self.assertEqual(
+            (DATA_PATH / "blue_nord_square.png").read_bytes(), output_path.read_bytes()
+        )
+
+    def test_create_a_socket_only_its_owner_can_use(self):
+        self.assertEqual(0o600, stat.S_IMODE(self.socket_path.stat().st_mode))
+
+    def test_refuse_the_jobs_of_other_users(self):
+        with patch(
+            "image_go_nord_client.daemon.get_peer_uid", return_value=os.getuid() + 1
+        ), self.assertLogs(level="WARNING"):
+            exit_code = forward_to_daemon(
+                ["client", f"-i={DATA_PATH / 'blue_square.png'}"], quiet=True
+            )
+
+        self.assertIsNone(exit_code)
+
+    def test_not_use_a_socket_of_another_user(self):
+        with patch("os.getuid", return_value=os.getuid() + 1):
+            self.assertIsNone(forward_to_daemon(["client", "-i=image.png"]))
+
+    def test_convert_without_the_daemon_on_invalid_answers(self):
+        for answer in [
+            [],
+            {},
+            {"status": "done"},
+            {"status": "done", "exit_code": "0"},
+        ]:
+            with self.subTest(answer=answer), patch(
+                "image_go_nord_client.daemon.send_request", return_value=answer
+            ):
+                self.assertIsNone(forward_to_daemon(["client", "-i=image.png"]))
@@ -0,0 +1,57 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from image_go_nord_client import blur
+from image_go_nord_client.blur import blur_pixels
+
+
+def pillow_blur(pixels: np.ndarray, radius: float) -> np.ndarray:
+    return np.asarray(Image.fromarray(pixels).filter(ImageFilter.GaussianBlur(radius)))
+
+
+class BlurPixelsShould(TestCase):
+    def setUp(self) -> None:
+        self.random = np.random.default_rng(11)
+
+    def test_blur_as_pillow_on_the_whole_image(self):
+        pixels = self.random.integers(0, 4, (45, 31, 3), dtype=np.uint8) * 80
+
+        self.assertTrue(
+            np.array_equal(pillow_blur(pixels, 1), blur_pixels(pixels.copy()))
+        )
+
+    def test_blur_by_bands_with_threads_as_the_whole_image(self):
+        for radius in (0.5, 1, 2.5, 6):
+            for channels in (3, 4):
+                pixels = self.random.integers(0, 256, (50, 17, channels), np.uint8)
+                expected = pillow_blur(pixels, radius)
+
+                with patch.object(blur, "MIN_BAND_ROWS", 4):
+                    actual = blur_pixels(pixels, radius, threads=5)
+
+                self.assertTrue(np.array_equal(expected, actual))
+
+    def test_blur_in_place(self):
+        pixels = self.random.integers(0, 256, (20, 20, 3), dtype=np.uint8)
+        expected = pillow_blur(pixels, 2)
+
+        result = blur_pixels(pixels, 2)
+
+        self.assertIs(pixels, result)
+        self.assertTrue(np.array_equal(expected, pixels))
+
+    def test_skip_bands_of_a_single_color(self):
+        pixels = np.full((80, 10, 3), 46, dtype=np.uint8)
+        pixels[70:] = 200
+        expected = pillow_blur(pixels, 1)
+
+        with patch.object(blur, "MIN_BAND_ROWS", 10), patch.object(
+            blur.Image, "fromarray", wraps=Image.fromarray
+        ) as fromarray:
+            blur_pixels(pixels, 1, threads=8)
+
+        self.assertEqual(2, fromarray.call_count)
+        self.assertTrue(np.array_equal(expected, pixels))
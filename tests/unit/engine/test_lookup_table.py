@@ -0,0 +1,76 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+
+from image_go_nord_client import lookup_table
+from image_go_nord_client.lookup_table import (
+    build_lookup_table,
+    get_lookup_table,
+    lookup_palette_indices,
+)
+from image_go_nord_client.numpy_engine import (
+    DEFAULT_PALETTE_PATH,
+    NumpyGoNord,
+    nearest_palette_indices,
+)
+
+
+class LookupTableShould(TestCase):
+    def setUp(self) -> None:
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.env_patch = patch.dict(
+            "os.environ", {lookup_table.CACHE_DIR_ENV: self.cache_dir.name}
+        )
+        self.env_patch.start()
+        lookup_table._load_lookup_table.cache_clear()
+
+        self.go_nord = NumpyGoNord()
+        self.go_nord.reset_palette()
+        self.go_nord.set_palette_lookup_path(str(DEFAULT_PALETTE_PATH) + "/")
+        self.go_nord.add_file_to_palette("Aurora.txt")
+        self.go_nord.add_file_to_palette("PolarNight.txt")
+        self.names = sorted(self.go_nord.palette_data)
+        self.palette = self.go_nord.get_palette_array()
+
+    def tearDown(self) -> None:
+        lookup_table._load_lookup_table.cache_clear()
+        self.env_patch.stop()
+        self.cache_dir.cleanup()
+
+    def test_map_colors_as_the_nearest_palette_color_search(self):
+        colors = np.random.default_rng(7).integers(0, 256, (5000, 3))
+        colors[:8] = [[0, 0, 0], [255, 255, 255], *self.palette[:6]]
+
+        table = build_lookup_table(self.palette)
+
+        np.testing.assert_array_equal(
+            lookup_palette_indices(colors, table),
+            nearest_palette_indices(colors, self.palette),
+        )
+
+    def test_save_the_table_in_the_cache_dir_and_reuse_it(self):
+        get_lookup_table(self.names, self.palette)
+        saved_tables = list(Path(self.cache_dir.name).rglob("*.npy"))
+        self.assertEqual(1, len(saved_tables))
+
+        lookup_table._load_lookup_table.cache_clear()
+        with patch.object(lookup_table, "build_lookup_table") as build:
+            get_lookup_table(self.names, self.palette)
+            build.assert_not_called()
+
+    def test_use_a_different_table_for_each_color_selection(self):
+        get_lookup_table(self.names, self.palette)
+        get_lookup_table(self.names[:3], self.palette[:3])
+
+        self.assertEqual(2, len(list(Path(self.cache_dir.name).rglob("*.npy"))))
+
+    def test_convert_images_as_without_lookup_table(self):
+        pixels = np.random.default_rng(3).integers(0, 256, (20, 30, 3), dtype=np.uint8)
+        expected = self.go_nord.convert_pixels(pixels)
+
+        self.go_nord.enable_lookup_table()
+
+        np.testing.assert_array_equal(expected, self.go_nord.convert_pixels(pixels))
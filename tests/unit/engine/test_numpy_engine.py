@@ -0,0 +1,300 @@
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+import numpy as np
+from ImageGoNord import GoNord
+from PIL import Image
+
+from image_go_nord_client import numpy_engine
+from image_go_nord_client.numpy_engine import (
+    DEFAULT_PALETTE_PATH,
+    NumpyGoNord,
+    box_sums,
+    nearest_palette_indices,
+    nearest_unique_indices,
+    unique_rgb_colors,
+)
+
+
+class NumpyGoNordShould(TestCase):
+    def setUp(self) -> None:
+        self.random = np.random.default_rng(42)
+
+    def convert_with_both_engines(
+        self, pixels, avg_box=None, colors=("Aurora", "Frost")
+    ):
+        results = []
+        for go_nord in (GoNord(), NumpyGoNord()):
+            go_nord.reset_palette()
+            go_nord.set_palette_lookup_path(str(DEFAULT_PALETTE_PATH) + "/")
+            for color in colors:
+                go_nord.add_file_to_palette(color + ".txt")
+
+            if avg_box:
+                go_nord.enable_avg_algorithm()
+                go_nord.set_avg_box_data(*avg_box)
+            else:
+                go_nord.disable_avg_algorithm()
+
+            image = Image.fromarray(pixels).copy()
+            results.append(go_nord.convert_image(image))
+
+        return results
+
+    def test_convert_rgb_images_as_gonord(self):
+        pixels = self.random.integers(0, 256, (17, 11, 3), dtype=np.uint8)
+
+        expected, actual = self.convert_with_both_engines(pixels)
+
+        self.assertEqual(expected.mode, actual.mode)
+        self.assertEqual(expected.tobytes(), actual.tobytes())
+
+    def test_convert_rgba_images_with_different_alphas_as_gonord(self):
+        pixels = self.random.integers(0, 4, (13, 9, 4), dtype=np.uint8) * 85
+        pixels[..., 3] = self.random.choice([0, 150, 190, 220, 255], (13, 9))
+
+        expected, actual = self.convert_with_both_engines(pixels)
+
+        self.assertEqual(expected.mode, actual.mode)
+        self.assertEqual(expected.tobytes(), actual.tobytes())
+
+    def test_convert_using_the_average_box_as_gonord(self):
+        for avg_box in [(-2, 2), (-3, 1), (0, 3)]:
+            for channels in (3, 4):
+                pixels = self.random.integers(0, 256, (8, 12, channels), dtype=np.uint8)
+                if channels == 4:
+                    pixels[..., 3] = self.random.choice([200, 255], (8, 12))
+
+                expected, actual = self.convert_with_both_engines(pixels, avg_box)
+
+                self.assertEqual(
+                    expected.tobytes(), actual.tobytes(), f"{avg_box} {channels}"
+                )
+
+    def test_raise_error_when_the_palette_is_empty(self):
+        go_nord = NumpyGoNord()
+        go_nord.reset_palette()
+
+        with self.assertRaises(ValueError):
+            go_nord.convert_image(Image.new("RGB", (2, 2)))
+
+
+class NearestUniqueIndicesShould(TestCase):
+    def setUp(self) -> None:
+        self.random = np.random.default_rng(3)
+        self.palette = NumpyGoNord().get_palette_array()
+
+    def get_colors(self, unique_count: int, count: int) -> np.ndarray:
+        colors = self.random.integers(0, 256, (unique_count, 3), dtype=np.uint8)
+        return colors[self.random.integers(0, unique_count, count)]
+
+    def test_find_the_unique_colors_and_their_inverse(self):
+        for table_min_pixels in (10**9, 1):
+            colors = self.get_colors(20, 5000)
+
+            with patch.object(numpy_engine, "TABLE_MIN_PIXELS", table_min_pixels):
+                unique_colors, inverse = unique_rgb_colors(colors)
+
+            self.assertEqual(len(np.unique(colors, axis=0)), len(unique_colors))
+            self.assertTrue(np.array_equal(colors, unique_colors[inverse]))
+
+    def test_map_flat_images_once_per_unique_color(self):
+        colors = self.get_colors(12, 20000)
+        nearest = Mock(wraps=nearest_palette_indices)
+
+        indices = nearest_unique_indices(colors, self.palette, nearest)
+
+        self.assertEqual(12, len(nearest.call_args.args[0]))
+        self.assertTrue(
+            np.array_equal(nearest_palette_indices(colors, self.palette), indices)
+        )
+
+    def test_map_images_with_unique_colors_pixel_by_pixel(self):
+        colors = self.get_colors(2**20, 20000)
+        nearest = Mock(wraps=nearest_palette_indices)
+
+        indices = nearest_unique_indices(colors, self.palette, nearest)
+
+        self.assertIs(colors, nearest.call_args.args[0])
+        self.assertTrue(
+            np.array_equal(nearest_palette_indices(colors, self.palette), indices)
+        )
+
+
+def naive_box_sums(pixels: np.ndarray, w: int, h: int) -> np.ndarray:
+    height, width, _ = pixels.shape
+    sums = np.zeros(pixels.shape, dtype=np.int64)
+    for y in range(height):
+        for x in range(width):
+            for dy in range(w, h):
+                for dx in range(w, h):
+                    if -height <= y + dy < height and -width <= x + dx < width:
+                        sums[y, x] += pixels[y + dy, x + dx]
+
+    return sums
+
+
+class BoxSumsShould(TestCase):
+    def test_sum_boxes_larger_than_the_image(self):
+        pixels = np.random.default_rng(9).integers(0, 256, (7, 5, 4), dtype=np.uint8)
+
+        for w, h in ((-2, 2), (-9, 7), (1, 4), (-12, -3), (3, 1)):
+            sums, _ = box_sums(pixels, w, h)
+
+            self.assertTrue(np.array_equal(naive_box_sums(pixels, w, h), sums))
+
+    def test_sum_only_the_given_rows(self):
+        pixels = np.random.default_rng(9).integers(0, 256, (9, 4, 3), dtype=np.uint8)
+        rows = np.array([2, 3, 8])
+
+        sums, counts = box_sums(pixels, -3, 5, rows)
+
+        self.assertTrue(np.array_equal(naive_box_sums(pixels, -3, 5)[rows], sums))
+        self.assertEqual((3, 4), counts.shape)
+
+
+class NumpyGoNordThreadsShould(TestCase):
+    def test_convert_by_bands_as_with_a_single_thread(self):
+        random = np.random.default_rng(5)
+        for channels in (3, 4):
+            pixels = random.integers(0, 256, (37, 13, channels), dtype=np.uint8)
+            if channels == 4:
+                pixels[..., 3] = random.choice([0, 200, 255], (37, 13))
+
+            results = []
+            for threads in (1, 4):
+                go_nord = NumpyGoNord()
+                go_nord.enable_avg_algorithm()
+                go_nord.set_avg_box_data(-3, 2)
+                go_nord.enable_gaussian_blur()
+                go_nord.set_threads(threads)
+                results.append(go_nord.convert_image(Image.fromarray(pixels)))
+
+            self.assertEqual(results[0].tobytes(), results[1].tobytes())
+
+
+class PreparedPixelsShould(TestCase):
+    def test_convert_to_many_palettes_as_separate_conversions(self):
+        random = np.random.default_rng(8)
+        colors = random.integers(0, 256, (30, 3), dtype=np.uint8)
+        for pixels, use_avg_color in (
+            (colors[random.integers(0, 30, (90, 70))], False),
+            (colors[random.integers(0, 30, (90, 70))], True),
+            (random.integers(0, 256, (20, 15, 4), dtype=np.uint8), True),
+        ):
+            go_nord = NumpyGoNord()
+            if use_avg_color:
+                go_nord.enable_avg_algorithm()
+            prepared = go_nord.prepare_pixels(pixels, find_unique=True)
+            # The flat image without average box has its unique colors shared.
+            self.assertEqual(not use_avg_color, prepared.unique_colors is not None)
+
+            for color in ("Aurora.txt", "Frost.txt", "PolarNight.txt"):
+                go_nord.reset_palette()
+                go_nord.add_file_to_palette(color)
+
+                self.assertTrue(
+                    np.array_equal(
+                        go_nord.convert_pixels(pixels),
+                        go_nord.convert_prepared(prepared),
+                    )
+                )
+
+
+class IndexedOutputShould(TestCase):
+    def test_index_the_colors_of_the_converted_pixels(self):
+        random = np.random.default_rng(9)
+        colors = random.integers(0, 256, (30, 3), dtype=np.uint8)
+        for pixels, find_unique in (
+            (colors[random.integers(0, 30, (90, 70))], True),
+            (random.integers(0, 256, (40, 30, 3), dtype=np.uint8), False),
+        ):
+            go_nord = NumpyGoNord()
+            go_nord.enable_indexed_output()
+            go_nord.set_threads(3)
+            prepared = go_nord.prepare_pixels(pixels, find_unique=find_unique)
+
+            converted = go_nord.convert_prepared_image(prepared)
+
+            self.assertEqual("P", converted.mode)
+            self.assertEqual(16, len(converted.getpalette()) // 3)
+            np.testing.assert_array_equal(
+                go_nord.convert_pixels(pixels), np.asarray(converted.convert("RGB"))
+            )
+
+    def test_index_opaque_rgba_images(self):
+        random = np.random.default_rng(10)
+        pixels = random.integers(0, 256, (20, 30, 4), dtype=np.uint8)
+        pixels[..., 3] = 255
+        go_nord = NumpyGoNord()
+        go_nord.enable_indexed_output()
+
+        converted = go_nord.convert_image(Image.fromarray(pixels))
+
+        self.assertEqual("P", converted.mode)
+        np.testing.assert_array_equal(
+            go_nord.convert_pixels(pixels), np.asarray(converted.convert("RGBA"))
+        )
+
+    def test_not_index_transparent_or_blurred_images(self):
+        go_nord = NumpyGoNord()
+        go_nord.enable_indexed_output()
+        translucent = np.full((8, 8, 4), (10, 200, 30, 220), dtype=np.uint8)
+        transparent = translucent.copy()
+        transparent[0, 0, 3] = 0
+
+        for pixels in (translucent, transparent):
+            converted = go_nord.convert_image(Image.fromarray(pixels))
+            self.assertEqual("RGBA", converted.mode)
+            np.testing.assert_array_equal(
+                go_nord.convert_pixels(pixels), np.asarray(converted)
+            )
+
+        go_nord.enable_gaussian_blur()
+        rgb = Image.fromarray(translucent[..., :3].copy())
+        self.assertEqual("RGB", go_nord.convert_image(rgb).mode)
+
+
+class ColorTableShould(TestCase):
+    def setUp(self) -> None:
+        random = np.random.default_rng(11)
+        rgb = Image.fromarray(random.integers(0, 256, (40, 30, 3), dtype=np.uint8))
+        self.images = [rgb.quantize(200), rgb.quantize(20), rgb.convert("L")]
+        self.images[1].info["transparency"] = 3
+
+    def test_convert_palette_and_grayscale_images_as_gonord(self):
+        for image in self.images:
+            expected = GoNord().convert_image(image.convert("RGB"))
+            go_nord = NumpyGoNord()
+            self.assertTrue(go_nord.can_convert_color_table(image))
+
+            converted = go_nord.convert_image(image)
+
+            self.assertEqual("RGB", converted.mode)
+            np.testing.assert_array_equal(np.asarray(expected), np.asarray(converted))
+
+    def test_keep_the_indices_with_the_indexed_output(self):
+        go_nord = NumpyGoNord()
+        go_nord.enable_indexed_output()
+        for image in self.images:
+            converted = go_nord.convert_image(image)
+
+            self.assertEqual("P", converted.mode)
+            self.assertNotIn("transparency", converted.info)
+            np.testing.assert_array_equal(
+                np.asarray(image.convert("P") if image.mode == "L" else image),
+                np.asarray(converted),
+            )
+
+    def test_convert_every_pixel_with_blur_or_average_box(self):
+        image = self.images[0]
+        go_nord = NumpyGoNord()
+        go_nord.enable_gaussian_blur()
+        self.assertFalse(go_nord.can_convert_color_table(image))
+
+        go_nord = NumpyGoNord()
+        go_nord.enable_avg_algorithm()
+        self.assertFalse(go_nord.can_convert_color_table(image))
+        with patch.object(go_nord, "convert_color_table") as convert_color_table:
+            go_nord.convert_image(image)
+        convert_color_table.assert_not_called()
@@ -0,0 +1,172 @@
+import tempfile
+import tracemalloc
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+import numpy as np
+from PIL import Image
+
+from image_go_nord_client import tiled
+from image_go_nord_client.numpy_engine import DEFAULT_PALETTE_PATH, NumpyGoNord
+from image_go_nord_client.tiled import (
+    MEGABYTE,
+    PngImageRows,
+    RawImageRows,
+    convert_image_tiled,
+    open_image_rows,
+)
+
+
+def create_go_nord(blur=False, avg_box=None) -> NumpyGoNord:
+    go_nord = NumpyGoNord()
+    go_nord.reset_palette()
+    go_nord.set_palette_lookup_path(str(DEFAULT_PALETTE_PATH) + "/")
+    for color in ("Aurora", "Frost", "PolarNight"):
+        go_nord.add_file_to_palette(color + ".txt")
+
+    if blur:
+        go_nord.enable_gaussian_blur()
+
+    if avg_box:
+        go_nord.enable_avg_algorithm()
+        go_nord.set_avg_box_data(*avg_box)
+    else:
+        go_nord.disable_avg_algorithm()
+
+    return go_nord
+
+
+class TiledConversionShould(TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.temp_path = Path(self.temp_dir.name)
+        random = np.random.default_rng(7)
+        self.rgb = random.integers(0, 256, (64, 23, 3), dtype=np.uint8)
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def assert_same_as_untiled(self, pixels, input_name, output_name, **options):
+        input_path = self.temp_path / input_name
+        Image.fromarray(pixels).save(input_path)
+
+        go_nord = create_go_nord(**options)
+        expected = go_nord.convert_image(go_nord.open_image(str(input_path)))
+        output_path = self.temp_path / output_name
+        # A budget of a few rows forces many strips.
+        convert_image_tiled(go_nord, input_path, output_path, 23 * 96 * 20)
+
+        with Image.open(output_path) as actual:
+            self.assertEqual(expected.mode, actual.mode)
+            self.assertTrue(np.array_equal(np.asarray(expected), np.asarray(actual)))
+
+    def test_convert_as_the_whole_image(self):
+        self.assert_same_as_untiled(self.rgb, "input.png", "output.png")
+
+    def test_convert_with_blur_and_average_without_seams(self):
+        self.assert_same_as_untiled(
+            self.rgb, "input.ppm", "output.png", blur=True, avg_box=(-2, 3)
+        )
+
+    def test_convert_opaque_rgba_bmp_images(self):
+        rgba = np.dstack([self.rgb, np.full(self.rgb.shape[:2], 255, np.uint8)])
+        self.assert_same_as_untiled(rgba, "input.bmp", "output.bmp", blur=True)
+
+    def test_read_uncompressed_images_from_the_file(self):
+        for name in ("input.ppm", "input.bmp", "input.tga"):
+            path = self.temp_path / name
+            Image.fromarray(self.rgb).save(path)
+
+            rows = open_image_rows(path)
+
+            self.assertIsInstance(rows, RawImageRows)
+            self.assertTrue(
+                np.array_equal(self.rgb[[0, 5, 63]], rows[np.array([0, 5, 63])])
+            )
+
+    def test_decode_png_images_by_strips(self):
+        image = Image.fromarray(self.rgb)
+        for mode in ("RGB", "RGBA", "L", "LA", "P"):
+            input_path = self.temp_path / f"input_{mode}.png"
+            image.convert(mode).save(input_path)
+            with Image.open(input_path) as expected:
+                expected = np.asarray(
+                    expected.convert("RGBA" if "A" in mode else "RGB")
+                )
+
+            # A few rows by batch, decoded starting from the previous batch.
+            with self.subTest(mode), patch.object(tiled, "PNG_CHUNK_SIZE", 200):
+                rows = open_image_rows(input_path, tail_rows=2)
+
+                self.assertIsInstance(rows, PngImageRows)
+                self.assertEqual(expected.shape, rows.shape)
+                first_rows = np.array([62, 63, 0, 1, 2])
+                self.assertTrue(np.array_equal(expected[first_rows], rows[first_rows]))
+                rows.drop_rows_before(30)
+                self.assertTrue(np.array_equal(expected[30:], rows[np.arange(30, 64)]))
+                with self.assertRaises(ValueError):
+                    rows[np.array([29])]
+                rows.close()
+
+    def test_convert_png_images_with_blur_and_average_without_seams(self):
+        with patch.object(tiled, "PNG_CHUNK_SIZE", 200):
+            self.assert_same_as_untiled(
+                self.rgb, "input.png", "output.png", blur=True, avg_box=(-2, 3)
+            )
+
+    def test_warn_when_the_image_is_not_read_or_written_by_strips(self):
+        input_path = self.temp_path / "input.jpg"
+        Image.fromarray(self.rgb).save(input_path)
+
+        with self.assertLogs(level="WARNING") as logs:
+            convert_image_tiled(
+                create_go_nord(), input_path, self.temp_path / "output.bmp", MEGABYTE
+            )
+
+        self.assertEqual(2, len(logs.output))
+        self.assertIn("Decoding", logs.output[0])
+        self.assertIn("Saving", logs.output[1])
+
+    def test_use_memory_bound_by_the_budget(self):
+        pixels = np.random.default_rng(1).integers(
+            0, 256, (2048, 1024, 3), dtype=np.uint8
+        )
+        for name in ("big.ppm", "big.png"):
+            input_path = self.temp_path / name
+            Image.fromarray(pixels).save(input_path)
+        del pixels
+        go_nord = create_go_nord()
+
+        for name in ("big.ppm", "big.png"):
+            with self.subTest(name):
+                tracemalloc.start()
+                convert_image_tiled(
+                    go_nord, self.temp_path / name, self.temp_path / "out.png", MEGABYTE
+                )
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+
+                self.assertLess(peak, 3 * MEGABYTE)
+
+    def test_remove_the_partial_output_of_a_failed_conversion(self):
+        input_path = self.temp_path / "input.ppm"
+        Image.fromarray(self.rgb).save(input_path)
+        go_nord = create_go_nord()
+        convert_pixels = go_nord.convert_pixels
+
+        def fail_on_second_strip(pixels, rows):
+            if rows[0] > 0:
+                raise MemoryError
+
+            return convert_pixels(pixels, rows=rows)
+
+        for output_name in ("output.png", "output.bmp"):
+            with self.subTest(output_name), patch.object(
+                go_nord, "convert_pixels", fail_on_second_strip
+            ), self.assertRaises(MemoryError):
+                convert_image_tiled(
+                    go_nord, input_path, self.temp_path / output_name, 23 * 96 * 20
+                )
+
+            self.assertFalse((self.temp_path / output_name).exists())
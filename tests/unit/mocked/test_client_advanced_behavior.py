@@ -53,7 +53,7 @@ class ClientShould(UnitTestBaseClass):
     def test_convert_to_nord_palette_using_short_pixel_data_parameter(self):
         main(argv=["image-go-nord-client", "-i=file4.png", "-pa=20,15"])
         self.mock_gn_instance.enable_gaussian_blur.assert_not_called()
-        self.mock_gn_instance.set_avg_box_data.assert_called_with(w="20", h="15")
+        self.mock_gn_instance.set_avg_box_data.assert_called_with(w=20, h=15)
         self.mock_gn_instance.open_image.assert_called_with("file4.png")
         self.mock_gn_instance.convert_image.assert_called_with(
             ANY, save_path=self.DEFAULT_OUTPUT_FILE_NAME
@@ -61,7 +61,7 @@ class ClientShould(UnitTestBaseClass):
 
     def test_convert_to_nord_palette_using_long_pixel_data_parameter(self):
         main(argv=["image-go-nord-client", "-i=file4.png", "--pixels-area=20,15"])
-        self.mock_gn_instance.set_avg_box_data.assert_called_with(w="20", h="15")
+        self.mock_gn_instance.set_avg_box_data.assert_called_with(w=20, h=15)
         self.mock_gn_instance.open_image.assert_called_with("file4.png")
         self.mock_gn_instance.convert_image.assert_called_with(
             ANY, save_path=self.DEFAULT_OUTPUT_FILE_NAME
@@ -69,7 +69,7 @@ class ClientShould(UnitTestBaseClass):
 
     def test_convert_to_nord_palette_using_long_single_pixel_data_parameter(self):
         main(argv=["image-go-nord-client", "-i=file4.png", "--pixels-area=20"])
-        self.mock_gn_instance.set_avg_box_data.assert_called_with(w="20", h="20")
+        self.mock_gn_instance.set_avg_box_data.assert_called_with(w=20, h=20)
         self.mock_gn_instance.open_image.assert_called_with("file4.png")
         self.mock_gn_instance.convert_image.assert_called_with(
             ANY, save_path=self.DEFAULT_OUTPUT_FILE_NAME
@@ -93,3 +93,15 @@ class ClientShould(UnitTestBaseClass):
         with self.assertRaises(SystemExit) as cm:
             main(argv=["image-go-nord-client", "-i=file4.png", "--pixels-area=xxx,10"])
             self.assertEqual(2, cm.exception.code)
+
+    def test_exit_with_1_when_the_engine_fails(self):
+        self.mock_gn_instance.convert_image.side_effect = IndexError("out of range")
+
+        with self.assertLogs(level="ERROR") as logs:
+            result = main(["image-go-nord-client", "-i=file5.png", "--avg"])
+
+        self.assertEqual(1, result)
+        self.assertEqual(
+            ["ERROR:root:Failed to convert file5.png: IndexError: out of range"],
+            logs.output,
+        )
@@ -1,11 +1,22 @@
-from pathlib import Path
 from unittest.mock import ANY, call
 
+from image_go_nord_client import search_palette_by_name
 from image_go_nord_client.main import main
 
 from .unit_test_base_class import UnitTestBaseClass
 
 
+def get_color_calls(palette_name: str, color_names: list[str]) -> list:
+    colors = {
+        color.name: color for color in search_palette_by_name(palette_name).colors
+    }
+    return [
+        call("#" + hex_color)
+        for name in color_names
+        for hex_color in colors[name].hex_colors
+    ]
+
+
 class ClientShould(UnitTestBaseClass):
     def test_convert_to_nord_palette_when_given_only_img_and_out_parameters_in_short_version(
         self,
@@ -21,12 +32,9 @@ class ClientShould(UnitTestBaseClass):
 
         self.mock_gn_instance.open_image.assert_called_with("file_1.png")
 
-        call_args = self.mock_gn_instance.set_palette_lookup_path.call_args
-        file_path = call_args[0][0].lower()
-        self.assertIn("monokai", file_path)
-        self.assertTrue(Path(file_path).exists())
-
-        self.mock_gn_instance.add_file_to_palette.assert_called_with("Colors.txt")
+        self.mock_gn_instance.add_color_to_palette.assert_has_calls(
+            get_color_calls("monokai", ["Colors"])
+        )
         self.mock_gn_instance.convert_image.assert_called_with(
             ANY, save_path="file_output.png"
         )
@@ -46,12 +54,9 @@ class ClientShould(UnitTestBaseClass):
 
         self.mock_gn_instance.open_image.assert_called_with("file_1.png")
 
-        call_args = self.mock_gn_instance.set_palette_lookup_path.call_args
-        file_path = call_args[0][0].lower()
-        self.assertIn("nord", file_path)
-        self.assertTrue(Path(file_path).exists())
-
-        self.mock_gn_instance.add_file_to_palette.assert_called_with("Aurora.txt")
+        self.mock_gn_instance.add_color_to_palette.assert_has_calls(
+            get_color_calls("nord", ["Aurora"])
+        )
         self.mock_gn_instance.convert_image.assert_called_with(
             ANY, save_path="file_output.png"
         )
@@ -70,18 +75,9 @@ class ClientShould(UnitTestBaseClass):
 
         self.mock_gn_instance.open_image.assert_called_with("file_1.png")
 
-        call_args = self.mock_gn_instance.set_palette_lookup_path.call_args
-        file_path = call_args[0][0].lower()
-        self.assertIn("nord", file_path)
-        self.assertTrue(Path(file_path).exists())
-
-        calls = [
-            call("Aurora.txt"),
-            call("Frost.txt"),
-            call("PolarNight.txt"),
-            call("SnowStorm.txt"),
-        ]
-        self.mock_gn_instance.add_file_to_palette.assert_has_calls(calls)
+        self.mock_gn_instance.add_color_to_palette.assert_has_calls(
+            get_color_calls("nord", ["Aurora", "Frost", "PolarNight", "SnowStorm"])
+        )
         self.mock_gn_instance.convert_image.assert_called_with(
             ANY, save_path="file_output.png"
         )
@@ -101,17 +97,9 @@ class ClientShould(UnitTestBaseClass):
 
         self.mock_gn_instance.open_image.assert_called_with("file_1.png")
 
-        call_args = self.mock_gn_instance.set_palette_lookup_path.call_args
-        file_path = call_args[0][0].lower()
-        self.assertIn("nord", file_path)
-        self.assertTrue(Path(file_path).exists())
-
-        self.mock_gn_instance.add_file_to_palette.assert_called()
-        calls = [
-            call("Aurora.txt"),
-            call("Frost.txt"),
-        ]
-        self.mock_gn_instance.add_file_to_palette.assert_has_calls(calls)
+        self.mock_gn_instance.add_color_to_palette.assert_has_calls(
+            get_color_calls("nord", ["Aurora", "Frost"])
+        )
         self.mock_gn_instance.convert_image.assert_called_with(
             ANY, save_path="file_output.png"
         )
@@ -128,10 +116,8 @@ class ClientShould(UnitTestBaseClass):
             ]
         )
 
-        self.mock_gn_instance.open_image.assert_called_with("file_1.png")
-
-        self.mock_gn_instance.set_palette_lookup_path.assert_not_called()
-        self.mock_gn_instance.add_file_to_palette.assert_not_called()
+        self.mock_gn_instance.open_image.assert_not_called()
+        self.mock_gn_instance.add_color_to_palette.assert_not_called()
         self.mock_gn_instance.convert_image.assert_not_called()
 
         self.assertEqual(result, 1)
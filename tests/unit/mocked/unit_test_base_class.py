@@ -24,6 +24,6 @@ class UnitTestBaseClass(TestCase):
         self.stderr_patch = patch("sys.stderr", io.StringIO())
         self.mocked_stderr = self.stderr_patch.start()
 
-        self.go_nord_patch = patch("image_go_nord_client.main.GoNord")
+        self.go_nord_patch = patch("image_go_nord_client.converter.GoNord")
         self.mocked_go_nord = self.go_nord_patch.start()
         self.mock_gn_instance = self.mocked_go_nord.return_value
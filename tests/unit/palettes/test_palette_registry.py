@@ -0,0 +1,92 @@
+import os
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from image_go_nord_client import palette_registry
+from image_go_nord_client.palette_registry import (
+    BUILTIN_PALETTES_DIR,
+    PaletteRegistry,
+    get_palette_registry,
+)
+
+
+class PaletteRegistryShould(TestCase):
+    def setUp(self) -> None:
+        self.user_dir = tempfile.TemporaryDirectory()
+        self.user_path = Path(self.user_dir.name)
+        (self.user_path / "Custom").mkdir()
+        (self.user_path / "Custom" / "Warm.txt").write_text(
+            "#FF0000\n#ff8800\n#FF0000\n"
+        )
+        (self.user_path / "Custom" / "Cold.txt").write_text("#0000FF")
+        self.registry = PaletteRegistry([BUILTIN_PALETTES_DIR])
+
+    def tearDown(self) -> None:
+        self.user_dir.cleanup()
+
+    def test_compile_the_builtin_palettes(self):
+        palettes = self.registry.get_palettes()
+
+        self.assertIn("nord", palettes)
+        self.assertEqual(
+            ["Aurora", "Frost", "PolarNight", "SnowStorm"],
+            [color.name for color in palettes["nord"].colors],
+        )
+        aurora = palettes["nord"].colors[0]
+        self.assertEqual("BF616A", aurora.hex_colors[0])
+
+    def test_add_user_palette_directories(self):
+        custom = PaletteRegistry([BUILTIN_PALETTES_DIR, self.user_path]).get_palettes()[
+            "custom"
+        ]
+
+        self.assertEqual(["Cold", "Warm"], [color.name for color in custom.colors])
+        self.assertEqual(("FF0000", "ff8800"), custom.colors[1].hex_colors)
+
+    def test_not_read_the_files_again_while_they_do_not_change(self):
+        self.registry.get_palettes()
+
+        with patch.object(palette_registry, "REVALIDATE_SECONDS", 0), patch.object(
+            self.registry, "_compile", wraps=self.registry._compile
+        ) as compile_palettes:
+            self.registry.get_palettes()
+            self.registry.get_palettes()
+
+            compile_palettes.assert_not_called()
+
+    def test_compile_again_when_a_palette_file_changes(self):
+        self.registry = PaletteRegistry([BUILTIN_PALETTES_DIR, self.user_path])
+        self.registry.get_palettes()
+
+        warm_path = self.user_path / "Custom" / "Warm.txt"
+        warm_path.write_text("#00FF00\n")
+        stat = warm_path.stat()
+        os.utime(warm_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        with patch.object(palette_registry, "REVALIDATE_SECONDS", 0):
+            custom = self.registry.get_palettes()["custom"]
+
+        self.assertEqual(("00FF00",), custom.colors[1].hex_colors)
+
+    def test_give_the_hex_colors_of_a_color_file(self):
+        self.registry = PaletteRegistry([BUILTIN_PALETTES_DIR, self.user_path])
+
+        hex_colors = self.registry.get_hex_colors(
+            str(self.user_path / "Custom") + "/" + "Warm.txt"
+        )
+
+        self.assertEqual(("FF0000", "ff8800"), hex_colors)
+
+    def test_layer_the_user_directories_over_the_registry_of_the_process(self):
+        (self.user_path / "Nord").mkdir()
+        (self.user_path / "Nord" / "Aurora.txt").write_text("#000000\n")
+
+        user_palettes = get_palette_registry([self.user_path]).get_palettes()
+        palettes = get_palette_registry().get_palettes()
+
+        self.assertEqual(("000000",), user_palettes["nord"].colors[0].hex_colors)
+        self.assertIn("custom", user_palettes)
+        self.assertEqual("BF616A", palettes["nord"].colors[0].hex_colors[0])
+        self.assertNotIn("custom", palettes)
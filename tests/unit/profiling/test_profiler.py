@@ -0,0 +1,64 @@
+import json
+import threading
+from unittest import TestCase
+
+from image_go_nord_client.profiling import Profiler, profile_stage
+
+
+class ProfilerShould(TestCase):
+    def test_record_the_nested_stages_with_their_parents(self):
+        profiler = Profiler()
+
+        for _ in range(2):
+            with profiler.stage("convert"):
+                with profiler.stage("map"):
+                    sum(range(10000))
+
+        stats = profiler.get_stats()
+        self.assertEqual(["convert", "convert/map"], [stage.name for stage in stats])
+        self.assertEqual([2, 2], [stage.calls for stage in stats])
+        self.assertGreaterEqual(stats[0].wall_time, stats[1].wall_time)
+        self.assertGreater(stats[1].wall_time, 0)
+
+    def test_record_the_stages_of_many_threads(self):
+        profiler = Profiler()
+
+        def convert():
+            for _ in range(100):
+                with profiler.stage("convert"):
+                    pass
+
+        threads = [threading.Thread(target=convert) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(400, profiler.get_stats()[0].calls)
+
+    def test_format_the_stats_as_json_or_as_a_table(self):
+        profiler = Profiler()
+        with profiler.stage("decode"):
+            pass
+
+        stages = json.loads(profiler.format("json"))["stages"]
+        table = profiler.format("table").splitlines()
+
+        self.assertEqual("decode", stages[0]["name"])
+        self.assertEqual(
+            {
+                "name",
+                "calls",
+                "wall_time",
+                "cpu_time",
+                "peak_memory",
+                "peak_increase",
+            },
+            set(stages[0]),
+        )
+        self.assertEqual(2, len(table))
+        self.assertTrue(table[1].startswith("decode"))
+
+    def test_do_nothing_without_a_profiler(self):
+        with profile_stage(None, "convert"):
+            pass
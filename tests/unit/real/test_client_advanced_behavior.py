@@ -2,8 +2,10 @@ import tempfile
 from pathlib import Path
 import unittest
 
+from PIL import Image
+
 from .unit_test_base_class import UnitTestBaseClass
-from tests.utils import are_images_the_same
+from tests.utils import are_images_the_same, run_image_go_nord_client
 
 
 class ClientShould(UnitTestBaseClass):
@@ -73,3 +75,61 @@ class ClientShould(UnitTestBaseClass):
             self.assertFalse(
                 are_images_the_same(output_image_path, output_image_na_path)
             )
+
+    def test_average_the_pixels_in_the_box_with_the_avg_parameter(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            temp_path = Path(tmpdirname)
+            # GoNord averages only the pixels of RGB images.
+            input_image_path = temp_path / "rainbow_square.png"
+            with Image.open(self.data / "rainbow_square.png") as image:
+                image.convert("RGB").save(input_image_path)
+
+            outputs = {}
+            for engine in ["gonord", "numpy"]:
+                for pixels_area in ["6,6", "2,9"]:
+                    output_image_path = temp_path / f"{engine}-{pixels_area}.png"
+                    run_image_go_nord_client(
+                        f"-i={input_image_path}",
+                        f"-o={output_image_path}",
+                        f"--engine={engine}",
+                        "--avg",
+                        f"-pa={pixels_area}",
+                    )
+                    outputs[engine, pixels_area] = output_image_path
+
+            without_avg_path = temp_path / "without_avg.png"
+            run_image_go_nord_client(
+                f"-i={input_image_path}", f"-o={without_avg_path}", "-pa=6,6"
+            )
+
+            self.assertFalse(
+                are_images_the_same(outputs["gonord", "6,6"], without_avg_path)
+            )
+            self.assertFalse(
+                are_images_the_same(outputs["gonord", "6,6"], outputs["gonord", "2,9"])
+            )
+            for pixels_area in ["6,6", "2,9"]:
+                with Image.open(outputs["gonord", pixels_area]) as expected:
+                    with Image.open(outputs["numpy", pixels_area]) as image:
+                        self.assertEqual(
+                            list(expected.getdata()), list(image.getdata())
+                        )
+
+    def test_average_the_pixels_of_rgba_images(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            input_image_path = self.data / "rainbow_square.png"
+            output_paths = []
+            for engine in ["gonord", "numpy"]:
+                output_image_path = Path(tmpdirname) / f"{engine}.png"
+                run_image_go_nord_client(
+                    f"-i={input_image_path}",
+                    f"-o={output_image_path}",
+                    f"--engine={engine}",
+                    "--avg",
+                )
+                output_paths.append(output_image_path)
+
+            with Image.open(output_paths[0]) as expected:
+                with Image.open(output_paths[1]) as image:
+                    self.assertEqual("RGBA", image.mode)
+                    self.assertEqual(expected.tobytes(), image.tobytes())
@@ -0,0 +1,66 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import numpy as np
+from PIL import Image, ImageSequence
+
+from tests.utils import run_image_go_nord_client
+
+
+class ClientShould(TestCase):
+    def test_convert_every_frame_of_an_animated_gif(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            input_path = Path(tmpdirname) / "animation.gif"
+            output_path = Path(tmpdirname) / "nord.gif"
+            frames = [
+                Image.new("RGB", (16, 12), color)
+                for color in ((190, 95, 105), (160, 190, 140), (95, 130, 170))
+            ]
+            frames[0].save(
+                input_path,
+                save_all=True,
+                append_images=frames[1:],
+                duration=[80, 120, 160],
+                loop=0,
+            )
+
+            for engine in ("gonord", "numpy"):
+                run_image_go_nord_client(
+                    f"-i={input_path}", f"-o={output_path}", f"--engine={engine}"
+                )
+
+                converted = Image.open(output_path)
+                self.assertEqual(3, converted.n_frames)
+                self.assertEqual(0, converted.info["loop"])
+                durations, colors = [], []
+                for frame in ImageSequence.Iterator(converted):
+                    durations.append(frame.info["duration"])
+                    colors.append(tuple(np.asarray(frame.convert("RGB"))[0, 0]))
+
+                self.assertEqual([80, 120, 160], durations)
+                self.assertEqual(
+                    [(191, 97, 106), (163, 190, 140), (94, 129, 172)], colors
+                )
+
+    def test_convert_every_frame_of_an_animation_to_every_target(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            input_path = Path(tmpdirname) / "animation.gif"
+            frames = [
+                Image.new("RGB", (16, 12), color)
+                for color in ((190, 95, 105), (160, 190, 140), (95, 130, 170))
+            ]
+            frames[0].save(input_path, save_all=True, append_images=frames[1:])
+
+            for engine in ("gonord", "numpy"):
+                outputs = [Path(tmpdirname) / f"{name}.gif" for name in ("a", "b")]
+                run_image_go_nord_client(
+                    f"-i={input_path}",
+                    f"--target=nord={outputs[0]}",
+                    f"--target=nord:Aurora={outputs[1]}",
+                    f"--engine={engine}",
+                )
+
+                for output_path in outputs:
+                    with Image.open(output_path) as converted:
+                        self.assertEqual(3, converted.n_frames)
@@ -0,0 +1,143 @@
+import json
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+from .unit_test_base_class import UnitTestBaseClass
+from tests.utils import are_images_the_same, run_image_go_nord_client
+
+
+class ClientShould(UnitTestBaseClass):
+    data = Path(__file__).parent / "data"
+
+    def test_convert_all_the_images_of_a_directory(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            input_dir = Path(tmpdirname) / "input"
+            output_dir = Path(tmpdirname) / "output"
+            input_dir.mkdir()
+            shutil.copy(self.data / "blue_square.png", input_dir)
+            shutil.copy(self.data / "rainbow_square.png", input_dir)
+
+            run_image_go_nord_client(f"-i={input_dir}", f"-o={output_dir}", "--jobs=2")
+
+            self.assertTrue(
+                are_images_the_same(
+                    output_dir / "blue_square.png", self.data / "blue_nord_square.png"
+                )
+            )
+            self.assertTrue(
+                are_images_the_same(
+                    output_dir / "rainbow_square.png",
+                    self.data / "rainbow_nord_square.png",
+                )
+            )
+
+    def test_convert_the_images_matching_a_glob_pattern(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            output_dir = Path(tmpdirname) / "output"
+
+            run_image_go_nord_client(
+                f"-i={self.data}/blue_*_square.png", f"-o={output_dir}", "-j=1"
+            )
+
+            self.assertEqual(
+                sorted(path.name for path in output_dir.iterdir()),
+                sorted(path.name for path in self.data.glob("blue_*_square.png")),
+            )
+
+    def test_convert_the_images_fitting_in_the_memory_budget(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            input_dir = Path(tmpdirname) / "input"
+            output_dir = Path(tmpdirname) / "output"
+            input_dir.mkdir()
+            shutil.copy(self.data / "blue_square.png", input_dir)
+            shutil.copy(self.data / "rainbow_square.png", input_dir)
+
+            run_image_go_nord_client(
+                f"-i={input_dir}", f"-o={output_dir}", "--jobs=2", "--max-memory=512"
+            )
+
+            self.assertTrue(
+                are_images_the_same(
+                    output_dir / "blue_square.png", self.data / "blue_nord_square.png"
+                )
+            )
+            self.assertTrue(
+                are_images_the_same(
+                    output_dir / "rainbow_square.png",
+                    self.data / "rainbow_nord_square.png",
+                )
+            )
+
+    def test_report_failures_without_stopping_the_batch(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            input_dir = Path(tmpdirname) / "input"
+            output_dir = Path(tmpdirname) / "output"
+            input_dir.mkdir()
+            shutil.copy(self.data / "blue_square.png", input_dir)
+            (input_dir / "broken.png").write_text("not an image")
+
+            with self.assertRaises(subprocess.CalledProcessError) as cm:
+                run_image_go_nord_client(
+                    f"-i={input_dir}", f"-o={output_dir}", "--jobs=2"
+                )
+
+            self.assertEqual(1, cm.exception.returncode)
+            self.assertIn("Failed to convert", cm.exception.output)
+            self.assertIn("broken.png", cm.exception.output)
+            self.assertTrue(
+                are_images_the_same(
+                    output_dir / "blue_square.png", self.data / "blue_nord_square.png"
+                )
+            )
+
+    def test_resume_a_run_from_its_journal(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            input_dir = Path(tmpdirname) / "input"
+            output_dir = Path(tmpdirname) / "output"
+            journal_path = Path(tmpdirname) / "journal.jsonl"
+            input_dir.mkdir()
+            shutil.copy(self.data / "blue_square.png", input_dir)
+            shutil.copy(self.data / "rainbow_square.png", input_dir)
+            arguments = [
+                f"-i={input_dir}",
+                f"-o={output_dir}",
+                f"--journal={journal_path}",
+                "-j=1",
+            ]
+            run_image_go_nord_client(*arguments)
+            events = [
+                json.loads(line) for line in journal_path.read_text().splitlines()
+            ]
+            self.assertEqual(
+                ["run", "started", "done", "started", "done"],
+                [event["event"] for event in events],
+            )
+
+            # A run killed while converting the second image.
+            journal_path.write_text(
+                "".join(json.dumps(event) + "\n" for event in events[:4])
+            )
+            (output_dir / "rainbow_square.png").unlink()
+            output = run_image_go_nord_client(*arguments, "--resume")[1]
+
+            self.assertIn("Resuming, 1 of 2 images already converted", output)
+            self.assertIn("Converting 1 images", output)
+            self.assertTrue(
+                are_images_the_same(
+                    output_dir / "rainbow_square.png",
+                    self.data / "rainbow_nord_square.png",
+                )
+            )
+            self.assertEqual(
+                ["blue_square.png", "rainbow_square.png"],
+                sorted(path.name for path in output_dir.iterdir()),
+            )
+
+            output = run_image_go_nord_client(*arguments, "--resume")[1]
+            self.assertIn("Every image is already converted", output)
+
+            with self.assertRaises(subprocess.CalledProcessError) as cm:
+                run_image_go_nord_client(*arguments, "--resume", "--blur")
+            self.assertIn("of a run with other options", cm.exception.output)
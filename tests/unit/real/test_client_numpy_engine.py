@@ -0,0 +1,127 @@
+import subprocess
+import tempfile
+from pathlib import Path
+
+from PIL import Image
+
+from .unit_test_base_class import UnitTestBaseClass
+from tests.utils import run_image_go_nord_client
+
+
+class ClientShould(UnitTestBaseClass):
+    data = Path(__file__).parent / "data"
+    input_image_path = data / "blue_square.png"
+
+    def test_convert_to_nord_palette_using_numpy_engine(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            output_image_path = Path(tmpdirname) / "output.png"
+
+            self.run_test(
+                self.input_image_path,
+                output_image_path,
+                self.data / "blue_nord_square.png",
+                f"-i={self.input_image_path}",
+                f"-o={output_image_path}",
+                "--engine=numpy",
+            )
+
+    def test_convert_to_nord_palette_with_aurora_theme_using_numpy_engine(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            output_image_path = Path(tmpdirname) / "output.png"
+
+            self.run_test(
+                self.input_image_path,
+                output_image_path,
+                self.data / "blue_nord_aurora_square.png",
+                f"-i={self.input_image_path}",
+                f"-o={output_image_path}",
+                "--palette=nord",
+                "--colors=Aurora",
+                "-e=numpy",
+            )
+
+    def test_verify_numpy_engine_is_identical_to_gonord_on_test_images(self):
+        for palette_args in [[], ["--colors=PolarNight,Aurora"], ["--palette=monokai"]]:
+            _, output = run_image_go_nord_client(
+                f"-i={self.data}", "--engine=numpy", "--verify", "--blur", *palette_args
+            )
+
+            self.assertIn("12 of 12 images are identical", output)
+
+    def test_convert_by_strips_with_a_memory_budget(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            output_image_path = Path(tmpdirname) / "output.png"
+
+            run_image_go_nord_client(
+                f"-i={self.input_image_path}",
+                f"-o={output_image_path}",
+                "--engine=numpy",
+                "--tile-memory=1",
+            )
+
+            # The PNG is encoded by strips, only the pixels are the same.
+            with Image.open(output_image_path) as actual, Image.open(
+                self.data / "blue_nord_square.png"
+            ) as expected:
+                self.assertEqual(expected.mode, actual.mode)
+                self.assertEqual(expected.tobytes(), actual.tobytes())
+
+    def test_exit_with_error_when_blur_radius_is_used_with_gonord_engine(self):
+        with self.assertRaises(subprocess.CalledProcessError) as cm:
+            run_image_go_nord_client(
+                f"-i={self.input_image_path}", "--blur", "--blur-radius=2"
+            )
+
+        self.assertEqual(2, cm.exception.returncode)
+        self.assertIn("--blur-radius can be used only with", cm.exception.output)
+
+    def test_convert_with_threads_as_with_a_single_thread(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            output_image_path = Path(tmpdirname) / "output.png"
+
+            self.run_test(
+                self.input_image_path,
+                output_image_path,
+                self.data / "blue_nord_square.png",
+                f"-i={self.input_image_path}",
+                f"-o={output_image_path}",
+                "--engine=numpy",
+                "--threads=4",
+            )
+
+    def test_verify_numpy_engine_with_threads_on_test_images(self):
+        _, output = run_image_go_nord_client(
+            f"-i={self.data}", "--engine=numpy", "--verify", "--blur", "--threads=3"
+        )
+
+        self.assertIn("12 of 12 images are identical", output)
+
+    def test_write_palette_images_with_the_indexed_output(self):
+        for extension in ("png", "gif"):
+            with tempfile.TemporaryDirectory() as tmpdirname:
+                output_image_path = Path(tmpdirname) / f"output.{extension}"
+
+                run_image_go_nord_client(
+                    f"-i={self.input_image_path}",
+                    f"-o={output_image_path}",
+                    "--engine=numpy",
+                    "--indexed",
+                )
+
+                with Image.open(output_image_path) as actual, Image.open(
+                    self.data / "blue_nord_square.png"
+                ) as expected:
+                    self.assertEqual("P", actual.mode)
+                    self.assertEqual(
+                        expected.tobytes(), actual.convert(expected.mode).tobytes()
+                    )
+
+    def test_exit_with_error_when_the_indexed_output_can_not_be_written(self):
+        for arguments in (["-o=output.jpg"], ["--blur"], ["-e=gonord"]):
+            with self.assertRaises(subprocess.CalledProcessError) as cm:
+                run_image_go_nord_client(
+                    f"-i={self.input_image_path}", "-e=numpy", "--indexed", *arguments
+                )
+
+            self.assertEqual(2, cm.exception.returncode)
+            self.assertIn("--indexed", cm.exception.output)
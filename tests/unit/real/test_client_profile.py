@@ -0,0 +1,71 @@
+import json
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+import pstats
+
+CLIENT_PATH = Path.cwd() / "src" / "image_go_nord_client"
+
+
+def run_with_profile(*args) -> dict:
+    result = subprocess.run(
+        [sys.executable, str(CLIENT_PATH), *args, "--profile", "--profile-format=json"],
+        capture_output=True,
+        check=True,
+        universal_newlines=True,
+    )
+    lines = result.stderr.splitlines()
+    return json.loads("\n".join(lines[lines.index("{") :]))
+
+
+class ClientShould(TestCase):
+    data = Path(__file__).parent / "data"
+    input_image_path = data / "blue_square.png"
+
+    def test_print_the_profile_of_the_stages_of_the_conversion(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            output_path = Path(tmpdirname) / "nord.png"
+            stats_path = Path(tmpdirname) / "conversion.prof"
+
+            profile = run_with_profile(
+                f"-i={self.input_image_path}",
+                f"-o={output_path}",
+                "--engine=numpy",
+                "--blur",
+                f"--profile-stats={stats_path}",
+            )
+
+            self.assertTrue(output_path.exists())
+            self.assertGreater(pstats.Stats(str(stats_path)).total_calls, 0)
+
+        self.assertEqual(
+            [
+                "decode",
+                "convert",
+                "convert/prepare",
+                "convert/map",
+                "convert/blur",
+                "encode",
+            ],
+            [stage["name"] for stage in profile["stages"]],
+        )
+
+    def test_profile_the_gonord_engine_as_a_single_stage(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            profile = run_with_profile(
+                f"-i={self.input_image_path}", f"-o={Path(tmpdirname) / 'nord.png'}"
+            )
+
+        self.assertEqual(
+            ["decode", "convert", "encode"],
+            [stage["name"] for stage in profile["stages"]],
+        )
+
+    def test_exit_with_2_when_profiling_a_batch(self):
+        with self.assertRaises(subprocess.CalledProcessError) as cm:
+            run_with_profile(f"-i={self.data}")
+
+        self.assertEqual(2, cm.exception.returncode)
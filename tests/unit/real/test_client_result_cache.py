@@ -0,0 +1,75 @@
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from tests.utils import are_images_the_same, run_image_go_nord_client
+
+
+class ClientShould(TestCase):
+    data = Path(__file__).parent / "data"
+    input_image_path = data / "blue_square.png"
+
+    def test_copy_the_images_already_converted_from_the_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            cache_dir = Path(tmpdirname) / "cache"
+            output_image_path = Path(tmpdirname) / "output.png"
+            arguments = [
+                f"-i={self.input_image_path}",
+                f"-o={output_image_path}",
+                f"--cache-dir={cache_dir}",
+            ]
+
+            _, first_output = run_image_go_nord_client(*arguments)
+            output_image_path.unlink()
+            _, second_output = run_image_go_nord_client(*arguments)
+
+            self.assertNotIn("result cache", first_output)
+            self.assertIn("Copied from the result cache", second_output)
+            self.assertTrue(
+                are_images_the_same(
+                    self.data / "blue_nord_square.png", output_image_path
+                )
+            )
+
+    def test_convert_again_when_the_options_change(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            cache_dir = Path(tmpdirname) / "cache"
+            output_image_path = Path(tmpdirname) / "output.png"
+            arguments = [
+                f"-i={self.input_image_path}",
+                f"-o={output_image_path}",
+                f"--cache-dir={cache_dir}",
+            ]
+
+            run_image_go_nord_client(*arguments)
+            _, output = run_image_go_nord_client(*arguments, "--colors=Aurora")
+
+            self.assertNotIn("result cache", output)
+            self.assertTrue(
+                are_images_the_same(
+                    self.data / "blue_nord_aurora_square.png", output_image_path
+                )
+            )
+
+    def test_copy_the_targets_already_converted_from_the_cache(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            output_dir = Path(tmpdirname)
+            arguments = [
+                f"-i={self.input_image_path}",
+                f"--cache-dir={output_dir / 'cache'}",
+                f"--target=nord={output_dir / 'nord.png'}",
+                f"--target=nord:Aurora={output_dir / 'aurora.png'}",
+            ]
+
+            run_image_go_nord_client(*arguments)
+            (output_dir / "aurora.png").unlink()
+            _, output = run_image_go_nord_client(*arguments)
+
+            self.assertIn("Copied from the result cache", output)
+            self.assertNotIn("Loading input image", output)
+            self.assertTrue(
+                are_images_the_same(
+                    self.data / "blue_nord_aurora_square.png",
+                    output_dir / "aurora.png",
+                )
+            )
@@ -0,0 +1,85 @@
+import io
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from PIL import Image
+
+from tests.utils import run_image_go_nord_client
+
+CLIENT_PATH = Path.cwd() / "src" / "image_go_nord_client"
+
+
+def run_with_streams(stdin: bytes, *args) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, str(CLIENT_PATH), *args],
+        input=stdin,
+        capture_output=True,
+        check=True,
+    )
+
+
+class ClientShould(TestCase):
+    data = Path(__file__).parent / "data"
+    input_image_path = data / "blue_square.png"
+    expected_image_path = data / "blue_nord_square.png"
+
+    def assert_same_pixels(self, expected: Image.Image, actual: Image.Image):
+        self.assertEqual(expected.mode, actual.mode)
+        self.assertEqual(expected.tobytes(), actual.tobytes())
+
+    def test_convert_from_stdin_to_stdout(self):
+        for engine in ("gonord", "numpy"):
+            result = run_with_streams(
+                self.input_image_path.read_bytes(),
+                "-i",
+                "-",
+                "-o",
+                "-",
+                "--format=png",
+                f"--engine={engine}",
+            )
+
+            actual = Image.open(io.BytesIO(result.stdout))
+            self.assertEqual("PNG", actual.format)
+            self.assert_same_pixels(Image.open(self.expected_image_path), actual)
+
+    def test_convert_from_stdin_to_a_file(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            output_image_path = Path(tmpdirname) / "output.png"
+
+            run_with_streams(
+                self.input_image_path.read_bytes(), "-i=-", f"-o={output_image_path}"
+            )
+
+            self.assertEqual(
+                self.expected_image_path.read_bytes(), output_image_path.read_bytes()
+            )
+
+    def test_save_with_the_given_format_whatever_the_extension(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            output_image_path = Path(tmpdirname) / "output.png"
+
+            run_image_go_nord_client(
+                f"-i={self.input_image_path}", f"-o={output_image_path}", "-f=webp"
+            )
+
+            self.assertEqual("WEBP", Image.open(output_image_path).format)
+
+    def test_exit_with_error_when_writing_to_stdout_without_format(self):
+        with self.assertRaises(subprocess.CalledProcessError) as cm:
+            run_image_go_nord_client(f"-i={self.input_image_path}", "-o=-")
+
+        self.assertEqual(2, cm.exception.returncode)
+        self.assertIn("--format is required", cm.exception.output)
+
+    def test_exit_with_error_on_unknown_format(self):
+        with self.assertRaises(subprocess.CalledProcessError) as cm:
+            run_image_go_nord_client(
+                f"-i={self.input_image_path}", "-o=-", "--format=nope"
+            )
+
+        self.assertEqual(1, cm.exception.returncode)
+        self.assertIn("Unknown output format: NOPE", cm.exception.output)
@@ -0,0 +1,60 @@
+import subprocess
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from tests.utils import are_images_the_same, run_image_go_nord_client
+
+
+class ClientShould(TestCase):
+    data = Path(__file__).parent / "data"
+    input_image_path = data / "blue_square.png"
+
+    def test_convert_an_image_to_many_targets(self):
+        for engine in ("gonord", "numpy"):
+            with tempfile.TemporaryDirectory() as tmpdirname:
+                output_dir = Path(tmpdirname)
+
+                run_image_go_nord_client(
+                    f"-i={self.input_image_path}",
+                    f"--engine={engine}",
+                    f"--target=nord={output_dir / 'nord.png'}",
+                    f"--target=nord:Aurora={output_dir / 'aurora.png'}",
+                    f"--target=nord:PolarNight,Aurora={output_dir / 'two.png'}",
+                    f"--target=monokai={output_dir / 'monokai.png'}",
+                )
+
+                for output_name, expected_name in (
+                    ("nord.png", "blue_nord_square.png"),
+                    ("aurora.png", "blue_nord_aurora_square.png"),
+                    ("two.png", "blue_nord_polarnight_aurora_square.png"),
+                    ("monokai.png", "blue_monokai_square.png"),
+                ):
+                    self.assertTrue(
+                        are_images_the_same(
+                            self.data / expected_name, output_dir / output_name
+                        ),
+                        f"{engine}: {output_name} is not {expected_name}",
+                    )
+
+    def test_not_convert_anything_when_a_target_palette_is_not_found(self):
+        with tempfile.TemporaryDirectory() as tmpdirname:
+            output_dir = Path(tmpdirname)
+
+            with self.assertRaises(subprocess.CalledProcessError) as cm:
+                run_image_go_nord_client(
+                    f"-i={self.input_image_path}",
+                    f"--target=nord={output_dir / 'nord.png'}",
+                    f"--target=nope={output_dir / 'nope.png'}",
+                )
+
+            self.assertEqual(1, cm.exception.returncode)
+            self.assertIn("No palette found with the name nope", cm.exception.output)
+            self.assertEqual([], list(output_dir.iterdir()))
+
+    def test_exit_with_error_on_invalid_targets(self):
+        with self.assertRaises(subprocess.CalledProcessError) as cm:
+            run_image_go_nord_client(f"-i={self.input_image_path}", "--target=nord")
+
+        self.assertEqual(2, cm.exception.returncode)
+        self.assertIn("--target", cm.exception.output)
@@ -0,0 +1,39 @@
+import subprocess
+import sys
+from unittest import TestCase
+
+HEAVY_MODULES = ("PIL", "numpy", "ImageGoNord")
+
+SCRIPT = f"""
+import sys
+from image_go_nord_client.main import main
+try:
+    main(sys.argv)
+except SystemExit:
+    pass
+print(sorted(module for module in {HEAVY_MODULES!r} if module in sys.modules))
+"""
+
+
+def get_loaded_heavy_modules(*args) -> str:
+    output = subprocess.check_output(
+        [sys.executable, "-c", SCRIPT, *args],
+        universal_newlines=True,
+        stderr=subprocess.DEVNULL,
+    )
+    return output.strip().splitlines()[-1]
+
+
+class ClientShould(TestCase):
+    def test_not_load_the_imaging_stack_to_show_the_version(self):
+        self.assertEqual("[]", get_loaded_heavy_modules("--version"))
+
+    def test_not_load_the_imaging_stack_to_show_the_help(self):
+        self.assertEqual("[]", get_loaded_heavy_modules("--help"))
+
+    def test_not_load_the_imaging_stack_to_list_the_palettes(self):
+        self.assertEqual("[]", get_loaded_heavy_modules("--list-palettes"))
+
+    def test_not_load_the_imaging_stack_on_invalid_arguments(self):
+        self.assertEqual("[]", get_loaded_heavy_modules())
+        self.assertEqual("[]", get_loaded_heavy_modules("-i=a.png", "-pa=x"))
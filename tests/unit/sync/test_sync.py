@@ -0,0 +1,125 @@
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from image_go_nord_client import sync as sync_module
+from image_go_nord_client.main import main
+from image_go_nord_client.sync import get_sync_argument_parser, load_manifest, sync_tree
+
+DATA_PATH = Path(__file__).parents[1] / "real" / "data"
+PALETTE_PATH = Path(__file__).parents[3] / "src" / "image_go_nord_client" / "palettes"
+
+
+class SyncShould(TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.temp_path = Path(self.temp_dir.name)
+        self.source_dir = self.temp_path / "source"
+        self.output_dir = self.temp_path / "output"
+        self.manifest_path = self.output_dir / "manifest.json"
+        (self.source_dir / "icons").mkdir(parents=True)
+        shutil.copy(DATA_PATH / "blue_square.png", self.source_dir / "blue.png")
+        shutil.copy(
+            DATA_PATH / "rainbow_square.png", self.source_dir / "icons" / "rainbow.png"
+        )
+        self.palettes_dir = self.temp_path / "palettes"
+        shutil.copytree(PALETTE_PATH / "Nord", self.palettes_dir / "Theme")
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def run_sync(self, *options) -> list[str]:
+        """Sync the source tree and return the converted images."""
+        arguments = get_sync_argument_parser().parse_args(
+            [
+                f"--img={self.source_dir}",
+                f"--out={self.output_dir}",
+                "--engine=numpy",
+                "--jobs=1",
+                f"--palettes-dir={self.palettes_dir}",
+                "--palette=theme",
+                *options,
+            ]
+        )
+        converted = []
+        convert_batch_items = sync_module.convert_batch_items
+
+        def record_items(arguments, items, jobs):
+            converted.extend(item.input_path.name for item in items)
+            return convert_batch_items(arguments, items, jobs)
+
+        with patch.object(sync_module, "convert_batch_items", record_items):
+            exit_code = sync_tree(
+                arguments, self.source_dir, self.output_dir, self.manifest_path
+            )
+
+        self.assertEqual(0, exit_code)
+        return sorted(converted)
+
+    def test_mirror_the_source_tree(self):
+        self.assertEqual(["blue.png", "rainbow.png"], self.run_sync())
+
+        self.assertTrue((self.output_dir / "blue.png").is_file())
+        self.assertTrue((self.output_dir / "icons" / "rainbow.png").is_file())
+        self.assertEqual(
+            {"blue.png", "icons/rainbow.png"}, set(load_manifest(self.manifest_path))
+        )
+
+    def test_convert_only_the_changed_images(self):
+        self.run_sync()
+        self.assertEqual([], self.run_sync())
+
+        # The same content with a new modification time is not converted.
+        (self.source_dir / "blue.png").touch()
+        self.assertEqual([], self.run_sync())
+
+        shutil.copy(DATA_PATH / "rainbow_square.png", self.source_dir / "blue.png")
+        self.assertEqual(["blue.png"], self.run_sync())
+
+        (self.output_dir / "icons" / "rainbow.png").unlink()
+        self.assertEqual(["rainbow.png"], self.run_sync())
+
+    def test_convert_again_when_the_options_or_the_palette_change(self):
+        self.run_sync()
+
+        self.assertEqual(["blue.png", "rainbow.png"], self.run_sync("--blur"))
+        self.assertEqual([], self.run_sync("--blur"))
+
+        with open(self.palettes_dir / "Theme" / "Aurora.txt", "a") as file:
+            file.write("#123456\n")
+        self.assertEqual(["blue.png", "rainbow.png"], self.run_sync("--blur"))
+
+    def test_remove_the_outputs_of_removed_images(self):
+        self.run_sync()
+        (self.source_dir / "blue.png").unlink()
+
+        self.assertEqual([], self.run_sync())
+        self.assertFalse((self.output_dir / "blue.png").exists())
+        self.assertEqual(["icons/rainbow.png"], list(load_manifest(self.manifest_path)))
+
+    def test_refuse_an_output_inside_the_source(self):
+        with patch("sys.stderr"), self.assertRaises(SystemExit):
+            main(
+                [
+                    "image-go-nord-client",
+                    "sync",
+                    f"--img={self.source_dir}",
+                    f"--out={self.source_dir / 'output'}",
+                ]
+            )
+
+    def test_refuse_unknown_options(self):
+        with patch("sys.stderr"), self.assertRaises(SystemExit):
+            main(
+                [
+                    "image-go-nord-client",
+                    "sync",
+                    f"--img={self.source_dir}",
+                    f"--out={self.output_dir}",
+                    "--wacth",
+                ]
+            )
+
+        self.assertFalse(self.output_dir.exists())
@@ -0,0 +1,227 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import TestCase
+from unittest.mock import patch
+
+from image_go_nord_client.work_queue import (
+    DONE,
+    FAILED,
+    JobItem,
+    WorkQueue,
+    load_job_manifest,
+    run_worker,
+)
+
+CLIENT_PATH = Path(__file__).parents[3] / "src" / "image_go_nord_client"
+DATA_PATH = Path(__file__).parents[1] / "real" / "data"
+
+
+class WorkQueueTestCase(TestCase):
+    def setUp(self) -> None:
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.temp_path = Path(self.temp_dir.name)
+        self.manifest_path = self.temp_path / "jobs.json"
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def write_manifest(self, items) -> None:
+        self.manifest_path.write_text(json.dumps(items))
+
+
+class JobManifestShould(WorkQueueTestCase):
+    def test_read_json_items_relative_to_the_manifest(self):
+        self.write_manifest(
+            {
+                "items": [
+                    {
+                        "input": "a.png",
+                        "output": "out/a.png",
+                        "colors": ["Aurora"],
+                        "flags": "--engine=numpy --threads=2",
+                    }
+                ]
+            }
+        )
+
+        [(item_id, item, arguments)] = load_job_manifest(self.manifest_path)
+
+        self.assertTrue(item_id.startswith("000000-"))
+        self.assertEqual(["Aurora"], item.colors)
+        self.assertEqual(str(self.temp_path / "a.png"), arguments.input_path)
+        self.assertEqual(str(self.temp_path / "out" / "a.png"), arguments.output_path)
+        self.assertEqual("numpy", arguments.engine)
+        self.assertEqual(2, arguments.threads)
+
+    def test_read_csv_items(self):
+        csv_path = self.temp_path / "jobs.csv"
+        csv_path.write_text(
+            "input,output,palette,colors,flags\n"
+            'a.png,a_nord.png,nord,"Aurora,Frost",--blur\n'
+            "b.png,b_nord.png,,,\n"
+        )
+
+        items = [item for _, item, _ in load_job_manifest(csv_path)]
+
+        self.assertEqual(
+            [
+                JobItem("a.png", "a_nord.png", "nord", ["Aurora", "Frost"], ["--blur"]),
+                JobItem("b.png", "b_nord.png"),
+            ],
+            items,
+        )
+
+    def test_reject_invalid_items_with_their_index(self):
+        invalid_items = {
+            "missing output": {"input": "a.png"},
+            "unknown options": {"input": "a.png", "output": "b.png", "flags": "-x"},
+            "single image": {"input": "images", "output": "b.png"},
+            "--verify": {"input": "a.png", "output": "b.png", "flags": "--verify"},
+            "No palette found": {"input": "a.png", "output": "b.png", "palette": "x"},
+            "--engine=numpy": {"input": "a.png", "output": "b.png", "flags": "--lut"},
+        }
+        (self.temp_path / "images").mkdir()
+        for message, invalid_item in invalid_items.items():
+            with self.subTest(message):
+                valid_item = {"input": "a.png", "output": "a_nord.png"}
+                self.write_manifest([valid_item, invalid_item])
+
+                with self.assertRaises(ValueError) as cm:
+                    load_job_manifest(self.manifest_path)
+
+                self.assertTrue(str(cm.exception).startswith("Item 1:"))
+                self.assertIn(message, str(cm.exception))
+
+    def test_change_the_id_of_a_changed_item(self):
+        self.write_manifest([{"input": "a.png", "output": "a_nord.png"}])
+        [(first_id, _, _)] = load_job_manifest(self.manifest_path)
+        self.write_manifest(
+            [{"input": "a.png", "output": "a_blur.png", "flags": "--blur"}]
+        )
+        [(second_id, _, _)] = load_job_manifest(self.manifest_path)
+
+        self.assertNotEqual(first_id, second_id)
+
+
+class WorkQueueShould(WorkQueueTestCase):
+    def test_lease_an_item_to_a_single_worker(self):
+        first = WorkQueue(self.temp_path, "first")
+        second = WorkQueue(self.temp_path, "second")
+
+        lease = first.claim("item")
+
+        self.assertIsNotNone(lease)
+        self.assertIsNone(second.claim("item"))
+        self.assertTrue(first.renew(lease))
+
+    def test_reclaim_an_expired_lease(self):
+        first = WorkQueue(self.temp_path, "first", lease_time=0.1)
+        second = WorkQueue(self.temp_path, "second", lease_time=0.1)
+        first_lease = first.claim("item")
+
+        time.sleep(0.2)
+        second_lease = second.claim("item")
+
+        self.assertEqual(1, second_lease.generation)
+        self.assertIsNone(first.claim("item"))
+        self.assertFalse(first.renew(first_lease))
+
+    def test_reclaim_a_lease_never_written(self):
+        queue = WorkQueue(self.temp_path, "worker", lease_time=0.1)
+        lease_path = queue.get_lease_path("item", 0)
+        lease_path.touch()
+        os.utime(lease_path, (time.time() - 1, time.time() - 1))
+
+        self.assertEqual(1, queue.claim("item").generation)
+
+    def test_not_claim_an_item_recorded_while_claiming_it(self):
+        first = WorkQueue(self.temp_path, "first")
+        second = WorkQueue(self.temp_path, "second")
+        get_generation = second.get_generation
+
+        def record_before_reading_the_leases(item_id):
+            first.record(first.claim(item_id), JobItem("a.png", "b.png"), None)
+            return get_generation(item_id)
+
+        with patch.object(second, "get_generation", record_before_reading_the_leases):
+            self.assertIsNone(second.claim("item"))
+
+        self.assertEqual([], list(second.leases_dir.iterdir()))
+
+    def test_record_results_and_release_leases(self):
+        queue = WorkQueue(self.temp_path, "worker")
+        lease = queue.claim("item")
+
+        queue.record(lease, JobItem("a.png", "b.png"), "OSError: broken")
+
+        self.assertEqual([], list(queue.leases_dir.iterdir()))
+        result = queue.get_results()["item"]
+        self.assertEqual(FAILED, result["status"])
+        self.assertEqual("worker", result["worker"])
+        self.assertEqual("OSError: broken", result["error"])
+
+
+class WorkerShould(WorkQueueTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        for index in range(6):
+            shutil.copy(DATA_PATH / "blue_square.png", self.temp_path / f"{index}.png")
+
+        self.write_manifest(
+            [
+                {
+                    "input": f"{index}.png",
+                    "output": f"out/{index}.png",
+                    "flags": "--engine=numpy",
+                }
+                for index in range(6)
+            ]
+        )
+
+    def test_record_failures_and_skip_converted_items(self):
+        (self.temp_path / "3.png").write_bytes(b"not an image")
+        items = load_job_manifest(self.manifest_path)
+        queue = WorkQueue(self.temp_path / "queue", "worker")
+
+        self.assertEqual(1, run_worker(items, queue, poll_interval=0.1))
+        self.assertEqual(1, run_worker(items, queue, poll_interval=0.1))
+
+        results = queue.get_results()
+        statuses = [results[item_id]["status"] for item_id, _, _ in items]
+        self.assertEqual([DONE, DONE, DONE, FAILED, DONE, DONE], statuses)
+        self.assertFalse(any(self.temp_path.glob("out/.*")))
+
+    def test_drain_a_manifest_with_several_processes(self):
+        queue_dir = self.temp_path / "queue"
+        processes = [
+            subprocess.Popen(
+                [
+                    sys.executable,
+                    str(CLIENT_PATH),
+                    "worker",
+                    str(self.manifest_path),
+                    f"--queue-dir={queue_dir}",
+                    f"--worker-id=worker-{index}",
+                    "--poll-interval=0.1",
+                    "-q",
+                ]
+            )
+            for index in range(3)
+        ]
+
+        exit_codes = [process.wait(timeout=300) for process in processes]
+
+        self.assertEqual([0, 0, 0], exit_codes)
+        results = WorkQueue(queue_dir, "reader").get_results()
+        self.assertEqual(6, len(results))
+        self.assertTrue(all(result["status"] == DONE for result in results.values()))
+        expected = (DATA_PATH / "blue_nord_square.png").read_bytes()
+        for index in range(6):
+            output = (self.temp_path / "out" / f"{index}.png").read_bytes()
+            self.assertEqual(expected, output)